@@ -0,0 +1 @@
+"""Benchmarks for the Course Design Toolbox. Run from the repository root, e.g. `python -m benchmarks.bench_fetch`."""
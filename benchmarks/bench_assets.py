@@ -0,0 +1,112 @@
+"""
+Offline bundles of extracted activities: every image and file the HTML links
+to on the fake Moodle server downloaded one at a time vs. concurrently, cold
+and again with the page and image caches warm. Checks that the bundle holds
+every asset once, srcset copies included, and that no bundled asset is still
+linked on Moodle; then bundles against a server that answers every file with
+its login page and checks that each fails, keeps its Moodle link and is not
+cached.
+
+    python -m benchmarks.bench_assets --activities 20 --images 3 --latency 0.05
+"""
+import argparse
+import io
+import re
+import tempfile
+import time
+import zipfile
+from functools import partial
+
+from benchmarks.fake_moodle import activity_urls, serve
+from toolbox.activities import extract_nextgen4_content, read_activity_content
+from toolbox.assets import ASSET_DIR, BUNDLE_PAGE, localize_assets, report_summary
+from toolbox.fetch import fetch_all, fetch_page, make_session
+from toolbox.httpcache import HttpCache
+from toolbox.images import RenditionCache
+
+
+def extracted_html(server, count):
+    """The Activity Extractor's combined HTML for `count` activities."""
+    fetch = partial(fetch_page, read=read_activity_content)
+    results = fetch_all(make_session(), activity_urls(server.base_url, count), fetch=fetch)
+    return "<html><body>" + "".join(extract_nextgen4_content(result.text) for result in results) + "</body></html>"
+
+
+def check_bundle(data, server):
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        names = set(archive.namelist())
+        page = archive.read(BUNDLE_PAGE).decode("utf-8")
+    if "pluginfile.php" in page or server.base_url in page:
+        raise AssertionError("the bundled page still links files on Moodle")
+    linked = set(re.findall(rf"{ASSET_DIR}/[^\s\"',]+", page))
+    if linked != names - {BUNDLE_PAGE}:
+        raise AssertionError(f"linked and bundled files differ: {sorted(linked ^ (names - {BUNDLE_PAGE}))[:5]}")
+
+
+def check_login_redirects(html, latency):
+    """Bundle against a server that sends every file request to its login page, on a session that never logged in."""
+    with serve(require_login=True, latency=latency) as server, tempfile.TemporaryDirectory() as folder:
+        page_cache = HttpCache(f"{folder}/http", ttl=3600)
+        image_cache = RenditionCache(f"{folder}/renditions")
+        bundle = localize_assets(html, make_session(), server.base_url, cache=page_cache, image_cache=image_cache)
+        with zipfile.ZipFile(io.BytesIO(bundle.data)) as archive:
+            names = archive.namelist()
+            page = archive.read(BUNDLE_PAGE).decode("utf-8")
+        if len(bundle.report.failed) != bundle.report.assets or names != [BUNDLE_PAGE]:
+            raise AssertionError("a login page went into the bundle as an asset")
+        if f'"{ASSET_DIR}/' in page or page_cache.store.size or image_cache.store.size:
+            raise AssertionError("a failed asset was relinked or cached")
+        return bundle.report
+
+
+def check_report(report, activities, images):
+    # Each activity's photos and their small srcset copies, and its handout, plus the shared logo.
+    expected = activities * (2 * images + 1) + 1
+    if report.failed or report.assets != expected:
+        raise AssertionError(f"bundled {report.assets} assets with {len(report.failed)} failed, expected {expected}")
+
+
+def check(activities=3, images=1):
+    """One cold bundle of a small course, then the login-redirect case."""
+    with serve(activities=activities, images=images) as server, tempfile.TemporaryDirectory() as folder:
+        html = extracted_html(server, activities)
+        bundle = localize_assets(html, make_session(), server.base_url, cache=HttpCache(f"{folder}/http"),
+                                 image_cache=RenditionCache(f"{folder}/renditions"))
+        check_report(bundle.report, activities, images)
+        check_bundle(bundle.data, server)
+    check_login_redirects(html, 0.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--activities", type=int, default=20)
+    parser.add_argument("--images", type=int, default=3, help="photos per activity, besides the shared logo and a handout")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    with serve(activities=args.activities, images=args.images, latency=args.latency) as server:
+        html = extracted_html(server, args.activities)
+        print(f"{args.activities} activities with {args.images} photos each, {args.latency * 1000:.0f} ms latency")
+        print(f"{'run':<28}{'time':>8}{'requests':>10}  report")
+        for label, workers, warm in [("one at a time, cold", 1, False), (f"{args.workers} workers, cold", args.workers, False),
+                                     (f"{args.workers} workers, warm caches", args.workers, True)]:
+            with tempfile.TemporaryDirectory() as folder:
+                page_cache, image_cache = HttpCache(f"{folder}/http", ttl=3600), RenditionCache(f"{folder}/renditions")
+                if warm:
+                    localize_assets(html, make_session(workers), server.base_url, cache=page_cache,
+                                    workers=workers, image_cache=image_cache)
+                requests_before = server.requests
+                start = time.perf_counter()
+                bundle = localize_assets(html, make_session(workers), server.base_url, cache=page_cache,
+                                         workers=workers, image_cache=image_cache)
+                seconds = time.perf_counter() - start
+            check_report(bundle.report, args.activities, args.images)
+            check_bundle(bundle.data, server)
+            print(f"{label:<28}{seconds:>7.2f}s{server.requests - requests_before:>10}  {report_summary(bundle.report)}")
+        report = check_login_redirects(html, args.latency)
+        print(f"{'expired session':<28}{'':>8}{'':>10}  {len(report.failed)} of {report.assets} failed: {report.failed[0][1]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+The headless batch CLI on a folder of Course Build Plans: one process vs. the
+process pool, with a check that every plan's outputs match the pages' and that
+a plan that cannot be read fails on its own in summary.csv.
+
+    python -m benchmarks.bench_batch --plans 12 --weeks 16
+"""
+import argparse
+import csv
+import io
+import os
+import tempfile
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from benchmarks.corpus import course_plan, heading_template, moodle_template, word_plan
+from toolbox import batch
+from toolbox.formatting import format_html
+from toolbox.pipeline import format_and_merge
+
+
+def write_plans(folder, count, weeks):
+    """`count` plans in `folder`, alternating plain and Word exports; returns {file name: plan HTML}."""
+    plans = {}
+    for i in range(count):
+        plan = word_plan(weeks) if i % 2 else course_plan(weeks, formatted=False)
+        name = f"plan{i:02}.html"
+        (Path(folder) / name).write_text(plan, "utf-8")
+        plans[name] = plan
+    return plans
+
+
+def check(plans=3, weeks=3):
+    """Raise unless `python -m toolbox.batch` builds each plan as the pages would and reports a broken one."""
+    with tempfile.TemporaryDirectory() as folder:
+        folder = Path(folder)
+        (folder / "plans").mkdir()
+        written = write_plans(folder / "plans", plans, weeks)
+        # A directory with a plan's name cannot be read, which fails that plan only.
+        (folder / "plans" / "broken.html").mkdir()
+        template = moodle_template(weeks)
+        (folder / "moodle.html").write_text(template, "utf-8")
+        headings = folder / "headings.html"
+        headings.write_text(heading_template(), "utf-8")
+
+        with redirect_stdout(io.StringIO()):
+            status = batch.main([str(folder / "plans"), "--moodle-template", str(folder / "moodle.html"),
+                                 "--headings", str(headings), "--out", str(folder / "out"), "--workers", "2"])
+        if status != 1:
+            raise AssertionError(f"the batch exited with {status} after a plan failed, expected 1")
+        with open(folder / "out" / "summary.csv", newline="", encoding="utf-8") as f:
+            rows = {row["plan"]: row for row in csv.DictReader(f)}
+        if sorted(rows) != sorted([*written, "broken.html"]) or not rows["broken.html"]["error"]:
+            raise AssertionError(f"summary.csv rows {sorted(rows)}, with the broken plan's error missing")
+        for name, plan in written.items():
+            row, stem = rows[name], Path(name).stem
+            build = format_and_merge(plan, heading_template(), template)
+            if row["error"] or row["weeks"] != str(weeks) or row["unmatched"] != "0":
+                raise AssertionError(f"{name}: summary row {row}")
+            if (folder / "out" / f"{stem}_formatted.html").read_text("utf-8") != format_html(plan, heading_template()):
+                raise AssertionError(f"{name}: the formatted plan differs from Format HTML Headings'")
+            if (folder / "out" / f"{stem}_moodle.html").read_text("utf-8") != build.html:
+                raise AssertionError(f"{name}: the Moodle page differs from HTML Merge to Moodle's")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--plans", type=int, default=12)
+    parser.add_argument("--weeks", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    check()
+    print("outputs match the pages; a broken plan fails on its own")
+    with tempfile.TemporaryDirectory() as folder:
+        folder = Path(folder)
+        (folder / "plans").mkdir()
+        plan_paths = [folder / "plans" / name for name in write_plans(folder / "plans", args.plans, args.weeks)]
+        template = moodle_template(args.weeks)
+        print(f"{args.plans} plans of {args.weeks} weeks")
+        print(f"{'workers':<10}{'time':>8}{'plans/s':>10}")
+        for workers in sorted({1, args.workers}):
+            start = time.perf_counter()
+            rows = batch.build_courses(plan_paths, heading_template(), template, folder / f"out{workers}", workers=workers)
+            elapsed = time.perf_counter() - start
+            if any(row["error"] for row in rows):
+                raise AssertionError(f"plans failed: {[row['error'] for row in rows if row['error']][:1]}")
+            print(f"{workers:<10}{elapsed:>7.2f}s{args.plans / elapsed:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+A repeat review of a stable course with the Activity Extractor: the first run
+extracts everything, then a reviewer edits a few activities and the extractor
+reruns with "only changes since my last run". Compares a full rerun with a
+changes-only rerun whose pages all differ byte-for-byte (a new sesskey on every
+page, so every activity is parsed again) and one revalidated through the HTTP
+cache with ETags (unchanged pages come back identical and are not parsed).
+
+    python -m benchmarks.bench_changes --activities 60 --edits 2
+"""
+import argparse
+import tempfile
+import time
+from functools import partial
+
+from benchmarks.fake_moodle import activity_urls, serve
+from toolbox.activities import extract_nextgen4_content
+from toolbox.fetch import fetch_all, fetch_page, make_session
+from toolbox.httpcache import HttpCache
+from toolbox.output import HtmlWriter
+from toolbox.snapshots import ChangeTracker, SnapshotStore, page_digest
+from toolbox.timing import recording
+
+
+def extract(urls, snapshots, changes_only, cache=None, workers=8):
+    """What the Activity Extractor does after login; returns (tracker, output bytes, fetch s, extract s, parses)."""
+    start = time.perf_counter()
+    fetch = partial(fetch_page, cache=cache, namespace="bench")
+    results = fetch_all(make_session(workers), urls, workers=workers, fetch=fetch)
+    fetched = time.perf_counter()
+    tracker = ChangeTracker(snapshots.load("activities", "bench", 1), changes_only=changes_only)
+    with recording() as recorder, HtmlWriter() as output:
+        for url, result in zip(urls, results):
+            html = tracker.item(url, url, lambda: extract_nextgen4_content(result.text), page_digest(result.text))
+            if html is not None:
+                output.write(f"<h2>{url}</h2>\n{html}\n")
+    snapshots.save("activities", "bench", 1, tracker.items)
+    parses = sum(1 for span in recorder.spans if span.name == "parse")
+    return tracker, output.size, fetched - start, time.perf_counter() - fetched, parses
+
+
+SCENARIOS = [
+    ("full rerun", dict(sesskeys=True), False, False),
+    ("changes only, new sesskeys", dict(sesskeys=True), True, False),
+    ("changes only, ETag revalidation", dict(etags=True), True, True),
+]
+
+
+def rerun(activities, edited, latency, server_options, changes_only, use_cache):
+    """
+    Extract every activity, edit the `edited` ones and extract again; returns
+    what the rerun's extract returned. Raises AssertionError unless the rerun
+    reports exactly the edited activities as changed.
+    """
+    with tempfile.TemporaryDirectory() as folder, serve(latency=latency, activities=activities,
+                                                       **server_options) as server:
+        snapshots = SnapshotStore(f"{folder}/snapshots")
+        cache = HttpCache(f"{folder}/http", ttl=0) if use_cache else None
+        urls = activity_urls(server.base_url, activities)
+        extract(urls, snapshots, changes_only=False, cache=cache)
+        for activity_id in edited:
+            server.edits[activity_id] = 1
+        run = extract(urls, snapshots, changes_only, cache=cache)
+    delta = run[0].delta()
+    if sorted(delta.changed) != sorted(urls[i - 1] for i in edited) or delta.added or delta.removed:
+        raise AssertionError(f"the rerun reported {run[0].summary()} for {len(edited)} edited activities")
+    if changes_only and use_cache and run[4] != len(edited):
+        raise AssertionError(f"parsed {run[4]} pages with only {len(edited)} changed behind unchanged ETags")
+    return run
+
+
+def check(activities=8, edited=(2, 5)):
+    """Every scenario on a small course with no latency."""
+    for _, server_options, changes_only, use_cache in SCENARIOS:
+        rerun(activities, list(edited), 0.0, server_options, changes_only, use_cache)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--activities", type=int, default=60)
+    parser.add_argument("--edits", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+    edited = list(range(1, args.activities + 1, max(1, args.activities // args.edits)))[:args.edits]
+
+    print(f"{args.activities} activities, {args.edits} edited between runs, {args.latency * 1000:.0f} ms latency")
+    print(f"{'run':<34}{'fetch':>8}{'extract':>9}{'parsed':>8}{'output':>10}  delta")
+    for label, server_options, changes_only, use_cache in SCENARIOS:
+        tracker, size, fetch_seconds, extract_seconds, parses = rerun(
+            args.activities, edited, args.latency, server_options, changes_only, use_cache,
+        )
+        print(f"{label:<34}{fetch_seconds:>7.2f}s{extract_seconds * 1000:>7.0f}ms{parses:>8}{size / 1024:>8.0f}KB  "
+              f"{tracker.summary()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Wall-clock time to fetch N activity pages, serially vs. on the pooled fetch
+engine. Every run has to come back complete and in input order, with the
+page that fails once retried. check() also cuts pages off partway: one that is
+cut once is retried, and one that always is fails without taking the rest down.
+
+    python -m benchmarks.bench_fetch --latency 0.1
+"""
+import argparse
+import time
+from functools import partial
+
+from benchmarks.fake_moodle import activity_urls, serve
+from toolbox.activities import read_activity_content
+from toolbox.fetch import fetch_all, fetch_page, make_session
+
+
+def check_results(results, urls):
+    if [result.url for result in results] != urls:
+        raise AssertionError("fetch_all returned the pages out of input order")
+    errors = [result.error for result in results if result.error]
+    if errors:
+        raise AssertionError(f"{len(errors)} fetch(es) failed: {errors[0]}")
+
+
+def check_truncated(count=6, workers=4):
+    """Pages 2 and 4 are cut off partway, 2 once and 4 on every attempt, read whole and streamed."""
+    for read in (None, read_activity_content):
+        with serve(truncations={2: 1, 4: 99}) as server:
+            urls = activity_urls(server.base_url, count)
+            fetch = partial(fetch_page, read=read, backoff=0.01)
+            results = fetch_all(make_session(pool_size=workers), urls, workers=workers, fetch=fetch)
+            failed = [number for number, result in enumerate(results, 1) if result.error]
+            if failed != [4]:
+                raise AssertionError(f"pages {failed} failed, expected only the page that is always cut off")
+            short = [number for number, result in enumerate(results, 1) if not result.error and "Nested content" not in result.text]
+            if short:
+                raise AssertionError(f"pages {short} came back incomplete")
+
+
+def check(count=12, workers=4, latency=0.01):
+    """Fetch `count` pages, one of them failing once, on `workers` threads and check the results."""
+    with serve(latency=latency, failures={3: 1}) as server:
+        urls = activity_urls(server.base_url, count)
+        check_results(fetch_all(make_session(pool_size=workers), urls, workers=workers), urls)
+    check_truncated(workers=workers)
+
+
+def run(counts, worker_counts, latency):
+    with serve(latency=latency, failures={3: 1}) as server:
+        print(f"latency per request: {latency * 1000:.0f} ms")
+        print("activities  " + "  ".join(f"{w:>2} worker(s)" for w in worker_counts))
+        for count in counts:
+            urls = activity_urls(server.base_url, count)
+            row = []
+            for workers in worker_counts:
+                server.attempts.clear()
+                session = make_session(pool_size=workers)
+                start = time.perf_counter()
+                results = fetch_all(session, urls, workers=workers)
+                elapsed = time.perf_counter() - start
+                check_results(results, urls)
+                row.append(f"{elapsed:>10.2f}s")
+            print(f"{count:>10}  " + "  ".join(row))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--counts", type=int, nargs="+", default=[10, 30, 60, 120])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds of server latency per request")
+    args = parser.parse_args()
+    run(args.counts, args.workers, args.latency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Format HTML Headings on a large Word export: the original per-call template
+parse, per-tag regex and whole-string quote replaces vs. the compiled heading
+template and single-walk heading pass, with a check that both give the same HTML.
+Both parse with html.parser, as the page always has; the heading pass is then
+timed on its own, on a freshly parsed plan each run.
+
+    python -m benchmarks.bench_formatting --weeks 40 --paragraphs 8
+"""
+import argparse
+import re
+import time
+import timeit
+
+from bs4 import BeautifulSoup
+
+from benchmarks.corpus import course_plan, heading_template
+from toolbox.formatting import cached_compile_heading_template, format_html, format_soup
+
+
+def original_normalize_text(text):
+    text = text.replace('‘', "'").replace('’', "'")
+    return text.strip().lower()
+
+
+def original_retag(design_soup, template_html):
+    """The heading pass of format_html as it was written before the compiled heading template."""
+    template_soup = BeautifulSoup(template_html, 'html.parser')
+    template_headings = {
+        original_normalize_text(tag.get_text()): tag.name
+        for tag in template_soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
+    }
+    for tag in design_soup.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
+        norm_text = original_normalize_text(tag.get_text(strip=True))
+        if re.match(r'^\s*week\s+\d+\s*[:\-]', norm_text, re.IGNORECASE) is not None:
+            tag.name = 'h1'
+        elif norm_text in template_headings:
+            tag.name = template_headings[norm_text]
+    return design_soup
+
+
+def original_format_html(design_html, template_html):
+    """format_html as it was written before the compiled heading template."""
+    design_soup = original_retag(BeautifulSoup(design_html, 'html.parser'), template_html)
+    return str(design_soup).replace('‘', "'").replace('’', "'")
+
+
+def word_export(weeks, paragraphs):
+    """An unformatted plan with the curly quotes Word leaves in text, attributes and comments."""
+    plan = course_plan(weeks, paragraphs_per_section=paragraphs, formatted=False)
+    return plan.replace(
+        "<body>",
+        '<body><!-- Word’s export --><p title="Course ‘Plan’" class="MsoTitle ‘quoted’">Plan’s title</p>',
+    )
+
+
+def check(weeks=4, paragraphs=4):
+    """Raise unless format_html gives the original formatter's HTML, with no curly quotes left."""
+    plan = word_export(weeks, paragraphs)
+    template = heading_template()
+    formatted = format_html(plan, template)
+    if formatted != original_format_html(plan, template):
+        raise AssertionError("format_html output differs from the original formatter's")
+    if "‘" in formatted or "’" in formatted:
+        raise AssertionError("format_html left curly quotes in the output")
+
+
+def best_pass(retag, plan, repeat):
+    """The best of `repeat` runs of `retag(soup)`, each on a fresh parse of `plan` that is not timed."""
+    times = []
+    for _ in range(repeat):
+        soup = BeautifulSoup(plan, 'html.parser')
+        start = time.perf_counter()
+        retag(soup)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weeks", type=int, default=40)
+    parser.add_argument("--paragraphs", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    check()
+    plan = word_export(args.weeks, args.paragraphs)
+    template = heading_template()
+    headings = cached_compile_heading_template(template)
+    print(f"{args.weeks}-week plan, {plan.count('<p') / 1e3:.1f}k paragraphs, {len(plan) / 1e6:.1f} MB; "
+          "output matches the original formatter")
+    original = min(timeit.repeat(lambda: original_format_html(plan, template), number=1, repeat=args.repeat))
+    compiled = min(timeit.repeat(lambda: format_html(plan, template), number=1, repeat=args.repeat))
+    print(f"{'':<16}{'format_html':>13}{'heading pass':>14}")
+    print(f"{'original':<16}{original * 1000:>10.1f} ms"
+          f"{best_pass(lambda soup: original_retag(soup, template), plan, args.repeat) * 1000:>11.1f} ms")
+    print(f"{'compiled':<16}{compiled * 1000:>10.1f} ms"
+          f"{best_pass(lambda soup: format_soup(soup, headings), plan, args.repeat) * 1000:>11.1f} ms")
+    # Parsing and serializing dominate format_html, so the faster heading pass moves the total much less.
+    print(f"end to end, format_html takes {compiled / original:.0%} of the original's time")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Repeat Activity Extractor runs through the persistent page cache: a cold run,
+a repeat inside the TTL, ETag revalidation, content-hash revalidation after the
+TTL, and LRU eviction under a small size budget.
+
+    python -m benchmarks.bench_httpcache --activities 30 --latency 0.05
+"""
+import argparse
+import tempfile
+import time
+from functools import partial
+
+from benchmarks.fake_moodle import activity_urls, serve
+from toolbox.fetch import fetch_all, fetch_page, make_session
+from toolbox.httpcache import HttpCache
+
+
+def run(server, cache, urls):
+    requests_before, bytes_before = server.requests, server.bytes_sent
+    stats = cache.stats.copy()
+    start = time.perf_counter()
+    results = fetch_all(make_session(), urls, fetch=partial(fetch_page, cache=cache, namespace="designer"))
+    elapsed = time.perf_counter() - start
+    failed = [result.url for result in results if result.error or "NextGen4" not in result.text]
+    if failed:
+        raise AssertionError(f"{len(failed)} page(s) came back wrong through the cache, first {failed[0]}")
+    run_stats = cache.stats - stats
+    return elapsed, server.requests - requests_before, server.bytes_sent - bytes_before, run_stats
+
+
+def expect(step, outcome, requests, stats, sent=None):
+    """Raise unless a run made `requests` requests with these cache `stats` and, if given, `sent` bytes."""
+    _, made, bytes_sent, run_stats = outcome
+    if made != requests or dict(run_stats) != stats or sent not in (None, bytes_sent):
+        raise AssertionError(f"{step}: {made} requests, {bytes_sent} bytes sent, {dict(run_stats)}; "
+                             f"expected {requests} requests and {stats}")
+
+
+def check(activities=4):
+    """The cache's outcome and the server's traffic for each kind of repeat run, then LRU eviction."""
+    with serve(etags=False) as server, tempfile.TemporaryDirectory() as directory:
+        urls = activity_urls(server.base_url, activities)
+        cache = HttpCache(directory)
+        expect("cold", run(server, cache, urls), activities, {"misses": activities})
+        expect("repeat", run(server, cache, urls), 0, {"fresh": activities})
+        cache.ttl = 0
+        expect("repeat after TTL", run(server, cache, urls), activities, {"unchanged": activities})
+    with serve(etags=True) as server, tempfile.TemporaryDirectory() as directory:
+        urls = activity_urls(server.base_url, activities)
+        cache = HttpCache(directory)
+        run(server, cache, urls)
+        expect("ETag repeat", run(server, cache, urls), activities, {"revalidated": activities}, sent=0)
+    with serve() as server, tempfile.TemporaryDirectory() as directory:
+        urls = activity_urls(server.base_url, 2 * activities)
+        budget = activities * len(make_session().get(urls[0]).content)
+        cache = HttpCache(directory, max_bytes=budget)
+        run(server, cache, urls)
+        if not 0 < cache.store.size <= budget:
+            raise AssertionError(f"{cache.store.size} bytes cached under a {budget}-byte budget")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--activities", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    print(f"{'run':<34}{'time':>7}{'requests':>10}{'KB sent':>9}  cache")
+    for etags in [False, True]:
+        with serve(latency=args.latency, etags=etags) as server, tempfile.TemporaryDirectory() as directory:
+            urls = activity_urls(server.base_url, args.activities)
+            cache = HttpCache(directory)
+            label = "ETag" if etags else "no validators"
+            steps = [(f"{label}: cold", None), (f"{label}: repeat", None)]
+            if not etags:
+                steps.append((f"{label}: repeat after TTL", lambda: setattr(cache, "ttl", 0)))
+            for step, before in steps:
+                if before:
+                    before()
+                elapsed, requests, sent, stats = run(server, cache, urls)
+                print(f"{step:<34}{elapsed:>6.2f}s{requests:>10}{sent / 1e3:>9.0f}  {dict(stats)}")
+
+    with serve() as server, tempfile.TemporaryDirectory() as directory:
+        urls = activity_urls(server.base_url, args.activities)
+        budget = 10 * len(make_session().get(urls[0]).content)
+        cache = HttpCache(directory, max_bytes=budget)
+        run(server, cache, urls)
+        if cache.store.size > budget:
+            raise AssertionError(f"{cache.store.size} bytes cached under a {budget}-byte budget")
+        print(f"LRU eviction: {args.activities} pages cached under a {budget / 1e3:.0f} KB budget -> "
+              f"{cache.store.size / 1e3:.0f} KB kept")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Cold-start import time of each page, kept under a budget. Every page is timed
+in a fresh interpreter: Streamlit, which every page needs, is imported first,
+then the page's own top-level imports are run and timed. Also checks that the
+toolbox package imports without Streamlit, pandas, BeautifulSoup or requests,
+which are only loaded when a tool first uses them. Exits non-zero when a page
+is over budget or a heavy module is imported eagerly.
+
+    python -m benchmarks.bench_imports --repeat 5
+"""
+import argparse
+import ast
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Milliseconds for each page's imports after Streamlit, with room for a slower machine.
+BUDGET_MS = {
+    "1_": 50,
+    "2_": 50,
+    "3_": 75,
+    "4_": 50,
+    "6_": 50,
+}
+
+CORE_MODULES = [
+    "toolbox.activities", "toolbox.assets", "toolbox.batch", "toolbox.diskcache", "toolbox.fetch", "toolbox.formatting",
+    "toolbox.httpcache", "toolbox.images", "toolbox.jobs", "toolbox.memo", "toolbox.merge", "toolbox.moodle",
+    "toolbox.output", "toolbox.panels", "toolbox.parsing", "toolbox.pipeline", "toolbox.sections", "toolbox.snapshots",
+    "toolbox.timing", "toolbox.wordclean",
+]
+LAZY_MODULES = ["streamlit", "pandas", "bs4", "requests"]
+
+TIMER = """
+import sys, time
+import streamlit
+start = time.perf_counter()
+exec(compile(sys.argv[1], "imports", "exec"))
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+def page_imports(path):
+    """The top-level import statements of a page, except Streamlit's."""
+    tree = ast.parse(path.read_text(encoding="utf-8"))
+    imports = [
+        node for node in tree.body
+        if isinstance(node, (ast.Import, ast.ImportFrom))
+        and not any(alias.name.startswith("streamlit") for alias in node.names)
+        and not (isinstance(node, ast.ImportFrom) and (node.module or "").startswith("streamlit"))
+    ]
+    return "\n".join(ast.unparse(node) for node in imports)
+
+
+def import_ms(source):
+    output = subprocess.run(
+        [sys.executable, "-c", TIMER, source], cwd=ROOT, check=True, capture_output=True, text=True,
+    ).stdout
+    return float(output)
+
+
+def eager_imports():
+    """Which of LAZY_MODULES are loaded by importing every toolbox module."""
+    check = (
+        f"import sys, json\nimport {', '.join(CORE_MODULES)}\n"
+        f"print(json.dumps([name for name in {LAZY_MODULES!r} if name in sys.modules]))"
+    )
+    output = subprocess.run([sys.executable, "-c", check], cwd=ROOT, check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def check():
+    """Raise AssertionError if importing the toolbox loads any of LAZY_MODULES; the timing budgets are left to main."""
+    eager = eager_imports()
+    if eager:
+        raise AssertionError(f"the toolbox imports {', '.join(eager)} eagerly")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'page':<36}{'imports':>10}{'budget':>10}")
+    for prefix, budget in BUDGET_MS.items():
+        path = next((ROOT / "pages").glob(f"{prefix}*.py"))
+        source = page_imports(path)
+        ms = min(import_ms(source) for _ in range(args.repeat))
+        print(f"{path.stem:<36}{ms:>8.0f}ms{budget:>8}ms")
+        if ms > budget:
+            failures.append(f"{path.stem} imports take {ms:.0f} ms, over the {budget} ms budget")
+
+    eager = eager_imports()
+    print(f"\nloaded by importing the toolbox: {', '.join(eager) or 'none of ' + ', '.join(LAZY_MODULES)}")
+    if eager:
+        failures.append(f"the toolbox imports {', '.join(eager)} eagerly")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
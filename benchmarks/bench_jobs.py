@@ -0,0 +1,243 @@
+"""
+Load test for the shared job queue: N designers use the tools at once, each
+submitting a run, waiting for it to finish and submitting the next, while one
+of them queues a burst of runs all at once. Runs alternate between an Activity
+Extractor run against the fake Moodle server and a small batch resize.
+Compares every run going inline in its own script thread, as before the queue,
+with the queue first-come first-served and with the per-user quota. Reports
+queue wait and turnaround (submit to result), for everyone and for the users
+other than the bursty one, throughput and the most runs going at once.
+check() covers the queue's rules on their own: the per-user quota, when
+finished jobs expire, the cap on kept results, and a job interrupted by
+something other than an Exception.
+
+    python -m benchmarks.bench_jobs --users 8 --runs 3 --burst 6 --workers 3
+"""
+import argparse
+import statistics
+import threading
+import time
+from functools import partial
+
+from benchmarks.corpus import image_batch
+from benchmarks.fake_moodle import activity_urls, serve
+from toolbox.activities import extract_nextgen4_content, read_activity_content
+from toolbox.fetch import fetch_all, fetch_page, make_session
+from toolbox.images import iter_resize, rendition_job
+from toolbox.jobs import DONE, FAILED, JobQueue
+
+
+class Load:
+    """Counts the runs going at once."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+
+    def __enter__(self):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+
+    def __exit__(self, *exc):
+        with self.lock:
+            self.running -= 1
+
+
+def extract_run(job, urls, load):
+    with load:
+        fetch = partial(fetch_page, read=read_activity_content)
+        results = fetch_all(make_session(8), urls, fetch=fetch)
+        return sum(len(extract_nextgen4_content(result.text)) for result in results)
+
+
+def resize_run(job, photos, load):
+    with load:
+        jobs = [(name, data, (800, 400), None) for name, data in photos]
+        return sum(len(result.renditions) for result in iter_resize(jobs, workers=1, function=rendition_job))
+
+
+class InlineJob:
+    """What a run records when it goes straight through the user's script thread."""
+
+    def __init__(self, function, *args):
+        self.submitted = self.started = time.time()
+        function(self, *args)
+        self.finished = time.time()
+        self.error = None
+
+
+def simulate(users, runs, burst, functions, queue=None, poll=0.02):
+    """Run the users' threads and return (every job, the bursty user's jobs, wall seconds)."""
+    jobs = {user: [] for user in range(users)}
+
+    def submit(user, index):
+        function, *args = functions[(user + index) % len(functions)]
+        if queue is None:
+            return InlineJob(function, *args)
+        return queue.submit("load", f"user{user}", f"run {index}", function, *args)
+
+    def wait(job):
+        while queue is not None and not job.done:
+            time.sleep(poll)
+        return job
+
+    def designer(user):
+        if user == 0:
+            for job in [submit(user, index) for index in range(burst)]:
+                jobs[user].append(wait(job))
+        else:
+            for index in range(runs):
+                jobs[user].append(wait(submit(user, index)))
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=designer, args=(user,)) for user in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    errors = [job.error for user_jobs in jobs.values() for job in user_jobs if job.error]
+    if errors:
+        raise AssertionError(f"{len(errors)} run(s) failed: {errors[0]}")
+    return [job for user_jobs in jobs.values() for job in user_jobs], jobs[0], seconds
+
+
+def wait_for(condition, what, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError(f"timed out waiting for {what}")
+        time.sleep(0.01)
+
+
+def check_quota():
+    """With one run per user, a user's second job waits while another user's later job starts."""
+    queue = JobQueue(workers=2, per_user=1)
+    release = threading.Event()
+    try:
+        first, second = (queue.submit("check", "a", "", lambda job: release.wait(10)) for _ in range(2))
+        other = queue.submit("check", "b", "", lambda job: release.wait(10))
+        wait_for(lambda: first.started and other.started, "both users' first jobs to start")
+        if second.started:
+            raise AssertionError("a user's second job started while their first was still running")
+        release.set()
+        wait_for(lambda: second.done, "the second job to run once the first finished")
+    finally:
+        release.set()
+        queue.close()
+
+
+def check_expiry():
+    """Finished jobs are dropped keep_seconds after finishing, or downloaded_keep_seconds after their download."""
+    queue = JobQueue(workers=1, keep_seconds=60, downloaded_keep_seconds=10)
+    try:
+        jobs = [queue.submit("check", "a", "", lambda job: None) for _ in range(3)]
+        wait_for(lambda: all(job.done for job in jobs), "the jobs to finish")
+        downloaded, recent, old = jobs
+        downloaded.downloaded = time.time() - 11
+        recent.finished = time.time() - 30
+        old.finished = time.time() - 61
+        if queue.jobs_for("a") != [recent]:
+            raise AssertionError(f"kept {[job.id for job in queue.jobs_for('a')]}, expected only {recent.id}")
+    finally:
+        queue.close()
+
+
+def check_result_cap():
+    """Over max_result_bytes, finished jobs are dropped downloaded first, then oldest first."""
+    queue = JobQueue(workers=1, max_result_bytes=250)
+    try:
+        jobs = []
+        for index in range(3):
+            jobs.append(queue.submit("check", "a", "", lambda job: b"x" * 100))
+            wait_for(lambda: jobs[-1].done, "a job to finish")
+        # 300 bytes: the oldest is dropped as the third finishes.
+        if [job.id for job in queue.jobs_for("a")] != [jobs[2].id, jobs[1].id]:
+            raise AssertionError(f"kept {[job.id for job in queue.jobs_for('a')]} over a 250-byte cap")
+        jobs[2].mark_downloaded()
+        jobs.append(queue.submit("check", "a", "", lambda job: b"x" * 100))
+        wait_for(lambda: jobs[-1].done, "a job to finish")
+        if [job.id for job in queue.jobs_for("a")] != [jobs[3].id, jobs[1].id]:
+            raise AssertionError("the downloaded result was not the first dropped")
+        if queue.stats()["result_bytes"] > 250:
+            raise AssertionError(f"kept {queue.stats()['result_bytes']} bytes of results over a 250-byte cap")
+    finally:
+        queue.close()
+
+
+class Interrupt(BaseException):
+    """Stands in for a KeyboardInterrupt inside a job, without interrupting the check."""
+
+
+def check_interrupted():
+    """A job ended by a BaseException is marked failed, and its worker and user's slot are freed."""
+    queue = JobQueue(workers=1, per_user=1)
+    try:
+        def interrupted(job):
+            raise Interrupt()
+
+        job = queue.submit("check", "a", "", interrupted)
+        wait_for(lambda: job.done, "the interrupted job to finish")
+        if job.status != FAILED or not job.error:
+            raise AssertionError(f"an interrupted job ended {job.status} with error {job.error!r}")
+        after = queue.submit("check", "a", "", lambda job: None)
+        wait_for(lambda: after.done, "the user's next job to run")
+        if after.status != DONE:
+            raise AssertionError(f"the user's next job ended {after.status}")
+    finally:
+        queue.close()
+
+
+def check():
+    check_quota()
+    check_expiry()
+    check_result_cap()
+    check_interrupted()
+
+
+def p95(values):
+    return sorted(values)[max(0, round(0.95 * len(values)) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--runs", type=int, default=3, help="runs per user, one after another")
+    parser.add_argument("--burst", type=int, default=6, help="runs the first user queues all at once")
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--activities", type=int, default=20)
+    parser.add_argument("--photos", type=int, default=2, help="photos per resize run")
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    with serve(latency=args.latency, activities=args.activities) as server:
+        photos = image_batch(args.photos, size=(2400, 1600))
+        urls = activity_urls(server.base_url, args.activities)
+        print(f"{args.users} users: one queues {args.burst} runs at once, the rest {args.runs} each in turn; "
+              f"runs alternate {args.activities}-activity extractions and {args.photos}-photo resizes")
+        print(f"{'scheduling':<30}{'wall':>7}{'runs/s':>8}{'peak':>6}{'wait':>8}{'p95':>8}"
+              f"{'turnaround':>12}{'p95':>8}{'others p95':>12}")
+        scenarios = [
+            ("inline in script threads", None),
+            (f"queue, {args.workers} workers, FIFO", dict(per_user=args.workers)),
+            (f"queue, {args.workers} workers, 1/user", dict(per_user=1)),
+        ]
+        for label, options in scenarios:
+            load = Load()
+            functions = [(extract_run, urls, load), (resize_run, photos, load)]
+            queue = JobQueue(workers=args.workers, **options) if options is not None else None
+            jobs, burst_jobs, seconds = simulate(args.users, args.runs, args.burst, functions, queue)
+            if queue is not None:
+                queue.close()
+            waits = [job.started - job.submitted for job in jobs]
+            turnarounds = [job.finished - job.submitted for job in jobs]
+            others = [job.finished - job.submitted for job in jobs if job not in burst_jobs]
+            print(f"{label:<30}{seconds:>6.1f}s{len(jobs) / seconds:>8.2f}{load.peak:>6}"
+                  f"{statistics.mean(waits):>7.2f}s{p95(waits):>7.2f}s"
+                  f"{statistics.mean(turnarounds):>11.2f}s{p95(turnarounds):>7.2f}s{p95(others):>11.2f}s")
+
+
+if __name__ == "__main__":
+    main()
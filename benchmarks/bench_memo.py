@@ -0,0 +1,112 @@
+"""
+What a Streamlit rerun costs with the same uploads: the format, merge and
+resize steps run cold and then again with their results memoized (format and
+merge) or served from the rendition cache (resize).
+
+    python -m benchmarks.bench_memo --weeks 16 --images 6
+"""
+import argparse
+import tempfile
+import time
+
+from benchmarks.bench_resize import make_photos
+from benchmarks.corpus import course_plan, heading_template, image_batch, moodle_template
+from toolbox import memo
+from toolbox.formatting import cached_format_html, format_html
+from toolbox.images import RenditionCache, iter_resize, rendition_job
+from toolbox.merge import compile_template, extract_content_by_tags, merge_html, render_template
+
+
+def timed(step):
+    start = time.perf_counter()
+    result = step()
+    return result, time.perf_counter() - start
+
+
+def check_eviction():
+    """A memo smaller than the working set evicts the least recently used results."""
+    small = memo.Memo("bench-eviction", max_bytes=8000)
+    for i in range(100):
+        small.put(i, "x" * 1000)
+    if small.size > small.max_bytes or not small.get(99) or small.get(0) is not None:
+        raise AssertionError(f"a {small.max_bytes}-byte memo kept {small.size} bytes or evicted the wrong results")
+    return small
+
+
+def check(weeks=3, images=2):
+    """Memoized and cached steps give the uncached results, and a rerun is answered without recomputing."""
+    plan, headings, template = course_plan(weeks, formatted=False), heading_template(), moodle_template(weeks)
+    formatted = format_html(plan, headings)
+    if cached_format_html(plan, headings) != formatted:
+        raise AssertionError("the memoized format differs from format_html")
+    hits = cached_format_html.memo.stats["hits"]
+    cached_format_html(plan, headings)
+    if cached_format_html.memo.stats["hits"] != hits + 1:
+        raise AssertionError("a rerun of the same format was not a memo hit")
+    if merge_html(formatted, template)[1:] != render_template(compile_template(template), extract_content_by_tags(formatted)):
+        raise AssertionError("the memoized merge differs from the uncached one")
+
+    jobs = [(name, data, (400, 200), None) for name, data in image_batch(images, size=(1200, 800))]
+    expected = [result.renditions for result in iter_resize(jobs, function=rendition_job)]
+    with tempfile.TemporaryDirectory() as folder:
+        renditions = RenditionCache(folder)
+        for run, outcome in [("first run", "resized"), ("rerun", "hits")]:
+            before = renditions.stats.copy()
+            results = [result.renditions for result in iter_resize(jobs, cache=renditions, function=rendition_job)]
+            if results != expected:
+                raise AssertionError(f"resize {run} through the rendition cache differs from the uncached resize")
+            if renditions.stats - before != {outcome: 2 * images}:
+                raise AssertionError(f"resize {run}: {dict(renditions.stats - before)}, expected {2 * images} {outcome}")
+    check_eviction()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weeks", type=int, default=16)
+    parser.add_argument("--images", type=int, default=6)
+    parser.add_argument("--reruns", type=int, default=5)
+    args = parser.parse_args()
+
+    plan = course_plan(args.weeks, formatted=False)
+    headings = heading_template()
+    template = moodle_template(args.weeks)
+    with tempfile.TemporaryDirectory() as folder:
+        jobs = [(path.name, path.read_bytes(), (800,), None) for path in make_photos(folder, args.images)]
+    cache_dir = tempfile.TemporaryDirectory()
+    renditions = RenditionCache(cache_dir.name)
+
+    formatted = format_html(plan, headings)
+    steps = {
+        "format": (
+            lambda: format_html(plan, headings),
+            lambda: cached_format_html(plan, headings),
+        ),
+        "merge": (
+            lambda: render_template(compile_template(template), extract_content_by_tags(formatted)),
+            lambda: merge_html(formatted, template)[1:],
+        ),
+        "resize": (
+            lambda: [result.renditions for result in iter_resize(jobs, function=rendition_job)],
+            lambda: [result.renditions for result in iter_resize(jobs, cache=renditions, function=rendition_job)],
+        ),
+    }
+    print(f"{args.weeks}-week plan ({len(plan) / 1e3:.0f} KB), {args.images} photos, {args.reruns} reruns each")
+    print(f"{'step':<10}{'uncached':>12}{'first':>12}{'rerun':>12}")
+    for label, (uncached, cached) in steps.items():
+        expected, cold = timed(uncached)
+        first, first_seconds = timed(cached)
+        if first != expected:
+            raise AssertionError(f"{label}: the cached result differs from the uncached one")
+        warm = min(timed(cached)[1] for _ in range(args.reruns))
+        print(f"{label:<10}{cold * 1000:>10.1f}ms{first_seconds * 1000:>10.1f}ms{warm * 1000:>10.2f}ms")
+    print()
+    print(memo.summary().replace("\n\n", "\n"))
+    print(renditions.summary())
+    cache_dir.cleanup()
+
+    small = check_eviction()
+    print(small.summary(), f"({small.stats['evictions']} evictions)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Peak memory of the Image Resizer as the batch grows. Each run is a fresh
+process that holds the uploads in memory, as Streamlit does, and streams every
+rendition into the zip, once with the worker pool and once one image at a time.
+Peak RSS above the uploads themselves should stay flat as the batch grows.
+
+    python -m benchmarks.bench_memory --sizes 2 4 8 --megapixels 20
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from PIL import Image
+
+from toolbox.images import ImageTooLarge, inspect_image, iter_resize, rendition_job
+from toolbox.output import ZipWriter
+
+WIDTHS = (400, 800, 1900)
+
+
+def make_png(path, megapixels):
+    """A photo-like PNG of about `megapixels`, the kind a screenshot or scan export produces."""
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    size = (width, width * 3 // 4)
+    gradient = Image.linear_gradient("L").resize(size)
+    noise = Image.effect_noise(size, 12)
+    Image.merge("RGB", (gradient, noise, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT))).save(path, compress_level=1)
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process and of its largest finished child, in MB."""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return own / 1024, children / 1024
+
+
+def run_child(source, count, workers):
+    """What the page does for `count` uploads: inspect, resize every width, write the zip."""
+    uploads = []
+    for _ in range(count):
+        upload = io.BytesIO(Path(source).read_bytes())
+        upload.name = Path(source).name
+        uploads.append(upload)
+    held = sum(len(upload.getvalue()) for upload in uploads) / 1e6
+
+    def jobs():
+        for upload in uploads:
+            info = inspect_image(upload)
+            yield upload.name, upload.getvalue(), tuple(w for w in WIDTHS if w <= info.width), None
+
+    with ZipWriter() as archive:
+        for result in iter_resize(jobs(), workers=workers, function=rendition_job):
+            if result.error:
+                raise AssertionError(f"{result.name}: {result.error}")
+            for rendition in result.renditions:
+                archive.write(rendition.name, rendition.data)
+        size = len(archive.getvalue())
+    own, children = peak_rss_mb()
+    print(json.dumps({"held": held, "own": own, "children": children, "zip": size / 1e6}))
+
+
+def measure(source, count, workers):
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_memory", "--child", str(source), str(count), str(workers)],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output)
+
+
+def check_pixel_limit(source, limit):
+    """Raise unless `source`, over a `limit`-pixel limit, is refused with ImageTooLarge; return the refusal."""
+    result = subprocess.run(
+        [sys.executable, "-c", f"from toolbox.images import inspect_image; inspect_image({str(source)!r})"],
+        env=dict(os.environ, TOOLBOX_MAX_IMAGE_PIXELS=str(limit)),
+        capture_output=True, text=True,
+    )
+    if not result.returncode or ImageTooLarge.__name__ not in result.stderr:
+        raise AssertionError(f"an image over the {limit}-pixel limit was not refused: {result.stderr.strip()[-200:]}")
+    return result.stderr.strip().splitlines()[-1]
+
+
+def check(megapixels=1):
+    """The pool and one-at-a-time modes write the same zip, and an image over the pixel limit is refused."""
+    with tempfile.TemporaryDirectory() as folder:
+        source = Path(folder) / "scan.png"
+        make_png(source, megapixels)
+        pooled, serial = (measure(source, 2, workers)["zip"] for workers in (2, 1))
+        if not pooled or pooled != serial:
+            raise AssertionError(f"the pool wrote a {pooled:.3f} MB zip, one at a time {serial:.3f} MB")
+        check_pixel_limit(source, int(megapixels * 1e6 / 2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--megapixels", type=float, default=20)
+    parser.add_argument("--workers", type=int, default=max(2, os.cpu_count() or 1))
+    parser.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        run_child(args.child[0], int(args.child[1]), int(args.child[2]))
+        return
+
+    with tempfile.TemporaryDirectory() as folder:
+        source = Path(folder) / "scan.png"
+        make_png(source, args.megapixels)
+        print(f"{args.megapixels:.0f} MP PNG uploads ({source.stat().st_size / 1e6:.1f} MB each) -> {', '.join(map(str, WIDTHS))} wide")
+        # Forked workers share the parent's pages, so their RSS counts the held uploads too.
+        print(f"{'mode':<22}{'uploads':>8}{'held':>9}{'peak':>9}{'above held':>12}{'worker above held':>19}")
+        for label, workers in [(f"pool, {args.workers} workers", args.workers), ("one at a time", 1)]:
+            for count in args.sizes:
+                run = measure(source, count, workers)
+                worker = f"{run['children'] - run['held']:.0f}MB" if run["children"] else "-"
+                print(f"{label:<22}{count:>8}{run['held']:>7.0f}MB{run['own']:>7.0f}MB"
+                      f"{run['own'] - run['held']:>10.0f}MB{worker:>19}")
+
+        # An image over the pixel limit is refused from its header, before decoding.
+        print(f"pixel limit: {check_pixel_limit(source, int(args.megapixels * 1e6 / 2))}")
+
+
+if __name__ == "__main__":
+    main()
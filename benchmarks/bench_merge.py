@@ -0,0 +1,63 @@
+"""
+Time to fill a 16-week Moodle template: six str.replace passes per week vs.
+the compiled single-pass renderer.
+
+    python -m benchmarks.bench_merge --weeks 16
+"""
+import argparse
+import timeit
+
+from benchmarks.corpus import moodle_template, weeks_data
+from toolbox.merge import compile_template, render_template
+
+
+def replace_passes(template_html, weeks_data):
+    """The merge as it was written before the template compiler."""
+    for i, week_data in enumerate(weeks_data, start=1):
+        template_html = template_html.replace(f"[contentOverview{i}]", week_data['overview'])
+        template_html = template_html.replace(f"[contentWLG{i}]", week_data['learning_goals'])
+        template_html = template_html.replace(f"[contentTopics{i}]", week_data['key_topics'])
+        template_html = template_html.replace(f"[contentResources{i}]", week_data['resources'])
+        template_html = template_html.replace(f"[contentSignificance{i}]", week_data['significance'])
+        template_html = template_html.replace(f"[contentWhatsNext{i}]", week_data['whats_next'])
+    return template_html
+
+
+def check_render(template, data):
+    """Render `data` into `template`, raising unless it matches the replace passes with every placeholder filled."""
+    html, report = render_template(compile_template(template), data)
+    if html != replace_passes(template, data):
+        raise AssertionError("the compiled renderer's output differs from the str.replace passes")
+    if report.unmatched or report.unused:
+        raise AssertionError(f"unmatched placeholders {report.unmatched[:3]}, unused fields {report.unused[:3]}")
+    return html
+
+
+def check(weeks=4):
+    check_render(moodle_template(weeks), weeks_data(weeks))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weeks", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    template = moodle_template(args.weeks)
+    data = weeks_data(args.weeks)
+    html = check_render(template, data)
+    compiled = compile_template(template)
+
+    cases = {
+        "str.replace passes": lambda: replace_passes(template, data),
+        "compile + render": lambda: render_template(compile_template(template), data),
+        "render (precompiled)": lambda: render_template(compiled, data),
+    }
+    print(f"{args.weeks}-week template, {len(template) / 1e3:.0f} KB template, {len(html) / 1e3:.0f} KB output")
+    for label, case in cases.items():
+        seconds = min(timeit.repeat(case, number=args.repeat, repeat=3)) / args.repeat
+        print(f"{label:<22}{seconds * 1000:>8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Peak memory and time to assemble a synthetic course export, by repeated
+string concatenation vs. HtmlWriter.
+
+    python -m benchmarks.bench_output --activities 200
+"""
+import argparse
+import time
+import tracemalloc
+
+from toolbox.output import SPOOL_MAX_MEMORY, HtmlWriter
+
+
+def synthetic_activities(count, paragraphs):
+    body = "".join(
+        f"<p>Paragraph {n} of the activity instructions, with enough text to resemble a real page.</p>\n"
+        for n in range(paragraphs)
+    )
+    return [(f"Activity {i}", f'<div class="NextGen4 TU-activity-page">\n{body}</div>') for i in range(1, count + 1)]
+
+
+def build_concat(activities):
+    combined_html = "<html>\n<head><meta charset='UTF-8'></head>\n<body>\n"
+    for title, html in activities:
+        combined_html += f"<h2>{title}</h2>\n{html}\n"
+    combined_html += "</body>\n</html>"
+    return combined_html.encode("utf-8")
+
+
+def build_writer(activities, max_memory=SPOOL_MAX_MEMORY):
+    with HtmlWriter(max_memory) as combined_html:
+        combined_html.write("<html>\n<head><meta charset='UTF-8'></head>\n<body>\n")
+        for title, html in activities:
+            combined_html.write(f"<h2>{title}</h2>\n{html}\n")
+        combined_html.write("</body>\n</html>")
+        data = combined_html.getvalue()
+        if combined_html.size != len(data):
+            raise AssertionError(f"HtmlWriter counted {combined_html.size} bytes but holds {len(data)}")
+        return data
+
+
+def check(activities=20, paragraphs=20):
+    """Raise unless HtmlWriter gives the concatenated bytes, both held in memory and spilled to disk."""
+    activities = synthetic_activities(activities, paragraphs)
+    # Curly quotes, so sizes are counted in bytes rather than characters.
+    activities.append(("Week’s wrap-up", "<p>‘Quoted’ text.</p>"))
+    expected = build_concat(activities)
+    for max_memory in (SPOOL_MAX_MEMORY, 1024):
+        if build_writer(activities, max_memory) != expected:
+            raise AssertionError(f"HtmlWriter output differs from concatenation with max_memory={max_memory}")
+
+
+def measure(build, activities):
+    tracemalloc.start()
+    start = time.perf_counter()
+    data = build(activities)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return data, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--activities", type=int, default=200)
+    parser.add_argument("--paragraphs", type=int, default=400, help="paragraphs per activity")
+    args = parser.parse_args()
+
+    check()
+    activities = synthetic_activities(args.activities, args.paragraphs)
+    results = {name: measure(build, activities) for name, build in [("concat", build_concat), ("HtmlWriter", build_writer)]}
+    if results["concat"][0] != results["HtmlWriter"][0]:
+        raise AssertionError("HtmlWriter output differs from concatenation")
+
+    size = len(results["concat"][0])
+    print(f"{args.activities} activities, {size / 1e6:.1f} MB output")
+    print(f"{'method':<12}{'time':>10}{'peak extra memory':>20}")
+    for name, (_, elapsed, peak) in results.items():
+        print(f"{name:<12}{elapsed:>9.3f}s{peak / 1e6:>17.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
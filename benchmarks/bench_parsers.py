@@ -0,0 +1,104 @@
+"""
+Parse time per tool with each available BeautifulSoup parser, on realistic
+plan and Moodle pages, plus a parity check that every tool's output, compared
+byte for byte, is the same whichever parser toolbox.parsing picks. Word plans
+are in the check because their conditional comments are what parsers disagree
+on most.
+
+    python -m benchmarks.bench_parsers
+"""
+import argparse
+import importlib.util
+import timeit
+
+from benchmarks.corpus import course_plan, heading_template, word_plan
+from benchmarks.fake_moodle import activity_page, course_page, gradebook_page, login_page
+from toolbox import parsing
+from toolbox.activities import extract_nextgen4_content
+from toolbox.formatting import format_html
+from toolbox.merge import extract_content_by_tags
+from toolbox.sections import extract_section_html, index_sections, verify_page_loaded
+
+PARSERS = [parser for parser in ["html.parser", "lxml", "html5lib"] if parser == "html.parser" or importlib.util.find_spec(parser)]
+
+
+def tool_cases(weeks, activities):
+    plan = course_plan(weeks, formatted=False)
+    formatted_plan = course_plan(weeks)
+    word = word_plan(weeks)
+    formatted_word = format_html(word, heading_template())
+    # A plan pasted without its <html> and <body>, which lxml would add back.
+    fragment = plan[plan.index("<body>") + len("<body>"):plan.index("</body>")]
+    course = course_page(weeks)
+    gradebook = gradebook_page("https://moodle.example", activities)
+    activity = activity_page(1)
+    return [
+        ("Format HTML Headings", plan, lambda: format_html(plan, heading_template())),
+        ("Format HTML Headings (Word)", word, lambda: format_html(word, heading_template())),
+        ("Format HTML Headings (fragment)", fragment, lambda: format_html(fragment, heading_template())),
+        ("HTML Merge", formatted_plan, lambda: extract_content_by_tags(formatted_plan)),
+        ("HTML Merge (Word)", formatted_word, lambda: extract_content_by_tags(formatted_word)),
+        ("Sections Extractor", course, lambda: sections_output(course, weeks)),
+        ("Activity Extractor (gradebook)", gradebook, lambda: [
+            (a.get_text(strip=True), a["href"]) for a in parsing.make_soup(gradebook).select("a.gradeitemheader")
+        ]),
+        ("Activity Extractor (activity)", activity, lambda: extract_nextgen4_content(activity)),
+        ("Login token", login_page(), lambda: parsing.make_soup(login_page()).find("input", {"name": "logintoken"})["value"]),
+    ]
+
+
+def sections_output(course, weeks):
+    sections = index_sections(course)
+    if not verify_page_loaded(sections):
+        raise AssertionError("course page has no sections")
+    return [extract_section_html(sections, n) for n in range(1, weeks + 1)]
+
+
+def outputs_by_parser(run):
+    """What `run` returns with make_soup set to each parser in turn."""
+    default, outputs = parsing.PARSER, {}
+    try:
+        for parser in PARSERS:
+            parsing.PARSER = parser
+            outputs[parser] = run()
+    finally:
+        parsing.PARSER = default
+    return outputs
+
+
+def same_output(outputs):
+    return all(output == outputs["html.parser"] for output in outputs.values())
+
+
+def check(weeks=4, activities=10):
+    """Raise AssertionError if any tool's output depends on the parser make_soup uses."""
+    failures = [label for label, _, run in tool_cases(weeks, activities) if not same_output(outputs_by_parser(run))]
+    if failures:
+        raise AssertionError(f"parser parity failed for: {', '.join(failures)}")
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument("--weeks", type=int, default=16)
+    argparser.add_argument("--activities", type=int, default=60)
+    argparser.add_argument("--repeat", type=int, default=5)
+    args = argparser.parse_args()
+
+    print(f"parsers: {', '.join(PARSERS)} (make_soup uses {parsing.PARSER})")
+    print(f"{'tool':<32}{'KB':>6}" + "".join(f"{parser:>13}" for parser in PARSERS) + "  parity")
+    failures = []
+    for label, markup, run in tool_cases(args.weeks, args.activities):
+        row = f"{label:<32}{len(markup) / 1e3:>6.0f}"
+        for parser in PARSERS:
+            seconds = min(timeit.repeat(lambda: parsing.make_soup(markup, parser=parser), number=1, repeat=args.repeat))
+            row += f"{seconds * 1000:>11.1f}ms"
+        same = same_output(outputs_by_parser(run))
+        if not same:
+            failures.append(label)
+        print(row + ("  ok" if same else "  DIFFERS"))
+    if failures:
+        raise SystemExit(f"parser parity failed for: {', '.join(failures)}")
+
+
+if __name__ == "__main__":
+    main()
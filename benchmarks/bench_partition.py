@@ -0,0 +1,117 @@
+"""
+Scaling of extract_content_by_tags with course length: the original
+find_next/next_siblings chain vs. the one-pass partitioner. Both must produce
+identical weeks_data. "sparse" plans have week headings but no section
+headings yet, so every find_next runs to the end of the document.
+
+    python -m benchmarks.bench_partition --weeks 8 16 32 64
+"""
+import argparse
+import re
+import time
+
+from bs4 import BeautifulSoup
+
+from benchmarks.corpus import WEEK_SECTIONS, course_plan, heading_template, word_plan
+from toolbox.formatting import format_html
+from toolbox.merge import extract_content_by_tags, weeks_data_from_soup
+
+
+def chained_extract(html_content):
+    """extract_content_by_tags as it was written before the partitioner, minus parsing."""
+    soup = html_content if isinstance(html_content, BeautifulSoup) else BeautifulSoup(html_content, 'html.parser')
+    weeks_data = []
+    for week in soup.find_all('h1'):
+        overview_tag = week.find_next('h3')
+        learning_goals_tag = overview_tag.find_next('h4') if overview_tag else None
+        key_topics_tag = learning_goals_tag.find_next('h4') if learning_goals_tag else None
+        resources_tag = key_topics_tag.find_next('h4') if key_topics_tag else None
+        significance_tag = resources_tag.find_next('h4') if resources_tag else None
+        whats_next_tag = significance_tag.find_next('h4') if significance_tag else None
+        weeks_data.append({
+            'week': week.get_text(strip=True),
+            'overview': section_content(overview_tag, ['h3', 'h4', 'h1']),
+            'learning_goals': section_content(learning_goals_tag, ['h4', 'h1']),
+            'key_topics': section_content(key_topics_tag, ['h4', 'h1']),
+            'resources': section_content(resources_tag, ['h4', 'h1']),
+            'significance': section_content(significance_tag, ['h4', 'h1']),
+            'whats_next': section_content(whats_next_tag, ['h1']),
+        })
+    return weeks_data
+
+
+def section_content(tag, stop_tags):
+    content = ''
+    if tag:
+        for sibling in tag.next_siblings:
+            if sibling.name in stop_tags:
+                break
+            content += str(sibling)
+    return content.strip()
+
+
+def nested_plans(weeks):
+    """
+    Formatted plans whose headings are not all siblings: a plan split across
+    Word's section divs in the middle of a week, one with every week heading
+    wrapped in its own div, and a Word plan run through Format HTML Headings.
+    """
+    html = course_plan(weeks)
+    body_start, body_end = html.index("<body>\n") + len("<body>\n"), html.index("</body>")
+    split = html.index("<h4>Key Topics for the Week</h4>")
+    yield "Word section divs", (
+        html[:body_start] + "<div class=WordSection1>\n" + html[body_start:split] + "</div>\n<div class=WordSection2>\n"
+        + html[split:body_end] + "</div>\n" + html[body_end:]
+    )
+    yield "wrapped week headings", re.sub(r"(<h1>.*?</h1>)", r'<div class="week">\1</div>', html)
+    yield "Word plan", format_html(word_plan(weeks), heading_template())
+
+
+def check_parity(label, html):
+    """Raise unless the one-pass extraction matches the chained one and found every section of every week."""
+    weeks_data = extract_content_by_tags(html)
+    if weeks_data != chained_extract(html):
+        raise AssertionError(f"{label}: one-pass weeks_data differs from the chained extraction")
+    empty = [(week["week"], field) for week in weeks_data for field, value in week.items() if not value]
+    if empty:
+        raise AssertionError(f"{label}: empty sections {empty[:3]}")
+
+
+def check(weeks=4):
+    """check_parity on every nested plan."""
+    for label, html in nested_plans(weeks):
+        check_parity(label, html)
+
+
+def timed(function, *args, repeat=5):
+    """The best of `repeat` calls, in seconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weeks", type=int, nargs="+", default=[8, 16, 32, 64])
+    args = parser.parse_args()
+
+    check()
+    print("weeks_data matches the chained extraction for plans split across divs and Word plans")
+
+    print(f"{'plan':<10}{'weeks':>6}{'KB':>8}{'chained':>12}{'one pass':>12}")
+    for label, sections in [("complete", WEEK_SECTIONS), ("sparse", [])]:
+        for weeks in args.weeks:
+            html = course_plan(weeks, sections=sections, paragraphs_per_section=3 if sections else 40)
+            if extract_content_by_tags(html) != chained_extract(html):
+                raise AssertionError(f"{label} plan, {weeks} weeks: one-pass weeks_data differs from the chained extraction")
+            soup = BeautifulSoup(html, 'html.parser')
+            chained = timed(chained_extract, soup)
+            one_pass = timed(weeks_data_from_soup, soup)
+            print(f"{label:<10}{weeks:>6}{len(html) / 1e3:>8.0f}{chained * 1000:>10.1f}ms{one_pass * 1000:>10.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+The two-page workflow (format, serialize into a base64 download link, decode
+the re-upload, parse again and merge) vs. the fused pipeline that formats and
+merges one parse tree, with a check that both produce the same course.
+
+    python -m benchmarks.bench_pipeline --weeks 16
+"""
+import argparse
+import base64
+import timeit
+
+from benchmarks.corpus import course_plan, heading_template, moodle_template, word_plan
+from toolbox.formatting import format_html
+from toolbox.merge import CourseBuild, compile_template, extract_content_by_tags, render_template
+from toolbox.pipeline import format_and_merge
+
+
+def round_trip(plan, headings, template):
+    """Format HTML Headings, download, re-upload to HTML Merge to Moodle, merge."""
+    formatted = format_html(plan, headings)
+    link = base64.b64encode(formatted.encode()).decode()
+    uploaded = base64.b64decode(link).decode("utf-8")
+    weeks_data = extract_content_by_tags(uploaded)
+    html, report = render_template(compile_template(template), weeks_data)
+    return CourseBuild(weeks_data, html, report)
+
+
+def check_plan(label, plan, headings, template):
+    """Raise unless the fused pipeline builds the round trip's course, with every placeholder filled."""
+    build = format_and_merge(plan, headings, template)
+    if build != round_trip(plan, headings, template):
+        raise AssertionError(f"{label}: the fused pipeline's course differs from the round trip's")
+    if build.report.unmatched:
+        raise AssertionError(f"{label}: unmatched placeholders {build.report.unmatched[:3]}")
+
+
+def check(weeks=3, paragraphs=3):
+    headings, template = heading_template(), moodle_template(weeks)
+    check_plan("plain plan", course_plan(weeks, paragraphs, formatted=False), headings, template)
+    check_plan("Word export", word_plan(weeks, paragraphs), headings, template)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weeks", type=int, default=16)
+    parser.add_argument("--paragraphs", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    headings = heading_template()
+    template = moodle_template(args.weeks)
+    plans = {
+        "plain plan": course_plan(args.weeks, args.paragraphs, formatted=False),
+        "Word export": word_plan(args.weeks, args.paragraphs),
+    }
+    print(f"{args.weeks} weeks{'':<10}{'round trip':>12}{'fused':>12}")
+    for label, plan in plans.items():
+        check_plan(label, plan, headings, template)
+        times = [
+            min(timeit.repeat(lambda: step(plan, headings, template), number=1, repeat=args.repeat))
+            for step in (round_trip, format_and_merge)
+        ]
+        print(f"{label:<18}{times[0] * 1000:>10.0f}ms{times[1] * 1000:>10.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
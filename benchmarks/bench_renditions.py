@@ -0,0 +1,135 @@
+"""
+All three Moodle widths from a batch of photos: one resize run per width (each
+decoding every photo again) vs. the decode-once pyramid, and JPEG vs. WebP
+output sizes, then the same batch through the rendition cache: a rerun and a
+re-upload of the same photos under new names are both served without decoding.
+
+    python -m benchmarks.bench_renditions --images 6 --quality 80
+"""
+import argparse
+import io
+import tempfile
+import time
+
+from PIL import Image
+
+from benchmarks.bench_resize import make_photos
+from benchmarks.corpus import image_batch
+from toolbox.images import RenditionCache, iter_resize, rendition_job, rendition_name, resize_batch, resize_job
+
+WIDTHS = (400, 800, 1900)
+
+
+def check_pyramid(results, photos, widths, format):
+    """Raise unless every photo got a `format` rendition, named for it, at each of `widths`, largest first."""
+    for (name, _), result in zip(photos, results):
+        if result.error:
+            raise AssertionError(f"{name}: {result.error}")
+        got = [(rendition.name, rendition.width) for rendition in result.renditions]
+        expected = [(rendition_name(name, width, format), width) for width in sorted(widths, reverse=True)]
+        if got != expected:
+            raise AssertionError(f"{name}: renditions {got}, expected {expected}")
+        for rendition in result.renditions:
+            with Image.open(io.BytesIO(rendition.data)) as image:
+                if (image.format, image.width) != (format or "JPEG", rendition.width):
+                    raise AssertionError(f"{rendition.name} is a {image.width} wide {image.format}")
+
+
+def check_close(photo, pyramid):
+    """The 800 wide JPEG from the pyramid comes from a larger width, so it is close to, not identical to, a direct resize."""
+    name, data = photo
+    direct = resize_job((rendition_name(name, 800), data, 800))
+    rendition = next(r for r in pyramid.renditions if r.width == 800)
+    if direct.name != rendition.name or abs(len(direct.data) - len(rendition.data)) >= 0.2 * len(direct.data):
+        raise AssertionError(f"the pyramid's {rendition.name} ({len(rendition.data)} bytes) is far from a direct "
+                             f"resize ({len(direct.data)} bytes)")
+
+
+def check_cache(cache, photos, widths, expected, workers=1):
+    """
+    Run `photos` through `cache` as a first run, a rerun and a renamed re-upload,
+    raising unless each gives the uncached renditions and only the first resizes.
+    Returns [(label, seconds, stats before the run)].
+    """
+    runs = []
+    batches = [
+        ("cache, first run", photos, "resized"),
+        ("cache, rerun", photos, "hits"),
+        ("cache, renamed upload", [(f"copy-of-{name}", data) for name, data in photos], "hits"),
+    ]
+    for label, batch, outcome in batches:
+        since = cache.stats.copy()
+        start = time.perf_counter()
+        jobs = [(name, data, widths, None) for name, data in batch]
+        results = list(iter_resize(jobs, workers=workers, cache=cache, function=rendition_job))
+        seconds = time.perf_counter() - start
+        if [[r.data for r in result.renditions] for result in results] != [[r.data for r in e] for e in expected]:
+            raise AssertionError(f"{label}: the cached renditions differ from the uncached ones")
+        check_pyramid(results, batch, widths, None)
+        if cache.stats - since != {outcome: len(widths) * len(photos)}:
+            raise AssertionError(f"{label}: {dict(cache.stats - since)}, expected every rendition {outcome}")
+        runs.append((label, seconds, since))
+    return runs
+
+
+def check(images=2, widths=(200, 400, 800)):
+    """The pyramid in JPEG and WebP, its closeness to a direct resize, and the rendition cache, on small photos."""
+    photos = image_batch(images, size=(1600, 1200))
+    jpeg = resize_batch([(name, data, widths, None) for name, data in photos], function=rendition_job)
+    check_pyramid(jpeg, photos, widths, None)
+    check_pyramid(resize_batch([(name, data, widths, 80) for name, data in photos], function=rendition_job),
+                  photos, widths, "WEBP")
+    check_close(photos[0], jpeg[0])
+    with tempfile.TemporaryDirectory() as cache_dir:
+        check_cache(RenditionCache(cache_dir), photos, widths, [result.renditions for result in jpeg])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=6)
+    parser.add_argument("--quality", type=int, default=80)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--noise", type=int, default=8, help="photo grain; the default is closer to a real photo than bench_resize's")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        photos = [(path.name, path.read_bytes()) for path in make_photos(folder, args.images, noise=args.noise)]
+    source_bytes = sum(len(data) for _, data in photos)
+
+    start = time.perf_counter()
+    separate = [
+        resize_batch([(rendition_name(name, width), data, width) for name, data in photos], workers=args.workers)
+        for width in WIDTHS
+    ]
+    separate_seconds = time.perf_counter() - start
+    errors = [result.error for results in separate for result in results if result.error]
+    if errors:
+        raise AssertionError(f"{len(errors)} resize(s) failed: {errors[0]}")
+
+    runs = {}
+    for label, quality in [("pyramid, JPEG", None), (f"pyramid, WebP q{args.quality}", args.quality)]:
+        start = time.perf_counter()
+        jobs = [(name, data, WIDTHS, quality) for name, data in photos]
+        results = resize_batch(jobs, workers=args.workers, function=rendition_job)
+        runs[label] = (time.perf_counter() - start, results)
+        check_pyramid(results, photos, WIDTHS, "WEBP" if quality else None)
+    check_close(photos[0], runs["pyramid, JPEG"][1][0])
+
+    print(f"{args.images} photos 4000x3000 ({source_bytes / 1e6:.1f} MB) -> widths {', '.join(map(str, WIDTHS))}")
+    print(f"{'engine':<24}{'time':>8}{'output':>10}{'saved':>8}")
+    separate_bytes = sum(len(result.data) for results in separate for result in results)
+    print(f"{'one run per width':<24}{separate_seconds:>7.2f}s{separate_bytes / 1e6:>8.2f}MB"
+          f"{1 - separate_bytes / source_bytes:>8.0%}")
+    for label, (seconds, results) in runs.items():
+        output_bytes = sum(len(r.data) for result in results for r in result.renditions)
+        print(f"{label:<24}{seconds:>7.2f}s{output_bytes / 1e6:>8.2f}MB{1 - output_bytes / source_bytes:>8.0%}")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = RenditionCache(cache_dir)
+        expected = [result.renditions for result in runs["pyramid, JPEG"][1]]
+        for label, seconds, since in check_cache(cache, photos, WIDTHS, expected, workers=args.workers):
+            print(f"{label:<24}{seconds:>7.2f}s  {cache.summary(since=since)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Throughput of the original serial resize loop vs. the draft-mode process-pool engine.
+
+    python -m benchmarks.bench_resize --images 24 --width 800
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image
+
+from benchmarks.corpus import image_batch
+from toolbox.images import resize_batch
+
+
+def make_photos(folder, count, size=(4000, 3000), noise=40):
+    """Write `count` different camera-sized JPEGs from image_batch into `folder`."""
+    paths = []
+    for name, data in image_batch(count, size=size, noise=noise):
+        path = Path(folder) / name
+        path.write_bytes(data)
+        paths.append(path)
+    return paths
+
+
+def serial_resize(input_path, output_path, base_width):
+    """The resize loop as the page ran it before the pooled engine."""
+    img = Image.open(input_path)
+    w_percent = (base_width / float(img.size[0]))
+    h_size = int((float(img.size[1]) * float(w_percent)))
+    img = img.resize((base_width, h_size), Image.Resampling.LANCZOS)
+    img.save(output_path)
+
+
+def check_results(results, jobs):
+    """Raise unless every job was resized, in job order, to its width and the aspect ratio it came in with."""
+    errors = [f"{result.name}: {result.error}" for result in results if result.error]
+    if errors:
+        raise AssertionError(f"{len(errors)} resize(s) failed: {errors[0]}")
+    if [result.name for result in results] != [job[0] for job in jobs]:
+        raise AssertionError("results came back out of job order")
+    for (name, data, width), result in zip(jobs, results):
+        with Image.open(io.BytesIO(data)) as original, Image.open(io.BytesIO(result.data)) as resized:
+            expected = (width, int(original.height * width / original.width))
+            if resized.size != expected:
+                raise AssertionError(f"{name}: resized to {resized.size}, expected {expected}")
+
+
+def check(images=3, size=(1200, 800), width=500):
+    """A small batch resized in this process and on the process pool."""
+    jobs = [(name, data, width) for name, data in image_batch(images, size=size)]
+    for workers in (1, 2):
+        check_results(resize_batch(jobs, workers=workers), jobs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", type=int, default=24)
+    parser.add_argument("--width", type=int, default=800)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        photos = make_photos(temp_dir, args.images)
+        out = Path(temp_dir) / "out"
+        out.mkdir()
+
+        start = time.perf_counter()
+        for path in photos:
+            serial_resize(path, out / f"{path.stem}-{args.width}{path.suffix}", args.width)
+        timings = {"serial (original)": time.perf_counter() - start}
+
+        jobs = [(f"{path.stem}-{args.width}{path.suffix}", path.read_bytes(), args.width) for path in photos]
+        for label, workers in [("draft, 1 process", 1), (f"draft, {args.workers} processes", args.workers)]:
+            start = time.perf_counter()
+            results = resize_batch(jobs, workers=workers)
+            timings[label] = time.perf_counter() - start
+            check_results(results, jobs)
+
+    print(f"{args.images} images 4000x3000 -> {args.width} wide")
+    print(f"{'engine':<24}{'total':>9}{'images/s':>10}")
+    for label, elapsed in timings.items():
+        print(f"{label:<24}{elapsed:>8.2f}s{args.images / elapsed:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
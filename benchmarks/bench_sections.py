@@ -0,0 +1,66 @@
+"""
+Sections Extractor cost per course length: full parse plus a find_all scan per
+section (the original approach) vs. one strained parse into a section index.
+
+    python -m benchmarks.bench_sections --weeks 7 8 10 16
+"""
+import argparse
+import timeit
+
+from benchmarks.fake_moodle import course_page
+from toolbox.parsing import make_soup
+from toolbox.sections import course_weeks, extract_section_html, index_sections
+
+
+def scanned_sections(course_html, weeks):
+    """The original extraction: verify with find_all, then find_all again per week."""
+    soup = make_soup(course_html)
+    assert soup.find_all("li", {"class": "section"})
+    output = []
+    for section_num in range(1, weeks + 1):
+        target_section = None
+        for section in soup.find_all("li", {"class": "section"}):
+            if f"section-{section_num}" in section.get("id", ""):
+                target_section = section
+                break
+        content_div = target_section.find("div", class_="NextGen4")
+        for nav in content_div.find_all("p", class_="Internal_Links"):
+            nav.decompose()
+        output.append(str(content_div))
+    return output
+
+
+def indexed_sections(course_html):
+    sections = index_sections(course_html)
+    return [extract_section_html(sections, section_num) for _, section_num in course_weeks(sections)]
+
+
+def check(weeks=(7, 8)):
+    """Raise unless the section index extracts the same weeks as the full scans, for each course length."""
+    for count in weeks:
+        html = course_page(count)
+        output = indexed_sections(html)
+        if len(output) != count:
+            raise AssertionError(f"{count}-week course: the index found {len(output)} weeks")
+        if output != scanned_sections(html, count):
+            raise AssertionError(f"{count}-week course: indexed sections differ from the full scans")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weeks", type=int, nargs="+", default=[7, 8, 10, 16])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'weeks':>6}{'KB':>7}{'full scans':>13}{'index':>10}")
+    for weeks in args.weeks:
+        html = course_page(weeks)
+        if scanned_sections(html, weeks) != indexed_sections(html):
+            raise AssertionError(f"{weeks}-week course: indexed sections differ from the full scans")
+        scanned = min(timeit.repeat(lambda: scanned_sections(html, weeks), number=1, repeat=args.repeat))
+        indexed = min(timeit.repeat(lambda: indexed_sections(html), number=1, repeat=args.repeat))
+        print(f"{weeks:>6}{len(html) / 1e3:>7.0f}{scanned * 1000:>11.1f}ms{indexed * 1000:>8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
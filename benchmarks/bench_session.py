@@ -0,0 +1,92 @@
+"""
+Repeat extractions on the shared Moodle session cache against the fake login
+endpoint: the first run logs in, repeats reuse the session, and a session that
+Moodle expires or that sits idle too long is replaced by logging in again.
+Checks each run logged in exactly as often as that says, and that a wrong
+password gets no session.
+
+    python -m benchmarks.bench_session --latency 0.1
+"""
+import argparse
+import time
+from contextlib import contextmanager
+
+from benchmarks.fake_moodle import PASSWORD, serve
+from toolbox import moodle
+from toolbox.fetch import fetch_all
+
+
+def extraction(username, password, activity_count):
+    """The Activity Extractor's network work: gradebook fetch, then every activity."""
+    response = moodle.fetch(username, password, f"{moodle.MOODLE_URL}/grade/edit/tree/index.php?id=1")
+    if response is None or response.status_code != 200 or "gradeitemheader" not in response.text:
+        raise AssertionError("the gradebook did not load on the shared session")
+    urls = [f"{moodle.MOODLE_URL}/mod/page/view.php?id={i}" for i in range(1, activity_count + 1)]
+    results = fetch_all(moodle.get_session(username, password), urls)
+    if any(result.error or "NextGen4" not in result.text for result in results):
+        raise AssertionError("an activity did not load on the shared session")
+
+
+def idle_past_expiry():
+    moodle.SESSION_IDLE_SECONDS = 1
+    time.sleep(1.1)
+
+
+@contextmanager
+def moodle_at(server):
+    """Point toolbox.moodle at the fake server, with no cached sessions, and put it back afterwards."""
+    saved = moodle.MOODLE_URL, moodle.LOGIN_URL, moodle.SESSION_IDLE_SECONDS, dict(moodle._sessions)
+    moodle.MOODLE_URL = server.base_url
+    moodle.LOGIN_URL = f"{server.base_url}/login/index.php"
+    moodle._sessions.clear()
+    try:
+        yield
+    finally:
+        moodle.MOODLE_URL, moodle.LOGIN_URL, moodle.SESSION_IDLE_SECONDS, sessions = saved
+        moodle._sessions.clear()
+        moodle._sessions.update(sessions)
+
+
+def runs(server, activities):
+    """Yield (label, seconds, logins) for each run, raising AssertionError if one logged in more or less than it should."""
+    if moodle.get_session("designer", "wrong password") is not None:
+        raise AssertionError("a wrong password got a session")
+    for label, before, expected_logins in [
+        ("first (logs in)", None, 1),
+        ("repeat (cached session)", None, 0),
+        ("after Moodle expired it", server.sessions.clear, 1),
+        ("after idle expiry", idle_past_expiry, 1),
+    ]:
+        if before:
+            before()
+        logins = server.logins
+        start = time.perf_counter()
+        extraction("designer", PASSWORD, activities)
+        elapsed = time.perf_counter() - start
+        moodle.SESSION_IDLE_SECONDS = 30 * 60
+        if server.logins - logins != expected_logins:
+            raise AssertionError(f"{label}: logged in {server.logins - logins} time(s), expected {expected_logins}")
+        yield label, elapsed, server.logins - logins
+
+
+def check(activities=4, latency=0.0):
+    """Every run once against a fast fake server, without printing."""
+    with serve(latency=latency, activities=activities, require_login=True) as server, moodle_at(server):
+        for _ in runs(server, activities):
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--activities", type=int, default=8)
+    args = parser.parse_args()
+
+    with serve(latency=args.latency, activities=args.activities, require_login=True) as server, moodle_at(server):
+        print(f"{'run':<28}{'time':>8}{'logins':>8}")
+        for label, elapsed, logins in runs(server, args.activities):
+            print(f"{label:<28}{elapsed:>7.2f}s{logins:>8}")
+
+
+if __name__ == "__main__":
+    main()
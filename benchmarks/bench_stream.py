@@ -0,0 +1,93 @@
+"""
+Activity pages fetched whole and parsed whole vs. streamed and cut off at the
+end of the NextGen4 div, with the same extracted content, both directly and
+through the page cache as the Activity Extractor uses it by default (cold, so
+every page is downloaded, then warm). Reports the bytes read by the client and
+sent by the server, parse time, and wall-clock time, and checks the fallback
+for a page without the div.
+
+    python -m benchmarks.bench_stream --activities 30 --footer-kb 150 --bandwidth 2000000
+"""
+import argparse
+import tempfile
+import time
+from functools import partial
+
+from benchmarks.fake_moodle import activity_urls, serve
+from toolbox.activities import extract_nextgen4_content, read_activity_content
+from toolbox.fetch import fetch_all, fetch_page, make_session
+from toolbox.httpcache import HttpCache
+from toolbox.timing import recording
+
+
+def run(server, urls, workers, read, cache=None):
+    """Fetch and extract every activity; returns (contents, seconds, client bytes, server bytes, parse seconds)."""
+    server.bytes_sent = 0
+    fetch = partial(fetch_page, read=read, cache=cache, namespace="bench")
+    with recording() as recorder:
+        start = time.perf_counter()
+        results = fetch_all(make_session(workers), urls, workers=workers, fetch=fetch)
+        contents = [extract_nextgen4_content(result.text) for result in results]
+        seconds = time.perf_counter() - start
+    if any(result.error for result in results):
+        raise AssertionError(f"fetch failed: {next(result.error for result in results if result.error)}")
+    read_bytes = sum(span.attrs.get("bytes", 0) for span in recorder.spans if span.name == "fetch")
+    parse_seconds = sum(span.seconds for span in recorder.spans if span.name == "parse")
+    return contents, seconds, read_bytes, server.bytes_sent, parse_seconds
+
+
+def stream_runs(server, urls, workers, folder):
+    """
+    Every fetch path in turn, as (label, run result) pairs. Raises
+    AssertionError if one extracts different content from the full page, if
+    the cold cache downloaded whole pages, or if a page without the div is
+    not extracted from the whole page.
+    """
+    cache = HttpCache(folder, ttl=3600)
+    runs = [
+        ("full page", run(server, urls, workers, read=None)),
+        ("streamed", run(server, urls, workers, read=read_activity_content)),
+        ("cached, cold", run(server, urls, workers, read=read_activity_content, cache=cache)),
+        ("cached, warm", run(server, urls, workers, read=read_activity_content, cache=cache)),
+    ]
+    for label, (contents, *_) in runs[1:]:
+        if contents != runs[0][1][0]:
+            raise AssertionError(f"{label}: extracted content differs from the full-page extraction")
+    if runs[2][1][3] > 1.1 * runs[1][1][3]:
+        raise AssertionError("the page cache downloaded whole pages instead of streaming them")
+
+    # A page without the div is read to the end and extracted from the whole page.
+    dashboard = fetch_page(make_session(1), f"{server.base_url}/my/", read=read_activity_content)
+    if extract_nextgen4_content(dashboard.text) != "<p>No NextGen4 TU-activity-page content found.</p>":
+        raise AssertionError("a page without the div was not extracted from the whole page")
+    return runs
+
+
+def check(activities=6, workers=4, footer_kb=150, bandwidth=20e6):
+    """Every fetch path on a few pages; `bandwidth` has to be limited for a cut-short read to send less."""
+    with serve(activities=activities, footer_kb=footer_kb, bandwidth=bandwidth) as server, \
+            tempfile.TemporaryDirectory() as folder:
+        stream_runs(server, activity_urls(server.base_url, activities), workers, folder)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--activities", type=int, default=30)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--footer-kb", type=int, default=150, help="end-of-body scripts per page, as Moodle's theme adds")
+    parser.add_argument("--bandwidth", type=float, default=2e6, help="bytes per second per connection; 0 for unlimited")
+    args = parser.parse_args()
+
+    with serve(activities=args.activities, footer_kb=args.footer_kb, bandwidth=args.bandwidth or None) as server, \
+            tempfile.TemporaryDirectory() as folder:
+        runs = stream_runs(server, activity_urls(server.base_url, args.activities), args.workers, folder)
+
+    rate = f"{args.bandwidth / 1e6:.1f} MB/s per connection" if args.bandwidth else "unlimited bandwidth"
+    print(f"{args.activities} activities, {args.footer_kb} KB footer scripts, {rate}")
+    print(f"{'path':<14}{'time':>8}{'client read':>13}{'server sent':>13}{'parse':>9}")
+    for label, (_, seconds, read_bytes, sent_bytes, parse_seconds) in runs:
+        print(f"{label:<14}{seconds:>7.2f}s{read_bytes / 1e6:>11.2f}MB{sent_bytes / 1e6:>11.2f}MB{parse_seconds * 1000:>7.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
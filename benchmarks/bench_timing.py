@@ -0,0 +1,69 @@
+"""
+What the timing spans cost and what they report. Runs the fused format and
+merge with and without a recording, then fetches and extracts a course's
+activities from the fake Moodle server inside one and prints its per-stage
+summary, checking that fetches made in the worker threads were recorded.
+
+    python -m benchmarks.bench_timing --weeks 16 --activities 30
+"""
+import argparse
+import timeit
+
+from benchmarks.corpus import course_plan, heading_template, moodle_template
+from benchmarks.fake_moodle import activity_urls, serve
+from toolbox.activities import extract_nextgen4_content
+from toolbox.fetch import fetch_all, make_session
+from toolbox.pipeline import format_and_merge
+from toolbox.timing import SUMMARY_FIELDS, recording
+
+
+def recorded(function):
+    def run():
+        with recording():
+            function()
+    return run
+
+
+def recorded_extraction(activities, workers):
+    """Fetch and extract `activities` pages from the fake server inside one recording and return the Recorder."""
+    with serve(latency=0.02, activities=activities) as server, recording() as recorder:
+        urls = activity_urls(server.base_url, activities)
+        results = fetch_all(make_session(pool_size=workers), urls, workers=workers)
+        for result in results:
+            extract_nextgen4_content(result.text)
+    fetches = [row for row in recorder.rows() if row["span"] == "fetch"]
+    if len(fetches) != activities or not all(row["status"] == 200 and row["bytes"] for row in fetches):
+        raise AssertionError(f"recorded {len(fetches)} complete fetch span(s) for {activities} fetches")
+    if workers > 1 and len({row["thread"] for row in fetches}) < 2:
+        raise AssertionError("fetches made in the worker threads were not recorded as theirs")
+    return recorder
+
+
+def check(activities=8, workers=4):
+    """Check that a concurrent extraction records one complete fetch span per page, from the worker threads."""
+    recorded_extraction(activities, workers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weeks", type=int, default=16)
+    parser.add_argument("--activities", type=int, default=30)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    plan, headings, template = course_plan(args.weeks, 8, formatted=False), heading_template(), moodle_template(args.weeks)
+    build = lambda: format_and_merge(plan, headings, template)
+    plain, timed = (min(timeit.repeat(step, number=1, repeat=args.repeat)) for step in (build, recorded(build)))
+    print(f"format and merge, {args.weeks} weeks: {plain * 1000:.1f} ms plain, {timed * 1000:.1f} ms recorded "
+          f"({timed / plain - 1:+.1%})")
+
+    recorder = recorded_extraction(args.activities, args.workers)
+    print(f"\n{args.activities} activities, {args.workers} workers, {recorder.elapsed:.2f} s")
+    print(f"{'span':<20}" + "".join(f"{field:>10}" for field in SUMMARY_FIELDS[1:]))
+    for row in recorder.summary():
+        print(f"{row['span']:<20}" + "".join(f"{row[field]:>10}" for field in SUMMARY_FIELDS[1:]))
+
+
+if __name__ == "__main__":
+    main()
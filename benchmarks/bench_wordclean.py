@@ -0,0 +1,102 @@
+"""
+Word "Save as Web Page" exports with and without the streaming Word markup
+stripper in front of Format HTML Headings and the merge extraction: bytes
+saved, time spent, and a check that headings and text come out the same.
+
+    python -m benchmarks.bench_wordclean --weeks 16 --paragraphs 8
+"""
+import argparse
+import time
+
+from benchmarks.corpus import heading_template, word_plan
+from toolbox.formatting import format_html
+from toolbox.merge import extract_content_by_tags
+from toolbox.parsing import make_soup
+from toolbox.wordclean import WordCleaner, iter_strip_word_markup, strip_word_markup
+
+
+def best_of(repeat, step):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = step()
+        times.append(time.perf_counter() - start)
+    return result, min(times)
+
+
+def headings_and_text(html):
+    """What the formatter promises to preserve: the heading outline and the text."""
+    soup = make_soup(html)
+    headings = [(tag.name, tag.get_text(strip=True)) for tag in soup.find_all(["h1", "h2", "h3", "h4", "h5", "h6"])]
+    return headings, " ".join(soup.get_text().split())
+
+
+def text_of(weeks_data):
+    """The extracted weeks with each field reduced to its visible text."""
+    return [{field: " ".join(make_soup(html).get_text().split()) for field, html in week.items()} for week in weeks_data]
+
+
+def clean_in_chunks(plan, size=65536):
+    """Strip `plan` in `size`-character chunks, raising unless that matches stripping it whole; returns the text and cleaner."""
+    cleaner = WordCleaner()
+    cleaned = "".join(iter_strip_word_markup([plan[i:i + size] for i in range(0, len(plan), size)], cleaner))
+    if cleaned != strip_word_markup(plan):
+        raise AssertionError(f"cleaning in {size}-character chunks differs from cleaning the whole document")
+    return cleaned, cleaner
+
+
+def check_unchanged(raw_formatted, clean_formatted, raw_weeks, clean_weeks, weeks):
+    """Raise unless stripping left the formatted headings and text and the merged weeks unchanged."""
+    if headings_and_text(raw_formatted) != headings_and_text(clean_formatted):
+        raise AssertionError("stripping Word markup changed the formatted headings or text")
+    if len(clean_weeks) != weeks:
+        raise AssertionError(f"merge found {len(clean_weeks)} weeks in the stripped plan, expected {weeks}")
+    if text_of(raw_weeks) != text_of(clean_weeks):
+        raise AssertionError("stripping Word markup changed the merged content")
+
+
+def check(weeks=4, paragraphs=4):
+    """Chunked stripping matches whole-document stripping, saves bytes, and changes no heading, text or merge field."""
+    plan = word_plan(weeks, paragraphs)
+    template = heading_template()
+    # Small chunks, so tags and comments are split across chunk boundaries.
+    cleaned, cleaner = clean_in_chunks(plan, size=997)
+    if cleaner.bytes_out >= cleaner.bytes_in:
+        raise AssertionError("stripping Word markup saved nothing")
+    raw_formatted, clean_formatted = format_html(plan, template), format_html(cleaned, template)
+    check_unchanged(raw_formatted, clean_formatted, extract_content_by_tags(raw_formatted),
+                    extract_content_by_tags(clean_formatted), weeks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weeks", type=int, default=16)
+    parser.add_argument("--paragraphs", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    plan = word_plan(args.weeks, args.paragraphs)
+    template = heading_template()
+    cleaned, cleaner = clean_in_chunks(plan)
+    saved = cleaner.bytes_in - cleaner.bytes_out
+    print(f"{args.weeks}-week Word export: {cleaner.bytes_in / 1e6:.2f} MB -> {cleaner.bytes_out / 1e6:.2f} MB "
+          f"({saved / cleaner.bytes_in:.0%} saved)")
+
+    _, clean_seconds = best_of(args.repeat, lambda: strip_word_markup(plan))
+    raw_formatted, raw_format = best_of(args.repeat, lambda: format_html(plan, template))
+    clean_formatted, clean_format = best_of(args.repeat, lambda: format_html(cleaned, template))
+    raw_weeks, raw_merge = best_of(args.repeat, lambda: extract_content_by_tags(raw_formatted))
+    clean_weeks, clean_merge = best_of(args.repeat, lambda: extract_content_by_tags(clean_formatted))
+
+    check_unchanged(raw_formatted, clean_formatted, raw_weeks, clean_weeks, args.weeks)
+
+    print(f"{'':<12}{'strip':>10}{'format':>10}{'merge':>10}{'total':>10}")
+    print(f"{'as exported':<12}{'':>10}{raw_format * 1000:>8.0f}ms{raw_merge * 1000:>8.0f}ms"
+          f"{(raw_format + raw_merge) * 1000:>8.0f}ms")
+    print(f"{'stripped':<12}{clean_seconds * 1000:>8.0f}ms{clean_format * 1000:>8.0f}ms{clean_merge * 1000:>8.0f}ms"
+          f"{(clean_seconds + clean_format + clean_merge) * 1000:>8.0f}ms")
+    print(f"formatted output {len(raw_formatted) / 1e6:.2f} MB -> {len(clean_formatted) / 1e6:.2f} MB; headings and text unchanged")
+
+
+if __name__ == "__main__":
+    main()
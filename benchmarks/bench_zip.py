@@ -0,0 +1,123 @@
+"""
+Peak RSS of the Image Resizer delivery path for a large upload batch: the old
+temp-dir + make_archive + base64 data URI pipeline vs. streaming into ZipWriter.
+Each pipeline runs in its own process so their peaks do not overlap.
+
+    python -m benchmarks.bench_zip --total-mb 500 --width 1900
+"""
+import argparse
+import base64
+import io
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+from PIL import Image
+
+from benchmarks.bench_resize import make_photos
+from benchmarks.corpus import image_batch
+from toolbox.images import iter_resize
+from toolbox.output import ZipWriter
+
+
+def load_uploads(folder):
+    """Read the batch into memory, as Streamlit holds every UploadedFile."""
+    return [(path.name, path.read_bytes()) for path in sorted(Path(folder).glob("*.jpg"))]
+
+
+def old_pipeline(uploads, width):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output_folder = Path(temp_dir) / "Resized"
+        output_folder.mkdir()
+        for name, data in uploads:
+            file_path = Path(temp_dir) / name
+            file_path.write_bytes(data)
+            with Image.open(file_path) as img:
+                img.width
+            img = Image.open(file_path)
+            h_size = int(img.size[1] * (width / float(img.size[0])))
+            img = img.resize((width, h_size), Image.Resampling.LANCZOS)
+            img.save(output_folder / f"{file_path.stem}-{width}{file_path.suffix}")
+        zip_path = Path(temp_dir) / "resized_images"
+        shutil.make_archive(zip_path, "zip", output_folder)
+        with open(f"{zip_path}.zip", "rb") as f:
+            data = f.read()
+        href = f'<a href="data:application/octet-stream;base64,{base64.b64encode(data).decode()}">'
+        return len(href)
+
+
+def zip_resized(uploads, width):
+    """The Image Resizer's download: each upload resized to `width`, streamed into a ZipWriter."""
+    jobs = ((f"{Path(name).stem}-{width}{Path(name).suffix}", data, width) for name, data in uploads)
+    with ZipWriter() as archive:
+        for result in iter_resize(jobs):
+            archive.write(result.name, result.data)
+        return archive.getvalue()
+
+
+def new_pipeline(uploads, width):
+    return len(zip_resized(uploads, width))
+
+
+def check(images=3, size=(1200, 800), width=500):
+    """Raise unless the streamed zip holds every upload, resized to `width`, stored rather than deflated."""
+    uploads = image_batch(images, size=size)
+    with zipfile.ZipFile(io.BytesIO(zip_resized(uploads, width))) as archive:
+        expected = [f"{Path(name).stem}-{width}.jpg" for name, _ in uploads]
+        if archive.namelist() != expected:
+            raise AssertionError(f"the zip holds {archive.namelist()}, expected {expected}")
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise AssertionError(f"{info.filename} was deflated; JPEGs are stored as they are")
+            with Image.open(archive.open(info)) as image:
+                if image.width != width:
+                    raise AssertionError(f"{info.filename} is {image.width} wide, expected {width}")
+
+
+def run_one(pipeline, folder, width):
+    uploads = load_uploads(folder)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    size = {"old": old_pipeline, "new": new_pipeline}[pipeline](uploads, width)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{baseline} {peak} {elapsed} {size}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--total-mb", type=float, default=500)
+    parser.add_argument("--width", type=int, default=1900)
+    parser.add_argument("--run", choices=["old", "new"], help=argparse.SUPPRESS)
+    parser.add_argument("--folder", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_one(args.run, args.folder, args.width)
+        return
+
+    with tempfile.TemporaryDirectory() as folder:
+        make_photos(folder, 1)
+        per_photo = next(Path(folder).glob("*.jpg")).stat().st_size
+        count = max(1, round(args.total_mb * 1e6 / per_photo))
+        make_photos(folder, count)
+        total = sum(path.stat().st_size for path in Path(folder).glob("*.jpg"))
+        print(f"{count} uploads, {total / 1e6:.0f} MB, resized to {args.width} wide")
+        print(f"{'pipeline':<10}{'after load':>14}{'peak RSS':>12}{'above load':>15}{'time':>9}{'payload':>12}")
+        for pipeline in ["old", "new"]:
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_zip", "--run", pipeline, "--folder", folder, "--width", str(args.width)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            baseline, peak, elapsed, size = output.split()
+            baseline, peak = int(baseline) / 1024, int(peak) / 1024
+            print(f"{pipeline:<10}{baseline:>11.0f} MB{peak:>9.0f} MB{peak - baseline:>12.0f} MB{float(elapsed):>8.1f}s{int(size) / 1e6:>9.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
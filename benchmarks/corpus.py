@@ -0,0 +1,171 @@
+"""Synthetic Course Build Plans, Moodle templates and image batches for the benchmarks."""
+import io
+
+from toolbox.merge import PLACEHOLDER_FIELDS
+
+WEEK_SECTIONS = [
+    ("h3", "Overview"),
+    ("h4", "This Week’s Learning Goals"),
+    ("h4", "Key Topics for the Week"),
+    ("h4", "Resources"),
+    ("h4", "Significance"),
+    ("h4", "What’s Next?"),
+    ("h3", "Introduction"),
+    ("h3", "Initial Post Instructions (Due Wednesday)"),
+    ("h3", "Follow-up Post Instructions (Due Saturday)"),
+    ("h3", "Tips for Success"),
+    ("h3", "Writing Requirements"),
+    ("h3", "Activity Instructions"),
+    ("h3", "Writing and Submission Requirements"),
+]
+
+
+def paragraphs(label, count):
+    return "".join(
+        f"<p>{label}, paragraph {n}: students read, reflect and apply the week’s ideas to practice.</p>\n"
+        for n in range(1, count + 1)
+    )
+
+
+def course_plan(weeks, paragraphs_per_section=3, sections=WEEK_SECTIONS, formatted=True):
+    """
+    A Course Build Plan with one week heading per week followed by the `sections`
+    headings. Unformatted plans have every heading as a bold paragraph, the way
+    they arrive before Format HTML Headings.
+    """
+    body = []
+    for week in range(1, weeks + 1):
+        if formatted:
+            body.append(f"<h1>Week {week}: Topic {week}</h1>\n")
+        else:
+            body.append(f"<p><b>Week {week}: Topic {week}</b></p>\n")
+        body.append(paragraphs(f"Week {week} introduction", paragraphs_per_section))
+        for tag, heading in sections:
+            if formatted:
+                body.append(f"<{tag}>{heading}</{tag}>\n")
+            else:
+                body.append(f"<p><b>{heading}</b></p>\n")
+            body.append(paragraphs(f"Week {week} {heading}", paragraphs_per_section))
+    return "<html>\n<head><meta charset='UTF-8'></head>\n<body>\n" + "".join(body) + "</body>\n</html>"
+
+
+def heading_template(sections=WEEK_SECTIONS):
+    """A Format HTML Headings template listing each section heading at its level."""
+    return "\n".join(f"<{tag}>{heading}</{tag}>" for tag, heading in sections)
+
+
+def moodle_template(weeks, boilerplate_paragraphs=60):
+    """A Moodle HTML template with every [content<Name><week>] placeholder for `weeks` weeks."""
+    boilerplate = "".join(
+        f'<p class="moodle-boilerplate">Standard course shell text, paragraph {n}.</p>\n'
+        for n in range(boilerplate_paragraphs)
+    )
+    blocks = []
+    for week in range(1, weeks + 1):
+        slots = "".join(f'<div class="{name}">[content{name}{week}]</div>\n' for name in PLACEHOLDER_FIELDS)
+        blocks.append(f'<section id="week{week}">\n<h2>Week {week}</h2>\n{boilerplate}{slots}</section>\n')
+    return "<html><body>\n" + "".join(blocks) + "</body></html>"
+
+
+def weeks_data(weeks, paragraphs_per_field=20):
+    """Extracted plan content shaped like extract_content_by_tags output."""
+    body = "".join(f"<p>Plan content paragraph {n} with a little detail.</p>" for n in range(paragraphs_per_field))
+    return [
+        dict({field: f"<p>Week {week} {field}</p>{body}" for field in PLACEHOLDER_FIELDS.values()}, week=f"Week {week}")
+        for week in range(1, weeks + 1)
+    ]
+
+
+WORD_HEAD = """<html xmlns:v="urn:schemas-microsoft-com:vml" xmlns:o="urn:schemas-microsoft-com:office:office"
+xmlns:w="urn:schemas-microsoft-com:office:word" xmlns:m="http://schemas.microsoft.com/office/2004/12/omml">
+<head>
+<meta http-equiv=Content-Type content="text/html; charset=utf-8">
+<meta name=Generator content="Microsoft Word 15">
+<!--[if gte mso 9]><xml>
+ <o:DocumentProperties><o:Author>Course Designer</o:Author><o:Pages>12</o:Pages></o:DocumentProperties>
+</xml><![endif]--><!--[if gte mso 9]><xml>
+ <w:WordDocument><w:View>Print</w:View><w:Zoom>100</w:Zoom><w:TrackMoves/><w:TrackFormatting/>
+ <w:ValidateAgainstSchemas/><w:DoNotPromoteQF/><w:LidThemeOther>EN-US</w:LidThemeOther></w:WordDocument>
+</xml><![endif]-->
+<style>
+<!--
+p.MsoNormal, li.MsoNormal, div.MsoNormal {margin:0in; font-size:12.0pt; font-family:"Calibri",sans-serif;}
+-->
+</style>
+</head>
+<body lang=EN-US style='tab-interval:.5in;word-wrap:break-word'>
+<div class=WordSection1>
+"""
+
+
+def word_paragraph(text):
+    return (
+        "<p class=MsoNormal style='margin-bottom:8.0pt;line-height:107%;mso-pagination:widow-orphan'>"
+        "<span style='font-size:11.0pt;line-height:107%;mso-ascii-font-family:Calibri;mso-bidi-font-family:Arial'>"
+        f"{text}<o:p></o:p></span></p>\n"
+    )
+
+
+def word_heading(text):
+    return (
+        "<p class=MsoNormal style='mso-outline-level:2'><b><span style='mso-bidi-font-weight:normal'>"
+        f"{text}</span></b><span style='mso-spacerun:yes'></span><o:p></o:p></p>\n"
+    )
+
+
+def word_list_item(text):
+    return (
+        "<p class=MsoListParagraphCxSpMiddle style='text-indent:-.25in;mso-list:l0 level1 lfo1'>"
+        "<![if !supportLists]><span style='font-family:Symbol;mso-fareast-font-family:Symbol'>"
+        "<span style='mso-list:Ignore'>·<span style='font:7.0pt \"Times New Roman\"'>&nbsp;&nbsp; </span></span></span>"
+        f"<![endif]><span style='mso-fareast-font-family:\"Times New Roman\"'>{text}<o:p></o:p></span></p>\n"
+    )
+
+
+def word_image(name):
+    return (
+        "<p class=MsoNormal><span style='mso-no-proof:yes'><!--[if gte vml 1]><v:shape id=\"Picture_1\" "
+        "type=\"#_x0000_t75\" style='width:468pt;height:263pt;visibility:visible'>"
+        f"<v:imagedata src=\"plan_files/{name}.png\" o:title=\"\"/></v:shape><![endif]--><![if !vml]>"
+        f"<img width=624 height=351 src=\"plan_files/{name}.jpg\" v:shapes=\"Picture_1\"><![endif]></span></p>\n"
+    )
+
+
+def word_plan(weeks, paragraphs_per_section=3, sections=WEEK_SECTIONS):
+    """
+    An unformatted Course Build Plan as Word's "Save as Web Page" writes it:
+    Office XML blocks, conditional comments, mso- styles, Mso classes, <o:p>
+    tags, list bullets and VML images around the same headings and text.
+    """
+    body = [WORD_HEAD]
+    for week in range(1, weeks + 1):
+        body.append(word_heading(f"Week {week}: Topic {week}"))
+        body.append(word_image(f"image{week:03}"))
+        for tag, heading in sections:
+            body.append(word_heading(heading))
+            for n in range(1, paragraphs_per_section + 1):
+                text = f"Week {week} {heading}, paragraph {n}: students read, reflect and apply the week’s ideas to practice."
+                body.append(word_list_item(text) if n % 3 == 0 else word_paragraph(text))
+    return "".join(body) + "</div>\n</body>\n</html>\n"
+
+
+def image_batch(count, size=(4000, 3000), format="JPEG", noise=40):
+    """
+    `count` (name, bytes) photos of `size` in `format`, a smooth gradient plus
+    `noise` (standard deviation) so they compress like camera pictures. The
+    noise is shifted by each photo's index, so no two photos are the same bytes
+    and content-keyed caches see `count` different images.
+    """
+    from PIL import Image, ImageChops
+
+    gradient = Image.linear_gradient("L").resize(size)
+    rotated = gradient.rotate(90).resize(size)
+    noise_band = Image.effect_noise(size, noise)
+    suffix = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp"}[format]
+    photos = []
+    for i in range(count):
+        photo = Image.merge("RGB", (gradient, ImageChops.offset(noise_band, 7 * i, 13 * i), rotated))
+        output = io.BytesIO()
+        photo.save(output, format, **({"quality": 90} if format == "JPEG" else {}))
+        photos.append((f"photo{i:03}.{suffix}", output.getvalue()))
+    return photos
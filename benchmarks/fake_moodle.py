@@ -0,0 +1,288 @@
+"""
+A local stand-in for the Moodle pages the extractors talk to.
+Serves the login form, course view, Gradebook Setup and activity pages with
+configurable latency, optional session cookies and injected 5xx failures.
+"""
+import hashlib
+import io
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+LOGIN_TOKEN = "fake-login-token"
+WRITE_SIZE = 16 * 1024
+PASSWORD = "secret"
+
+
+def moodle_page(title, main_html, nav_links=150, script_kb=40, sesskey="fake-sesskey", footer_kb=0):
+    """
+    Wrap `main_html` in Moodle-like page chrome: navigation, blocks, inline JS
+    and a footer. `footer_kb` adds the module initialization scripts that real
+    Moodle pages carry at the end of the body.
+    """
+    nav = "".join(f'<li class="nav-item"><a class="nav-link" href="/course/view.php?id={n}">Course {n}</a></li>' for n in range(nav_links))
+    script = "M.cfg = {" + ",".join(f'"key{n}": "value{n}"' for n in range(script_kb * 1024 // 20)) + "};"
+    blocks = "".join(
+        f'<section class="block card"><h5 class="card-title">Block {n}</h5><div class="card-body"><p>Block text {n}</p></div></section>'
+        for n in range(10)
+    )
+    footer_script = "".join(f'M.util.js_pending("core/init{n}"); ' for n in range(footer_kb * 1024 // 32))
+    return f"""<!DOCTYPE html>
+<html dir="ltr" lang="en"><head><title>{title}</title><meta charset="utf-8">
+<script>{script} M.cfg.sesskey = "{sesskey}";</script></head>
+<body id="page-course" class="format-weeks path-course">
+<nav class="navbar"><ul class="navbar-nav">{nav}</ul></nav>
+<div id="page" class="container-fluid"><div id="region-main">
+{main_html}
+</div><aside id="block-region-side-pre">{blocks}</aside></div>
+<footer id="page-footer"><p>Moodle footer</p><script>require(["core/first"], function() {{}});</script></footer>
+<script>{footer_script}</script>
+</body></html>"""
+
+
+def activity_page(activity_id, paragraphs=20, revision=0, sesskey="fake-sesskey", footer_kb=0, images=0):
+    body = "".join(f"<p>Activity {activity_id} instructions, paragraph {n}.</p>" for n in range(paragraphs))
+    if revision:
+        body += f"<p>Revised instructions, revision {revision}.</p>"
+    if images:
+        # Every activity shows the course logo and links a handout, as well as its own figures,
+        # each with a smaller copy in its srcset.
+        files = f"/pluginfile.php/{activity_id}/mod_page/content/1"
+        body += '<p><img src="/pluginfile.php/1/course/overviewfiles/logo.png" alt="Course logo"></p>'
+        body += "".join(
+            f'<p><img src="{files}/figure-{n}.jpg" srcset="{files}/figure-{n}-small.jpg 1200w, {files}/figure-{n}.jpg 2400w" '
+            f'alt="Figure {n}"></p>'
+            for n in range(1, images + 1)
+        )
+        body += f'<p><a href="{files}/handout.pdf">Handout</a> <a href="/mod/page/view.php?id={activity_id + 1}">Next</a></p>'
+    return moodle_page(f"Activity {activity_id}", f"""<div role="main"><h2>Activity {activity_id}</h2>
+<div class="NextGen4 TU-activity-page">
+<h3>Introduction</h3>{body}
+<div class="rubric"><div><p>Nested content for activity {activity_id}.</p></div></div>
+<p class="Internal_Links"><a href="#">Back</a></p>
+</div></div>""", sesskey=sesskey, footer_kb=footer_kb)
+
+
+def course_page(weeks, paragraphs=15):
+    """A course view page with a General section plus `weeks` weekly sections."""
+    sections = ['<li id="section-0" class="section main clearfix"><div class="content"><h3 class="sectionname">General</h3></div></li>']
+    for week in range(1, weeks + 1):
+        body = "".join(f"<p>Week {week} section text, paragraph {n}.</p>" for n in range(paragraphs))
+        sections.append(f"""<li id="section-{week}" class="section main clearfix" aria-label="Week {week}">
+<div class="content"><h3 class="sectionname">Week {week}</h3><div class="summary"><div class="no-overflow">
+<div class="NextGen4"><h2>Week {week} Overview</h2>{body}<p class="Internal_Links"><a href="#section-{week + 1}">Next</a></p></div>
+</div></div><ul class="section img-text"><li class="activity">Activity link</li></ul></div></li>""")
+    return moodle_page("Course", '<ul class="weeks">' + "\n".join(sections) + "</ul>")
+
+
+def gradebook_page(base_url, count):
+    """A Gradebook Setup page linking `count` activities with a.gradeitemheader."""
+    rows = "".join(
+        f'<tr><td><a class="gradeitemheader" href="{base_url}/mod/page/view.php?id={i}" title="Activity {i}">Activity {i}</a></td><td>10.00</td></tr>'
+        for i in range(1, count + 1)
+    )
+    return moodle_page("Gradebook setup", f'<table class="setup-grades">{rows}</table>')
+
+
+def login_page(token=LOGIN_TOKEN, error=""):
+    return moodle_page("Log in", f"""{error}<form class="login-form" action="/login/index.php" method="post" id="login">
+<input type="hidden" name="logintoken" value="{token}">
+<input type="text" name="username"><input type="password" name="password"><button type="submit">Log in</button></form>""")
+
+
+class FakeMoodleHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle(self):
+        try:
+            super().handle()
+        except ConnectionResetError:
+            # The client dropped a kept-alive connection after closing a response it did not read.
+            pass
+
+    def send_html(self, status, body, headers=None, truncate=False):
+        self.send_data(status, body.encode("utf-8"), "text/html; charset=utf-8", headers, truncate)
+
+    def send_data(self, status, data, content_type, headers=None, truncate=False):
+        """Send `data`; with `truncate`, the connection drops after half of the promised Content-Length."""
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if truncate:
+            data = data[:len(data) // 2]
+            self.close_connection = True
+        sent = 0
+        piece = WRITE_SIZE if self.server.bandwidth else len(data)
+        try:
+            while sent < len(data):
+                self.wfile.write(data[sent:sent + piece])
+                sent += piece
+                if self.server.bandwidth:
+                    self.wfile.flush()
+                    time.sleep(piece / self.server.bandwidth)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading, as the streamed activity fetch does.
+            self.close_connection = True
+        with self.server.lock:
+            self.server.bytes_sent += min(sent, len(data))
+
+    def redirect(self, location, headers=None):
+        self.send_html(303, "", dict(headers or {}, Location=location))
+
+    def logged_in(self):
+        cookie = SimpleCookie(self.headers.get("Cookie", ""))
+        return "MoodleSession" in cookie and cookie["MoodleSession"].value in self.server.sessions
+
+    def do_POST(self):
+        server = self.server
+        time.sleep(server.latency)
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode("utf-8"))
+        with server.lock:
+            server.requests += 1
+            server.logins += 1
+        if urlparse(self.path).path != "/login/index.php":
+            self.send_html(404, "<p>Not found</p>")
+            return
+        if form.get("logintoken") != [LOGIN_TOKEN] or form.get("password") != [PASSWORD]:
+            self.send_html(200, login_page(error="<p>Invalid login, please try again</p>"))
+            return
+        session_id = secrets.token_hex(8)
+        with server.lock:
+            server.sessions.add(session_id)
+        self.redirect("/my/", {"Set-Cookie": f"MoodleSession={session_id}; Path=/"})
+
+    def do_GET(self):
+        server = self.server
+        time.sleep(server.latency)
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        with server.lock:
+            server.requests += 1
+            attempts = server.attempts.get(self.path, 0)
+            server.attempts[self.path] = attempts + 1
+        if url.path == "/login/index.php":
+            self.send_html(200, login_page())
+            return
+        if server.require_login and not self.logged_in():
+            self.redirect("/login/index.php")
+            return
+        if url.path == "/my/":
+            self.send_html(200, moodle_page("Dashboard", "<h2>Dashboard</h2>"))
+            return
+        if url.path == "/mod/page/view.php":
+            activity_id = int(query.get("id", ["0"])[0])
+            if attempts < server.failures.get(activity_id, 0):
+                self.send_html(503, "<p>Service Unavailable</p>")
+                return
+            sesskey = secrets.token_hex(5) if server.sesskeys else "fake-sesskey"
+            body = activity_page(
+                activity_id, revision=server.edits.get(activity_id, 0), sesskey=sesskey, footer_kb=server.footer_kb,
+                images=server.images,
+            )
+            if attempts < server.truncations.get(activity_id, 0):
+                self.send_html(200, body, truncate=True)
+                return
+            if server.etags:
+                etag = '"' + hashlib.sha256(body.encode("utf-8")).hexdigest()[:16] + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_html(304, "", {"ETag": etag})
+                    return
+                self.send_html(200, body, {"ETag": etag})
+                return
+            self.send_html(200, body)
+            return
+        if url.path.startswith("/pluginfile.php/") and server.files:
+            suffix = url.path.rsplit(".", 1)[-1]
+            if suffix in server.files:
+                self.send_data(200, *server.files[suffix])
+                return
+        if url.path == "/course/view.php":
+            self.send_html(200, course_page(server.weeks))
+            return
+        if url.path == "/grade/edit/tree/index.php":
+            self.send_html(200, gradebook_page(server.base_url, server.activities))
+            return
+        self.send_html(404, "<p>Not found</p>")
+
+
+def pluginfiles():
+    """Content and type to serve for each file extension: a 2400 wide photo, a small logo and a PDF."""
+    from PIL import Image
+
+    size = (2400, 1600)
+    gradient = Image.linear_gradient("L").resize(size)
+    photo = Image.merge("RGB", (gradient, Image.effect_noise(size, 8), gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT)))
+    photo_file, logo_file = io.BytesIO(), io.BytesIO()
+    photo.save(photo_file, "JPEG", quality=90)
+    Image.new("RGB", (300, 100), "navy").save(logo_file, "PNG")
+    return {
+        "jpg": (photo_file.getvalue(), "image/jpeg"),
+        "png": (logo_file.getvalue(), "image/png"),
+        "pdf": (b"%PDF-1.4\n" + b"0" * 200_000 + b"\n%%EOF\n", "application/pdf"),
+    }
+
+
+@contextmanager
+def serve(latency=0.0, failures=None, weeks=8, activities=30, require_login=False, etags=False, sesskeys=False,
+          footer_kb=0, bandwidth=None, images=0, truncations=None):
+    """
+    Run the fake server on a free local port for the duration of the block and
+    yield it. `failures` maps activity ids to the number of 503s served first,
+    and `truncations` to the number of pages first cut off halfway through;
+    the course has `weeks` sections and `activities` gradebook items. With
+    `require_login`, pages redirect to the login form until a POST with the
+    login token and PASSWORD sets a session cookie; clearing
+    `server.sessions` expires every session. With `etags`, activity pages
+    carry an ETag and answer a matching If-None-Match with 304. `server.edits`
+    maps activity ids to a revision number that changes their content. With
+    `sesskeys`, every activity page embeds a new sesskey, as real Moodle pages
+    do, so no two downloads of a page are byte-for-byte the same. `footer_kb`
+    sizes the scripts at the end of each activity page. With `bandwidth`, in
+    bytes per second, each response is written in WRITE_SIZE pieces at that rate.
+    With `images`, each activity page shows that many photos of its own, the
+    course logo and a handout link, all served from /pluginfile.php/.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeMoodleHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.failures = failures or {}
+    server.truncations = truncations or {}
+    server.weeks = weeks
+    server.activities = activities
+    server.require_login = require_login
+    server.etags = etags
+    server.sesskeys = sesskeys
+    server.footer_kb = footer_kb
+    server.bandwidth = bandwidth
+    server.images = images
+    server.files = pluginfiles() if images else {}
+    server.edits = {}
+    server.sessions = set()
+    server.logins = 0
+    server.attempts = {}
+    server.requests = 0
+    server.bytes_sent = 0
+    server.lock = threading.Lock()
+    server.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def activity_urls(base_url, count):
+    return [f"{base_url}/mod/page/view.php?id={i}" for i in range(1, count + 1)]
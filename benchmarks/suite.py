@@ -0,0 +1,310 @@
+"""
+Regression suite for the tools. It first runs the behavior checks of the
+benchmarks (CHECKS), each of which raises when a tool gives the wrong answer,
+and a failed check fails the run. Then it times Format HTML Headings, the HTML
+Merge, both Moodle extractors against the fake Moodle server and the image resize
+across input sizes, and compares each case's best time with the baseline stored
+in baselines.json. A case more than `--threshold` times (and `--min-ms` more
+than) its baseline is timed again, and if it stays there it is a regression
+and the run exits with status 1. Each case is timed next to a fixed
+pure-Python loop and its baseline is scaled by how that loop's time has
+changed, so a machine that is busier now than when the baselines were
+recorded does not show up as a regression.
+
+Baselines only mean something on the machine they were recorded on; record
+them with `--update` after a change that is meant to move the numbers.
+
+    python -m benchmarks.suite
+    python -m benchmarks.suite --only check/
+    python -m benchmarks.suite --only extract --repeat 9 --skip-checks
+    python -m benchmarks.suite --update
+"""
+import argparse
+import gc
+import io
+import json
+import platform
+import sys
+import time
+from contextlib import ExitStack
+from functools import partial
+from pathlib import Path
+
+from benchmarks import (
+    bench_assets, bench_batch, bench_changes, bench_fetch, bench_formatting, bench_httpcache, bench_imports, bench_jobs,
+    bench_memo, bench_memory, bench_merge, bench_output, bench_parsers, bench_partition, bench_pipeline, bench_renditions,
+    bench_resize, bench_sections, bench_session, bench_stream, bench_timing, bench_wordclean, bench_zip,
+)
+from benchmarks.corpus import course_plan, heading_template, image_batch, moodle_template, word_plan
+from benchmarks.fake_moodle import serve
+from toolbox.activities import extract_nextgen4_content, gradebook_activities, read_activity_content
+from toolbox.fetch import fetch_all, fetch_page, make_session
+from toolbox.formatting import format_html
+from toolbox.images import resize_image
+from toolbox.merge import compile_template, extract_content_by_tags, render_template
+from toolbox.pipeline import format_and_merge
+from toolbox.sections import course_weeks, extract_section_html, format_template, index_sections
+
+BASELINES = Path(__file__).with_name("baselines.json")
+DEFAULT_THRESHOLD = 1.5
+DEFAULT_MIN_MS = 2.0
+CALIBRATION_LOOPS = 200_000
+
+
+def format_case(stack, args, weeks, word=False):
+    plan = word_plan(weeks) if word else course_plan(weeks, formatted=False)
+    template = heading_template()
+    return lambda: format_html(plan, template)
+
+
+def extract_plan_case(stack, args, weeks):
+    plan = format_html(course_plan(weeks, formatted=False), heading_template())
+    return lambda: extract_content_by_tags(plan)
+
+
+def render_case(stack, args, weeks):
+    plan = format_html(course_plan(weeks, formatted=False), heading_template())
+    weeks_data = extract_content_by_tags(plan)
+    template = moodle_template(weeks)
+
+    def run():
+        html, report = render_template(compile_template(template), weeks_data)
+        if report.unmatched:
+            raise AssertionError(f"unmatched placeholders: {report.unmatched[:3]}")
+    return run
+
+
+def format_and_merge_case(stack, args, weeks):
+    plan, headings, template = course_plan(weeks, formatted=False), heading_template(), moodle_template(weeks)
+    return lambda: format_and_merge(plan, headings, template)
+
+
+def sections_case(stack, args, weeks):
+    """What the Sections Extractor does after login: fetch the course page and format every week."""
+    server = stack.enter_context(serve(latency=args.latency, weeks=weeks))
+    session = make_session(1)
+
+    def run():
+        response = fetch_page(session, f"{server.base_url}/course/view.php?id=1")
+        sections = index_sections(response.text)
+        output = [format_template(name, extract_section_html(sections, num)) for name, num in course_weeks(sections)]
+        if len(output) != weeks:
+            raise AssertionError(f"extracted {len(output)} of {weeks} weeks")
+    return run
+
+
+def activities_case(stack, args, activities):
+    """What the Activity Extractor does after login: read the gradebook, then fetch and extract every activity."""
+    server = stack.enter_context(serve(latency=args.latency, activities=activities))
+    session = make_session()
+    fetch = partial(fetch_page, read=read_activity_content)
+
+    def run():
+        gradebook = fetch_page(session, f"{server.base_url}/grade/edit/tree/index.php?id=1")
+        urls = [url for _, url in gradebook_activities(gradebook.text)]
+        results = fetch_all(session, urls, fetch=fetch)
+        if len(results) != activities:
+            raise AssertionError(f"fetched {len(results)} of {activities} activities")
+        # The fake gradebook lists activities 1..n in order, and fetch_all keeps that order.
+        for number, result in enumerate(results, 1):
+            if result.error:
+                raise AssertionError(f"activity {number}: {result.error}")
+            content = extract_nextgen4_content(result.text)
+            expected = [f"Activity {number} instructions, paragraph 0.", f"Nested content for activity {number}."]
+            missing = [text for text in expected if text not in content]
+            if missing:
+                raise AssertionError(f"activity {number}: extracted {len(content)} characters without {missing[0]!r}")
+            if "Internal_Links" in content:
+                raise AssertionError(f"activity {number}: the navigation links were left in")
+    return run
+
+
+def resize_case(stack, args, size, format="JPEG", width=800):
+    (_, data), = image_batch(1, size=size, format=format)
+    return lambda: resize_image(io.BytesIO(data), io.BytesIO(), width, format=format)
+
+
+# Each raises AssertionError, with what went wrong, when a tool misbehaves.
+CHECKS = {
+    "check/partition": bench_partition.check,
+    "check/parsers": bench_parsers.check,
+    "check/fetch": bench_fetch.check,
+    "check/session": bench_session.check,
+    "check/stream": bench_stream.check,
+    "check/changes": bench_changes.check,
+    "check/assets": bench_assets.check,
+    "check/timing": bench_timing.check,
+    "check/imports": bench_imports.check,
+    "check/jobs": bench_jobs.check,
+    "check/wordclean": bench_wordclean.check,
+    "check/formatting": bench_formatting.check,
+    "check/output": bench_output.check,
+    "check/resize": bench_resize.check,
+    "check/zip": bench_zip.check,
+    "check/merge": bench_merge.check,
+    "check/sections": bench_sections.check,
+    "check/httpcache": bench_httpcache.check,
+    "check/batch": bench_batch.check,
+    "check/memo": bench_memo.check,
+    "check/pipeline": bench_pipeline.check,
+    "check/renditions": bench_renditions.check,
+    "check/memory": bench_memory.check,
+}
+
+CASES = {
+    "format_html/plan-4w": partial(format_case, weeks=4),
+    "format_html/plan-16w": partial(format_case, weeks=16),
+    "format_html/word-16w": partial(format_case, weeks=16, word=True),
+    "merge/extract-4w": partial(extract_plan_case, weeks=4),
+    "merge/extract-16w": partial(extract_plan_case, weeks=16),
+    "merge/render-4w": partial(render_case, weeks=4),
+    "merge/render-16w": partial(render_case, weeks=16),
+    "merge/format-and-merge-16w": partial(format_and_merge_case, weeks=16),
+    "extract/sections-8w": partial(sections_case, weeks=8),
+    "extract/sections-24w": partial(sections_case, weeks=24),
+    "extract/activities-10": partial(activities_case, activities=10),
+    "extract/activities-40": partial(activities_case, activities=40),
+    "resize/jpeg-1200x800": partial(resize_case, size=(1200, 800)),
+    "resize/jpeg-4000x3000": partial(resize_case, size=(4000, 3000)),
+    "resize/png-2000x1500": partial(resize_case, size=(2000, 1500), format="PNG"),
+}
+
+
+def calibration():
+    """A fixed pure-Python loop, timed next to every case to tell how fast the machine is running just then."""
+    total = 0
+    for number in range(CALIBRATION_LOOPS):
+        total += number * number
+    return total
+
+
+def time_case(case, repeat):
+    """
+    Return (case ms, calibration ms): the fastest of `repeat` calls of each,
+    taken in turn, after one untimed call to warm up. Slower calls are the
+    machine's noise rather than the code's. As in timeit, the garbage
+    collector is off while a call is timed, so a collection of an earlier
+    call's parse trees does not land in a later one.
+    """
+    case()
+    times, calibrations = [], []
+    try:
+        for _ in range(repeat):
+            gc.collect()
+            gc.disable()
+            start = time.perf_counter()
+            calibration()
+            middle = time.perf_counter()
+            case()
+            times.append((time.perf_counter() - middle) * 1000)
+            calibrations.append((middle - start) * 1000)
+            gc.enable()
+    finally:
+        gc.enable()
+    return min(times), min(calibrations)
+
+
+def expected_ms(baseline, calibration_ms):
+    """The baseline time scaled by how much faster or slower the machine runs now than when it was recorded."""
+    return baseline["ms"] * calibration_ms / baseline["calibration_ms"]
+
+
+def compare(ms, expected, threshold, min_ms):
+    """'regression', 'faster', 'ok' or 'new' for one case."""
+    if expected is None:
+        return "new"
+    if ms > expected * threshold and ms - expected > min_ms:
+        return "regression"
+    if ms * threshold < expected and expected - ms > min_ms:
+        return "faster"
+    return "ok"
+
+
+def environment(args):
+    return {"python": platform.python_version(), "machine": platform.machine(), "system": platform.system(),
+            "latency": args.latency}
+
+
+def load_baselines(path):
+    return json.loads(path.read_text(encoding="utf-8")) if path.exists() else {"environment": {}, "cases": {}}
+
+
+def run_checks(names):
+    """Run the named CHECKS, printing each outcome, and return the names of those that failed."""
+    failed = []
+    for name in names:
+        start = time.perf_counter()
+        try:
+            CHECKS[name]()
+        except AssertionError as exc:
+            failed.append(name)
+            print(f"{name:<30}{time.perf_counter() - start:>9.1f}s  FAILED: {exc}")
+        else:
+            print(f"{name:<30}{time.perf_counter() - start:>9.1f}s  ok")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", action="append", default=[], help="run the cases whose name contains this; repeatable")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--latency", type=float, default=0.01, help="fake Moodle latency per request, in seconds")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="slowdown ratio that fails a case")
+    parser.add_argument("--min-ms", type=float, default=DEFAULT_MIN_MS, help="ignore slowdowns smaller than this")
+    parser.add_argument("--retries", type=int, default=2, help="times to re-time a case over the threshold")
+    parser.add_argument("--baselines", type=Path, default=BASELINES)
+    parser.add_argument("--update", action="store_true", help="store these timings as the new baselines")
+    parser.add_argument("--skip-checks", action="store_true", help="only time the cases")
+    args = parser.parse_args()
+
+    def selected(names):
+        return [name for name in names if not args.only or any(part in name for part in args.only)]
+
+    failed_checks = [] if args.skip_checks else run_checks(selected(CHECKS))
+    if failed_checks:
+        print(f"{len(failed_checks)} check(s) failed: {', '.join(failed_checks)}")
+        sys.exit(1)
+
+    baselines = load_baselines(args.baselines)
+    if baselines["environment"] and baselines["environment"] != environment(args) and not args.update:
+        print(f"Baselines were recorded with {baselines['environment']}, not {environment(args)}; expect differences.")
+
+    names = selected(CASES)
+    if not names:
+        return
+    measured, regressions = {}, []
+    print(f"{'case':<30}{'best':>10}{'expected':>10}{'ratio':>8}  status")
+    for name in names:
+        baseline = baselines["cases"].get(name)
+        # A case over the threshold is timed again, up to `--retries` times, before it counts as a regression.
+        best = None
+        for _ in range(1 + args.retries):
+            with ExitStack() as stack:
+                ms, calibration_ms = time_case(CASES[name](stack, args), args.repeat)
+            expected = expected_ms(baseline, calibration_ms) if baseline else None
+            if best is None or (expected and ms / expected < best[0] / best[2]):
+                best = ms, calibration_ms, expected
+            status = compare(*best[::2], args.threshold, args.min_ms)
+            if status != "regression":
+                break
+        ms, calibration_ms, expected = best
+        measured[name] = {"ms": round(ms, 2), "calibration_ms": round(calibration_ms, 2)}
+        if status == "regression":
+            regressions.append(name)
+        ratio = f"{ms / expected:>7.2f}x" if expected else f"{'':>8}"
+        expected_text = f"{expected:>8.1f}ms" if expected else f"{'-':>10}"
+        print(f"{name:<30}{ms:>8.1f}ms{expected_text}{ratio}  {status}")
+
+    if args.update:
+        baselines["environment"] = environment(args)
+        baselines["cases"] = dict(baselines["cases"], **measured)
+        args.baselines.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        print(f"Stored {len(measured)} baseline(s) in {args.baselines}.")
+        return
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold}x baseline: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,11 @@
 import streamlit as st
-from bs4 import BeautifulSoup
-import pandas as pd
+from toolbox import memo
+from toolbox.formatting import DEFAULT_HEADING_TEMPLATE
+from toolbox.merge import merge_html
+from toolbox.panels import timing_panel
+from toolbox.pipeline import cached_format_and_merge, weeks_data_json
+from toolbox.timing import recording
+from toolbox.wordclean import bytes_saved, cached_strip_word_markup
 
 st.set_page_config(
     page_title="HTML Merge to Moodle",
@@ -12,75 +17,25 @@ st.sidebar.write(
     """Once you have the HTML formatted correctly, this application will help you merge the HTML code into Moodle."""
 )
 st.sidebar.image("https://i.imgur.com/BPN9akd.png", width=250)
+show_timings = st.sidebar.checkbox("Show timings", help="Time each stage of the run and offer the timings as JSON or CSV.")
 
 # Updated function to read HTML content from an uploaded file
 def read_html_content(uploaded_file):
     return uploaded_file.getvalue().decode("utf-8")
 
-# Your existing functions...
-def extract_content_by_tags(html_content):
-    soup = BeautifulSoup(html_content, 'html.parser')
-    weeks_data = []
-
-    weeks = soup.find_all('h1')
-    for week in weeks:
-        week_title = week.get_text(strip=True)
-
-        # Initialize each content type
-        content = {
-            'week': week_title, 
-            'overview': '', 
-            'learning_goals': '', 
-            'key_topics': '', 
-            'resources': '', 
-            'significance': '', 
-            'whats_next': ''
-        }
-
-        # Find the next <h3> and <h4> tags
-        overview_tag = week.find_next('h3')
-        learning_goals_tag = overview_tag.find_next('h4') if overview_tag else None
-        key_topics_tag = learning_goals_tag.find_next('h4') if learning_goals_tag else None
-        resources_tag = key_topics_tag.find_next('h4') if key_topics_tag else None
-        significance_tag = resources_tag.find_next('h4') if resources_tag else None
-        whats_next_tag = significance_tag.find_next('h4') if significance_tag else None
-
-        # Extract content for each section
-        content['overview'] = extract_section_content(overview_tag, ['h3', 'h4', 'h1'])
-        content['learning_goals'] = extract_section_content(learning_goals_tag, ['h4', 'h1'])
-        content['key_topics'] = extract_section_content(key_topics_tag, ['h4', 'h1'])
-        content['resources'] = extract_section_content(resources_tag, ['h4', 'h1'])
-        content['significance'] = extract_section_content(significance_tag, ['h4', 'h1'])
-        content['whats_next'] = extract_section_content(whats_next_tag, ['h1'])
-
-        weeks_data.append(content)
-
-    return weeks_data
-
-def extract_section_content(tag, stop_tags):
-    """Extract all content until a tag from stop_tags is encountered."""
-    content = ''
-    if tag:  # Check if tag is not None
-        for sibling in tag.next_siblings:
-            if sibling.name in stop_tags:
-                break
-            content += str(sibling)
-    return content.strip()
-
-def insert_content_into_template_string_manipulation(template_html, weeks_data):
-    for i, week_data in enumerate(weeks_data, start=1):
-        template_html = template_html.replace(f"[contentOverview{i}]", week_data['overview'])
-        template_html = template_html.replace(f"[contentWLG{i}]", week_data['learning_goals'])
-        template_html = template_html.replace(f"[contentTopics{i}]", week_data['key_topics'])
-        template_html = template_html.replace(f"[contentResources{i}]", week_data['resources'])
-        template_html = template_html.replace(f"[contentSignificance{i}]", week_data['significance'])
-        template_html = template_html.replace(f"[contentWhatsNext{i}]", week_data['whats_next'])
-
-    return template_html
-
 # Streamlit UI for file upload
 design_plan_file = st.file_uploader("Upload the stripped_HTML", key="design_plan")
 template_file = st.file_uploader("Upload Moodle HTML Template File", key="template")
+strip_word = st.checkbox(
+    "Strip Word markup from the plan before merging",
+    help="Removes the mso- styles, Office XML, conditional comments and empty spans that Word adds to exported HTML. Headings and text are left as they are.",
+)
+format_first = st.checkbox(
+    "Format the plan's headings as part of the merge",
+    help="Upload the plan straight from Word and skip the Format HTML Headings step. Headings are normalized with the template below on the same parsed document that is merged.",
+)
+if format_first:
+    heading_template_html = st.text_area("HTML Header Format Template", value=DEFAULT_HEADING_TEMPLATE, height=150)
 
 # Instructions and Links
 st.markdown("""
@@ -100,10 +55,36 @@ This application will help you merge the Course Build Plan Final with the HTML c
 if design_plan_file and template_file:
     design_plan_html = read_html_content(design_plan_file)
     template_html = read_html_content(template_file)
-
-    weeks_data = extract_content_by_tags(design_plan_html)
-    final_html = insert_content_into_template_string_manipulation(template_html, weeks_data)
+    with recording() as recorder:
+        if strip_word:
+            cleaned_html = cached_strip_word_markup(design_plan_html)
+            st.caption(f"Removed {bytes_saved(design_plan_html, cleaned_html) / 1024:.0f} KB of Word markup.")
+            design_plan_html = cleaned_html
+
+        if format_first:
+            build = cached_format_and_merge(design_plan_html, heading_template_html, template_html)
+        else:
+            build = merge_html(design_plan_html, template_html)
+    final_html, report = build.html, build.report
+    if report.unmatched:
+        st.warning(f"{len(report.unmatched)} template placeholder(s) had no matching content: {', '.join(report.unmatched)}")
+    if report.unused:
+        with st.expander(f"{len(report.unused)} extracted section(s) have no placeholder in the template"):
+            st.write(", ".join(report.unused))
 
     # Displaying the final HTML or providing a download link
     st.download_button(label="Download Processed HTML", data=final_html, file_name="processed_course.html", mime="text/html")
 
+    with st.expander(f"Extracted content ({len(build.weeks_data)} weeks)"):
+        st.dataframe(build.weeks_data)
+        st.download_button(
+            label="Download Extracted Content (JSON)",
+            data=weeks_data_json(build.weeks_data),
+            file_name="weeks_data.json",
+            mime="application/json",
+        )
+
+    if show_timings:
+        timing_panel(recorder, key="merge")
+
+st.sidebar.caption(memo.summary("merge", "parse"))
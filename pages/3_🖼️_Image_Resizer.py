@@ -1,10 +1,11 @@
-import os
 import streamlit as st
-from PIL import Image
+from PIL import UnidentifiedImageError, features
 from pathlib import Path
-import tempfile
-import shutil
-import base64
+from toolbox.images import ImageTooLarge, inspect_image, iter_resize, rendition_job, shared_rendition_cache
+from toolbox.output import ZipWriter
+from toolbox.jobs import shared_job_queue
+from toolbox.panels import client_id, jobs_panel
+from toolbox.timing import span
 
 st.set_page_config(
 page_title="Image Resizer",
@@ -15,57 +16,111 @@ st.sidebar.write(
     """This application allows users to resize images. You can upload multiple images, choose one of the common image sizes we use, and download the resized images as a single zip file."""
     )
 st.sidebar.image("https://i.imgur.com/BPN9akd.png", width=250)
-
-def resize_image(input_path, output_path, base_width):
-    img = Image.open(input_path)
-    w_percent = (base_width / float(img.size[0]))
-    h_size = int((float(img.size[1]) * float(w_percent)))
-    img = img.resize((base_width, h_size), Image.Resampling.LANCZOS)
-    img.save(output_path)
-
-def save_to_zip(output_folder, zip_path):
-    shutil.make_archive(zip_path, 'zip', output_folder)
-
-def get_binary_file_downloader_html(bin_file, file_label='File'):
-    with open(bin_file, 'rb') as f:
-        data = f.read()
-    bin_str = base64.b64encode(data).decode()
-    href = f'<a href="data:application/octet-stream;base64,{bin_str}" download="{os.path.basename(bin_file)}">Download {file_label}</a>'
-    return href
+show_timings = st.sidebar.checkbox("Show timings", help="Time each stage of the run and offer the timings as JSON or CSV.")
+if st.sidebar.button("Clear image cache"):
+    shared_rendition_cache().store.clear()
+
+def resize_uploads(uploaded_files, widths):
+    """
+    Return an (uploaded_file, widths) pair for each upload to resize. Each
+    image's header is read once, here, to check its size against the limits;
+    nothing is copied or decoded until the job runs.
+    """
+    uploads = []
+    for uploaded_file in uploaded_files:
+        file_path = Path(uploaded_file.name)
+        try:
+            info = inspect_image(uploaded_file)
+        except (ImageTooLarge, UnidentifiedImageError) as exc:
+            st.error(f"Skipped {file_path.name}: {exc}")
+            continue
+        image_widths = widths
+        if any(width > info.width for width in widths):
+            if not st.checkbox(f'Enlarge {file_path.name}?', key=file_path.name):
+                image_widths = [width for width in widths if width <= info.width]
+        if image_widths:
+            uploads.append((uploaded_file, tuple(image_widths)))
+    return uploads
+
+def resize_jobs(uploads, webp_quality):
+    """
+    Yield a (file_name, image_bytes, widths, webp_quality) job for each upload,
+    reading its bytes only when iter_resize is ready to take it.
+    """
+    for uploaded_file, widths in uploads:
+        yield Path(uploaded_file.name).name, uploaded_file.getvalue(), widths, webp_quality
+
+def resize_images(job, uploads, webp_quality, one_at_a_time):
+    """
+    Run as a job: resize every (uploaded_file, widths) pair from resize_uploads
+    into one zip. Returns what show_resized needs.
+    """
+    timings = []
+    cache = shared_rendition_cache()
+    cache_stats = cache.stats.copy()
+    workers = 1 if one_at_a_time else None
+    with ZipWriter() as archive:
+        # Each upload is decoded once and all of its widths go straight into the zip.
+        results = iter_resize(resize_jobs(uploads, webp_quality), workers=workers, cache=cache, function=rendition_job)
+        for done, result in enumerate(results, start=1):
+            job.report(done / len(uploads), f"Resized {done} of {len(uploads)}: {result.name}")
+            if result.error:
+                job.note("error", f"Could not resize {result.name}: {result.error}")
+                continue
+            for rendition in result.renditions:
+                with span("zip write", image=rendition.name, bytes=len(rendition.data)):
+                    archive.write(rendition.name, rendition.data)
+                timings.append({
+                    "image": rendition.name,
+                    "KB": round(len(rendition.data) / 1024, 1),
+                    "KB saved": round((result.source_bytes - len(rendition.data)) / 1024, 1),
+                    "seconds": round(result.seconds, 3),
+                })
+        data = archive.getvalue()
+    return {"zip": data, "timings": timings, "cache_summary": cache.summary(since=cache_stats)}
+
+def show_resized(job, key):
+    """The download and timing table of a finished resize_images job."""
+    run = job.result
+    st.download_button(
+        label="Download Resized Images",
+        data=run["zip"],
+        file_name="resized_images.zip",
+        mime="application/zip",
+        key=f"{key}_zip",
+        on_click=job.mark_downloaded,
+    )
+    st.caption(f"Made {len(run['timings'])} image(s) in {job.run_seconds:.1f} s.")
+    st.caption(run["cache_summary"])
+    with st.expander("Resize timing and size"):
+        st.table(run["timings"])
 
 def main():
 
+    # Resizes go through the server's job queue, so they carry on if this page reruns or the browser disconnects.
+    queue = shared_job_queue()
+    client = client_id()
     uploaded_files = st.file_uploader("Choose images to resize", accept_multiple_files=True, type=['jpg', 'jpeg', 'png'])
     if uploaded_files:
-        resize_option = st.selectbox('Choose the new width for the images:', [400, 800, 1900])
-
-        if st.button('Resize Images'):
-            with tempfile.TemporaryDirectory() as temp_dir:
-                output_folder = Path(temp_dir) / 'Resized'
-                output_folder.mkdir(parents=True, exist_ok=True)
-
-                for uploaded_file in uploaded_files:
-                    file_path = Path(temp_dir) / uploaded_file.name
-                    with open(file_path, "wb") as f:
-                        f.write(uploaded_file.getbuffer())
-
-                    with Image.open(file_path) as img:
-                        if img.width < 800 and resize_option == 800:
-                            if not st.checkbox(f'Enlarge {file_path.name}?', key=file_path):
-                                continue
-
-                    new_file_name = f"{file_path.stem}-{resize_option}{file_path.suffix}"
-                    output_file = output_folder / new_file_name
-                    resize_image(file_path, output_file, resize_option)
-
-                zip_path = Path(temp_dir) / 'resized_images'
-                save_to_zip(output_folder, zip_path)
-
-                zip_file = f"{zip_path}.zip"
-                if os.path.exists(zip_file):
-                    st.markdown(get_binary_file_downloader_html(zip_file, 'Resized Images'), unsafe_allow_html=True)
-                else:
-                    st.error("Error in creating zip file.")
+        if st.checkbox('Make several widths from each image'):
+            widths = st.multiselect('Choose the widths to make:', [400, 800, 1900], default=[400, 800, 1900])
+        else:
+            widths = [st.selectbox('Choose the new width for the images:', [400, 800, 1900])]
+        webp_quality = None
+        if features.check("webp") and st.checkbox('Save as WebP', help="WebP images are usually much smaller than JPEG or PNG at the same visual quality, which makes Moodle pages lighter."):
+            webp_quality = st.slider('WebP quality', min_value=50, max_value=95, value=80)
+        one_at_a_time = st.checkbox(
+            'Resize one image at a time',
+            help="Uses the least server memory: each image is decoded and resized in this process before the next is read, instead of several at once in worker processes. Slower for large batches.",
+        )
+
+        if widths and st.button('Resize Images'):
+            # Headers are checked here, so skipped images and the enlarge questions show on this page.
+            uploads = resize_uploads(uploaded_files, widths)
+            if uploads:
+                queue.submit("resize", client, f"{len(uploads)} image(s) at {', '.join(map(str, widths))} px",
+                             resize_images, uploads, webp_quality, one_at_a_time)
+    jobs_panel(queue, client, "resize", show_resized, key="resize", show_timings=show_timings)
 
 if __name__ == '__main__':
     main()
@@ -85,11 +140,15 @@ If you are using Google to store images, you should name your files before you r
 
 3. **Resize and Download:**
    - Click the 'Resize Images' button to start the resizing process.
-   - Once the resizing is complete, a download link for a zip file containing the resized images will appear.
-   - Click on the 'Download Resized Images' link to download the zip file to your device.
+   - The resize waits for a free worker on the server and then shows its progress. You can leave it running and use the other tools meanwhile; a reload of the page starts a new session, which does not see earlier resizes.
+   - Once the resizing is complete, a download button for a zip file containing the resized images will appear. Finished resizes are kept until you download them or click 'Dismiss'.
+   - Click on the 'Download Resized Images' button to download the zip file to your device.
 
 ### Additional Features
 - **Enlarge Option:** If any of the images are smaller than the selected resize width, you will be given an option to enlarge them. A checkbox will appear next to each such image. Check the box if you wish to enlarge that image.
+- **Several Widths at Once:** Check 'Make several widths from each image' and pick the widths you need. Each image is read once and every width goes into the same zip file, named like `photo-400.jpg` and `photo-800.jpg`.
+- **WebP Output:** Check 'Save as WebP' to save the resized images as WebP, which is usually much smaller than JPEG or PNG. The timing table shows how many KB each image saves compared with the upload.
+- **Timings:** Check 'Show timings' in the sidebar to see how long decoding, resizing and encoding took for each image, and download the timings as JSON or CSV.
 
 ### Troubleshooting
 - If you encounter any issues or errors, please refresh the page and try again.
@@ -1,134 +1,145 @@
 import streamlit as st
-import requests
-from bs4 import BeautifulSoup
+from toolbox import moodle
+from toolbox.assets import localize_assets
+from toolbox.httpcache import shared_cache
+from toolbox.output import HtmlWriter
+from toolbox.jobs import shared_job_queue
+from toolbox.panels import bundle_panel, client_id, delta_panel, jobs_panel
+from toolbox.sections import (
+    course_weeks, extract_section_html, fetch_course_page, format_template, index_sections, verify_page_loaded,
+)
+from toolbox.snapshots import ChangeTracker, page_digest, shared_snapshot_store
 
 st.set_page_config(page_title="Sections Extractor", page_icon="🔨")
 st.title("Sections Extractor")
 st.sidebar.header("Sections Extractor")
 st.sidebar.write("This application extracts the content from each week of the course into an HTML file.")
 st.sidebar.image("https://i.imgur.com/BPN9akd.png", width=250)
+show_timings = st.sidebar.checkbox("Show timings", help="Time each stage of the run and offer the timings as JSON or CSV.")
+if st.sidebar.button("Clear page cache"):
+    shared_cache().store.clear()
 
-LOGIN_URL = "https://online.tiffin.edu/login/index.php"
-
-def login_to_moodle(session, username, password):
-    """Authenticate with Moodle and persist the session."""
-    login_page = session.get(LOGIN_URL)
-    soup = BeautifulSoup(login_page.content, "html.parser")
-    logintoken_tag = soup.find("input", {"name": "logintoken"})
-    logintoken = logintoken_tag["value"] if logintoken_tag else None
-
-    login_payload = {"username": username, "password": password}
-    if logintoken:
-        login_payload["logintoken"] = logintoken
-
-    response = session.post(LOGIN_URL, data=login_payload)
-    if "login" in response.url or "Invalid login" in response.text:
-        st.error("Login failed. Verify your credentials.")
-        return False
-    return True
-
-def verify_page_loaded(soup):
-    """
-    Confirm that the course page has fully loaded by checking for section elements.
-    Adjust this check if a more specific marker is available.
-    """
-    sections = soup.find_all("li", {"class": "section"})
-    return bool(sections)
+ALLOWED_USERNAMES = ["mckay", "mckaym","meadowsml", "schmalleggerd", "raavis", "testabcd"]
 
-def extract_section_html(soup, section_num):
+def extract_sections(job, username, password, course_id, use_cache, changes_only, bundle_assets):
     """
-    Extract content from a specified section within the provided BeautifulSoup object.
-    Only sections with a NextGen4 container are processed.
+    Run as a job: log in, fetch the course page and write every week's section
+    into one HTML file, or only the sections that changed since this user's
+    last run. Returns what show_sections needs, or None.
     """
-    sections = soup.find_all("li", {"class": "section"})
-    target_section = None
-    for section in sections:
-        section_id = section.get("id", "")
-        if f"section-{section_num}" in section_id:
-            target_section = section
-            break
-
-    if target_section:
-        content_div = target_section.find("div", class_="NextGen4")
-        if content_div:
-            nav_elements = content_div.find_all("p", class_="Internal_Links")
-            for nav in nav_elements:
-                nav.decompose()
-            return str(content_div)
-        else:
-            return f"<p>Error: Section {section_num} does not include the required NextGen4 container.</p>"
-    return f"<p>Error: No content found for section {section_num}.</p>"
-
-def format_template(section_name, section_html):
-    """Insert the section content into the HTML template."""
-    template = f"""
-<h2>{section_name}</h2>
-{section_html}
-"""
-    return template
-
-ALLOWED_USERNAMES = ["mckay", "mckaym","meadowsml", "schmalleggerd", "raavis", "testabcd"]
+    # Reuses this user's logged-in session from an earlier run when there is one.
+    job.report(message="Logging into Moodle...")
+    if moodle.get_session(username, password) is None:
+        job.note("error", "Login failed. Verify your credentials.")
+        return None
+
+    cache = shared_cache() if use_cache else None
+    cache_stats = shared_cache().stats.copy()
+    job.report(message="Fetching the course page...")
+    course_response = fetch_course_page(username, password, course_id, cache=cache)
+    if not course_response:
+        job.note("error", "Failed to fetch course content.")
+        return None
+    
+    # Now index the course sections once and verify them.
+    sections = index_sections(course_response.content)
+    if not verify_page_loaded(sections):
+        job.note("error", "Course content has not fully loaded. Confirm that all dynamic content appears before extraction.")
+        return None
+
+    snapshots = shared_snapshot_store()
+    tracker = ChangeTracker(snapshots.load("sections", username, course_id), changes_only=changes_only)
+    page_hash = page_digest(course_response.content)
+    with HtmlWriter() as html_output:
+        written = 0
+        weeks = course_weeks(sections)
+        for done, (section_name, section_num) in enumerate(weeks, start=1):
+            section_html = tracker.item(
+                f"section-{section_num}", section_name, lambda: extract_section_html(sections, section_num), page_hash,
+            )
+            if section_html is None:
+                continue
+            job.report(done / len(weeks), f"Extracting content from {section_name} (Section {section_num}).")
+            formatted_section = format_template(section_name, section_html)
+            html_output.write(formatted_section)
+            written += 1
+        html = html_output.getvalue() if written else None
+    snapshots.save("sections", username, course_id, tracker.items)
+
+    run = {
+        "tracker": tracker,
+        "cache_summary": shared_cache().summary(since=cache_stats) if use_cache else None,
+        "html": html,
+        "bundle": None,
+    }
+    if written and bundle_assets:
+        job.report(message="Downloading images and files...")
+        run["bundle"] = localize_assets(
+            run["html"].decode("utf-8"), moodle.get_session(username, password), moodle.MOODLE_URL,
+            cache=cache, namespace=username,
+        )
+    return run
+
+def show_sections(job, key):
+    """The downloads and change summary of a finished extract_sections job."""
+    run = job.result
+    if run is None:
+        return
+    if run["cache_summary"]:
+        st.caption(run["cache_summary"])
+    delta_panel(run["tracker"], key=key)
+
+    if run["html"] is None:
+        st.info("No section has changed since your last run.")
+        return
+    st.download_button(
+        label="Download Sections as HTML",
+        data=run["html"],
+        file_name="sections_extraction.html",
+        mime="text/html",
+        key=f"{key}_html",
+        on_click=job.mark_downloaded,
+    )
+    if run["bundle"] is not None:
+        bundle_panel(run["bundle"], file_name="sections_extraction.zip", key=key, on_click=job.mark_downloaded)
 
 def main():
     with st.form("moodle_form"):
         username = st.text_input("Username")
         password = st.text_input("Password", type="password")
         course_id = st.text_input("Course ID", "")
+        use_cache = st.checkbox("Reuse pages fetched in earlier runs", value=True)
+        changes_only = st.checkbox(
+            "Only sections changed since my last run",
+            help="Compares each section with what this tool found for this course the last time you ran it, and downloads only the new and changed ones.",
+        )
+        bundle_assets = st.checkbox(
+            "Also download images and files for offline review",
+            help="Makes a zip with the extracted HTML and a copy of every image and file it uses from Moodle, with the links pointing at the copies. Wide images are scaled down.",
+        )
         submit_button = st.form_submit_button("Submit")
 
+    # Runs go through the server's job queue, so they carry on if this page reruns or the browser disconnects.
+    queue = shared_job_queue()
+    client = client_id()
     if submit_button:
         if username not in ALLOWED_USERNAMES:
             st.error("You do not have permissions to use this tool.")
             st.stop()
-
-        session = requests.Session()
-        if not login_to_moodle(session, username, password):
+        # Logging in here, rather than only in the job, is what lets this session list the user's runs from
+        # other sessions; the job reuses the cached session.
+        if moodle.get_session(username, password) is None:
+            st.error("Login failed. Verify your credentials.")
             st.stop()
-    
-        course_paths = ["view.php", "section.php"]
-        course_response = None
-        
-        for path in course_paths:
-            course_url = f"https://online.tiffin.edu/course/{path}?id={course_id}"
-            response = session.get(course_url)
-            # If we get a 200 status, assume we have the correct path
-            if response.status_code == 200:
-                course_response = response
-                break
-        
-        if not course_response:
-            st.error("Failed to fetch course content.")
-            return
-        
-        # Now parse and verify the HTML.
-        soup = BeautifulSoup(course_response.content, "html.parser")
-        if not verify_page_loaded(soup):
-            st.error("Course content has not fully loaded. Confirm that all dynamic content appears before extraction.")
-            return
-
-        html_output = ""
-        sections = {
-            "Week 1": 1,
-            "Week 2": 2,
-            "Week 3": 3,
-            "Week 4": 4,
-            "Week 5": 5,
-            "Week 6": 6,
-            "Week 7": 7
-        }
-
-        for section_name, section_num in sections.items():
-            st.write(f"Extracting content from {section_name} (Section {section_num}).")
-            section_html = extract_section_html(soup, section_num)
-            formatted_section = format_template(section_name, section_html)
-            html_output += formatted_section
-
-        st.download_button(
-            label="Download Sections as HTML",
-            data=html_output,
-            file_name="sections_extraction.html",
-            mime="text/html"
+        st.session_state["moodle_user"] = username
+        queue.submit(
+            "sections", username, f"Sections of course {course_id}", extract_sections,
+            username, password, course_id, use_cache, changes_only, bundle_assets, client=client,
         )
+    jobs_panel(
+        queue, client, "sections", show_sections, key="sections", show_timings=show_timings,
+        user=st.session_state.get("moodle_user"),
+    )
 
 if __name__ == "__main__":
     main()
@@ -143,8 +154,14 @@ st.markdown("""
    Input the course ID in the designated field (e.g., 33234).
 
 3. **Begin Extraction:**  
-   Click the Submit button. The application logs in to Moodle and retrieves content from each weekly section.
+   Click the Submit button. The run waits for a free worker on the server, then logs in to Moodle and retrieves content from each weekly section while showing its progress. You can leave it running and use the other tools meanwhile. After a reload, submitting the form again also lists your earlier runs.
 
 4. **Download the Extracted File:**  
-   After extraction, a Download Sections as HTML button appears. Click this button to download a single HTML file containing the selected sections.
+   After extraction, a Download Sections as HTML button appears. Click this button to download a single HTML file containing the selected sections. Finished runs are kept until you download them or click Dismiss.
+
+5. **Review Only What Changed:**  
+   Check Only sections changed since my last run to download just the sections that are new or different since you last extracted this course. A summary of what changed, added and removed appears above the download button.
+
+6. **Review Offline:**  
+   Check Also download images and files for offline review to get a zip with the extracted HTML and a copy of every image and file it uses from Moodle. Open `index.html` from the unzipped folder; wide images are scaled down to keep the zip small.
 """)
@@ -1,6 +1,14 @@
 import streamlit as st
-import requests
-from bs4 import BeautifulSoup
+from functools import partial
+from toolbox import moodle
+from toolbox.activities import extract_nextgen4_content, get_all_activities, read_activity_content
+from toolbox.assets import localize_assets
+from toolbox.fetch import DEFAULT_WORKERS, fetch_page, iter_fetch
+from toolbox.httpcache import shared_cache
+from toolbox.output import HtmlWriter
+from toolbox.jobs import shared_job_queue
+from toolbox.panels import bundle_panel, client_id, delta_panel, jobs_panel
+from toolbox.snapshots import ChangeTracker, page_digest, shared_snapshot_store
 
 st.set_page_config(
     page_title="Activity Extractor",
@@ -12,129 +20,149 @@ st.sidebar.write(
     """This application extracts the content from each activity in the course into an HTML file."""
 )
 st.sidebar.image("https://i.imgur.com/BPN9akd.png", width=250)
+show_timings = st.sidebar.checkbox("Show timings", help="Time each stage of the run and offer the timings as JSON or CSV.")
+if st.sidebar.button("Clear page cache"):
+    shared_cache().store.clear()
 
-LOGIN_URL = "https://online.tiffin.edu/login/index.php"
+ALLOWED_USERNAMES = ["mckay", "meadowsml", "schmalleggerd"]
 
-def login_to_moodle(session, username, password):
-    """Logs into Moodle and ensures session authentication persists."""
-    login_page = session.get(LOGIN_URL)
-    soup = BeautifulSoup(login_page.content, "html.parser")
-    logintoken_tag = soup.find("input", {"name": "logintoken"})
-    logintoken = logintoken_tag["value"] if logintoken_tag else None
-
-    login_payload = {
-        "username": username,
-        "password": password
-    }
-    if logintoken:
-        login_payload["logintoken"] = logintoken
-
-    response = session.post(LOGIN_URL, data=login_payload)
-    if "login" in response.url or "Invalid login" in response.text:
-        st.error("Login failed! Check your credentials.")
-        return False
-    return True
-
-def get_all_activities(session, course_id):
+def extract_activities(job, username, password, course_id, workers, use_cache, changes_only, bundle_assets):
     """
-    Fetches the Gradebook Setup page for `course_id`
-    and returns a list of (activity_title, activity_url)
-    by locating <a class="gradeitemheader"> links.
+    Run as a job: log in, fetch every activity in the gradebook and combine
+    their content into one HTML file, or only the activities that changed since
+    this user's last run. Returns what show_activities needs, or None.
     """
-    gradebook_url = f"https://online.tiffin.edu/grade/edit/tree/index.php?id={course_id}"
-    response = session.get(gradebook_url)
-    if response.status_code != 200:
-        st.error("Failed to retrieve Gradebook Setup page.")
-        return []
-
-    soup = BeautifulSoup(response.content, "html.parser")
-    link_tags = soup.select("a.gradeitemheader")
-
-    activities = []
-    for link_tag in link_tags:
-        title = link_tag.get_text(strip=True)
-        href = link_tag.get("href", "")
-        if href:
-            activities.append((title, href))
-
-    return activities
-
-def get_activity_html(session, activity_url):
-    """Returns the raw HTML content of the given activity URL."""
-    response = session.get(activity_url)
-    if response.status_code != 200:
-        st.error(f"Failed to open activity URL: {activity_url}")
-        return ""
-    return response.text
-
-def extract_nextgen4_content(html_content):
-    """
-    Using BeautifulSoup, parse the full activity HTML
-    and extract only <div class="NextGen4 TU-activity-page">.
-    """
-    soup = BeautifulSoup(html_content, "html.parser")
-    page_div = soup.find("div", class_="NextGen4 TU-activity-page")
-    if not page_div:
-        return "<p>No NextGen4 TU-activity-page content found.</p>"
-
-    # Example: remove <p class="Internal_Links"> blocks
-    nav_elements = page_div.find_all("p", class_="Internal_Links")
-    for nav in nav_elements:
-        nav.decompose()
+    # Reuses this user's logged-in session from an earlier run when there is one.
+    job.report(message="Logging into Moodle...")
+    if moodle.get_session(username, password) is None:
+        job.note("error", "Login failed! Check your credentials.")
+        return None
+
+    cache = shared_cache() if use_cache else None
+    cache_stats = shared_cache().stats.copy()
+    job.report(message="Login successful. Finding all activity links from Gradebook Setup...")
+    activities = get_all_activities(username, password, course_id, cache=cache)
+    if activities is None:
+        job.note("error", "Failed to retrieve Gradebook Setup page.")
+    if not activities:
+        job.note("warning", "No activities found or unable to parse the Gradebook Setup.")
+        return None
+    # The gradebook fetch may have logged in again, so take the current session.
+    session = moodle.get_session(username, password)
+
+    job.note("success", f"Found {len(activities)} activity link(s).")
+    # Fetch concurrently, then reassemble in gradebook order. Each page is only
+    # read up to the end of its NextGen4 div.
+    results = [None] * len(activities)
+    urls = [url for _, url in activities]
+    fetch = partial(fetch_page, cache=cache, namespace=username, read=read_activity_content)
+    for done, (idx, result) in enumerate(iter_fetch(session, urls, workers=workers, fetch=fetch), start=1):
+        results[idx] = result
+        job.report(done / len(activities), f"Fetched {done} of {len(activities)}: {activities[idx][0]}")
+
+    job.report(message="Extracting content...")
+    snapshots = shared_snapshot_store()
+    tracker = ChangeTracker(snapshots.load("activities", username, course_id), changes_only=changes_only)
+    written = 0
+    with HtmlWriter() as combined_html:
+        combined_html.write(
+            "<html>\n<head><meta charset='UTF-8'></head>\n<body>\n"
+            f"<h1>Extracted Activities for Course {course_id}</h1>\n"
+        )
+        for (title, url), result in zip(activities, results):
+            if result.error:
+                job.note("error", f"Failed to open activity URL: {url} ({result.error})")
+                tracker.keep(url)
+                continue
 
-    return str(page_div)
+            nextgen4_html = tracker.item(url, title, lambda: extract_nextgen4_content(result.text), page_digest(result.text))
+            if nextgen4_html is None:
+                continue
+            combined_html.write(f"<h2>{title}</h2>\n{nextgen4_html}\n")
+            written += 1
+        combined_html.write("</body>\n</html>")
+        html = combined_html.getvalue() if written else None
+    snapshots.save("activities", username, course_id, tracker.items)
+
+    run = {
+        "course_id": course_id,
+        "tracker": tracker,
+        "cache_summary": shared_cache().summary(since=cache_stats) if use_cache else None,
+        "html": html,
+        "bundle": None,
+    }
+    if written and bundle_assets:
+        job.report(message="Downloading images and files...")
+        run["bundle"] = localize_assets(
+            run["html"].decode("utf-8"), moodle.get_session(username, password), moodle.MOODLE_URL,
+            cache=cache, namespace=username, workers=workers,
+        )
+    return run
+
+def show_activities(job, key):
+    """The downloads and change summary of a finished extract_activities job."""
+    run = job.result
+    if run is None:
+        return
+    if run["cache_summary"]:
+        st.caption(run["cache_summary"])
+    delta_panel(run["tracker"], key=key)
+
+    if run["html"] is None:
+        st.info("No activity has changed since your last run.")
+        return
+    st.download_button(
+        label="Download All Activities (HTML)",
+        data=run["html"],
+        file_name=f"course_{run['course_id']}_activities.html",
+        mime="text/html",
+        key=f"{key}_html",
+        on_click=job.mark_downloaded,
+    )
+    if run["bundle"] is not None:
+        bundle_panel(
+            run["bundle"], file_name=f"course_{run['course_id']}_activities.zip", key=key, on_click=job.mark_downloaded,
+        )
 
 def main():
-    ALLOWED_USERNAMES = ["mckay", "meadowsml", "schmalleggerd"]
-
     with st.form("moodle_form"):
         username = st.text_input("Username")
         password = st.text_input("Password", type="password")
         course_id = st.text_input("Course ID", "")
+        workers = st.number_input("Parallel downloads", min_value=1, max_value=16, value=DEFAULT_WORKERS)
+        use_cache = st.checkbox("Reuse pages fetched in earlier runs", value=True)
+        changes_only = st.checkbox(
+            "Only activities changed since my last run",
+            help="Compares each activity with what this tool found for this course the last time you ran it, and downloads only the new and changed ones.",
+        )
+        bundle_assets = st.checkbox(
+            "Also download images and files for offline review",
+            help="Makes a zip with the extracted HTML and a copy of every image and file it uses from Moodle, with the links pointing at the copies. Wide images are scaled down.",
+        )
         submit_button = st.form_submit_button("Submit")
 
+    # Runs go through the server's job queue, so they carry on if this page reruns or the browser disconnects.
+    queue = shared_job_queue()
+    client = client_id()
     if submit_button:
         # Check if username is allowed
         if username not in ALLOWED_USERNAMES:
             st.error("You do not have permissions to use this tool.")
             st.stop()
-
-        # Create the Session before calling the login function
-        session = requests.Session()
-
-        st.write("Logging into Moodle...")
-        if not login_to_moodle(session, username, password):
+        # Logging in here, rather than only in the job, is what lets this session list the user's runs from
+        # other sessions; the job reuses the cached session.
+        if moodle.get_session(username, password) is None:
+            st.error("Login failed. Verify your credentials.")
             st.stop()
-
-        st.write("Login successful. Finding all activity links from Gradebook Setup...")
-        activities = get_all_activities(session, course_id)
-        if not activities:
-            st.warning("No activities found or unable to parse the Gradebook Setup.")
-            return
-
-        st.success(f"Found {len(activities)} activity link(s). Extracting content...")
-        combined_html = (
-            "<html>\n<head><meta charset='UTF-8'></head>\n<body>\n"
-            f"<h1>Extracted Activities for Course {course_id}</h1>\n"
-        )
-
-        for idx, (title, url) in enumerate(activities, start=1):
-            st.write(f"Fetching Activity {idx}: {title}")
-            raw_html = get_activity_html(session, url)
-            if not raw_html:
-                continue
-
-            nextgen4_html = extract_nextgen4_content(raw_html)
-            combined_html += f"<h2>{title}</h2>\n{nextgen4_html}\n"
-
-        combined_html += "</body>\n</html>"
-
-        st.download_button(
-            label="Download All Activities (HTML)",
-            data=combined_html,
-            file_name=f"course_{course_id}_activities.html",
-            mime="text/html"
+        st.session_state["moodle_user"] = username
+        queue.submit(
+            "activities", username, f"Activities of course {course_id}", extract_activities,
+            username, password, course_id, workers, use_cache, changes_only, bundle_assets, client=client,
         )
+    jobs_panel(
+        queue, client, "activities", show_activities, key="activities", show_timings=show_timings,
+        user=st.session_state.get("moodle_user"),
+    )
 
 if __name__ == "__main__":
     main()
@@ -154,7 +182,16 @@ st.markdown(
        - The application logs into Moodle and scans the Gradebook Setup page for all activity links.
 
     4. **Download the Consolidated File:**
+       - The run waits for a free worker on the server and then shows its progress. You can leave it running and use the other tools meanwhile. After a reload, submitting the form again also lists your earlier runs.
        - After extraction, the application creates a single HTML file containing all activities.
-       - Click **Download All Activities (HTML)** to save the file to your device.
+       - Click **Download All Activities (HTML)** to save the file to your device. Finished runs are kept until you download them or click **Dismiss**.
+
+    5. **Review Only What Changed:**
+       - Check **Only activities changed since my last run** to download just the activities that are new or different since you last extracted this course.
+       - A summary lists the changed, new and removed activities, and the full list can be downloaded as JSON.
+
+    6. **Review Offline:**
+       - Check **Also download images and files for offline review** to get a zip with the extracted HTML and a copy of every image and file it uses from Moodle.
+       - Open `index.html` from the unzipped folder; wide images are scaled down to keep the zip small.
     """
 )
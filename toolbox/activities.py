@@ -0,0 +1,140 @@
+"""Extraction of NextGen4 content from Moodle activity pages."""
+import codecs
+import re
+from html.parser import HTMLParser
+
+from toolbox import moodle
+from toolbox.parsing import make_soup
+from toolbox.timing import annotate, span
+
+# The start tag of the div extract_nextgen4_content looks for, whose class
+# attribute is exactly "NextGen4 TU-activity-page".
+ACTIVITY_START_PATTERN = re.compile(r"""<div\b[^>]*?\sclass\s*=\s*(["'])NextGen4 TU-activity-page\1""", re.IGNORECASE)
+# How far back to search again when new text arrives, for a start tag split across chunks.
+ACTIVITY_START_OVERLAP = 1024
+ACTIVITY_CHUNK_SIZE = 16 * 1024
+
+
+def gradebook_activities(gradebook_html):
+    """Return (activity_title, activity_url) for every <a class="gradeitemheader"> link on a Gradebook Setup page."""
+    soup = make_soup(gradebook_html)
+    link_tags = soup.select("a.gradeitemheader")
+
+    activities = []
+    for link_tag in link_tags:
+        title = link_tag.get_text(strip=True)
+        href = link_tag.get("href", "")
+        if href:
+            activities.append((title, href))
+
+    return activities
+
+
+def get_all_activities(username, password, course_id, cache=None):
+    """
+    Fetches the Gradebook Setup page for `course_id`
+    and returns a list of (activity_title, activity_url),
+    or None if the page could not be fetched.
+    """
+    gradebook_url = f"{moodle.MOODLE_URL}/grade/edit/tree/index.php?id={course_id}"
+    response = moodle.fetch(username, password, gradebook_url, cache=cache)
+    if response is None or response.status_code != 200:
+        return None
+    return gradebook_activities(response.content)
+
+
+def extract_nextgen4_content(html_content):
+    """
+    Parse the full activity HTML
+    and extract only <div class="NextGen4 TU-activity-page">.
+    """
+    soup = make_soup(html_content)
+    with span("extract activity"):
+        page_div = soup.find("div", class_="NextGen4 TU-activity-page")
+        if not page_div:
+            return "<p>No NextGen4 TU-activity-page content found.</p>"
+
+        # Example: remove <p class="Internal_Links"> blocks
+        nav_elements = page_div.find_all("p", class_="Internal_Links")
+        for nav in nav_elements:
+            nav.decompose()
+
+        return str(page_div)
+
+
+class DivEnd(HTMLParser):
+    """
+    Fed HTML that starts with a <div>, finds the (line, column) of the </div>
+    that closes it. Only div tags are counted, and the contents of scripts,
+    styles and comments, which HTMLParser skips over, are not.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.depth = 0
+        self.position = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "div":
+            self.depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        # HTML ignores the slash in <div/>, so it still opens a div.
+        self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if tag == "div" and self.position is None:
+            self.depth -= 1
+            if self.depth == 0:
+                self.position = self.getpos()
+
+
+def text_offset(text, line, column):
+    """The index in `text` of a 1-based line and 0-based column, as HTMLParser.getpos reports them."""
+    index = 0
+    for _ in range(line - 1):
+        index = text.index("\n", index) + 1
+    return index + column
+
+
+def read_activity_content(response, chunk_size=ACTIVITY_CHUNK_SIZE):
+    """
+    A `read` function for fetch_page that streams an activity page and returns
+    only the HTML of its <div class="NextGen4 TU-activity-page">, closing the
+    connection as soon as the div has closed instead of downloading the
+    navigation, blocks, footer and scripts after it. When the page has no such
+    div, or it never closes, the whole page is returned, so
+    extract_nextgen4_content gives the same result either way. The bytes
+    read are noted on the fetch span when they come off the network rather
+    than from the page cache.
+    """
+    decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+    text = ""
+    start = None
+    div_end = DivEnd()
+    bytes_read = 0
+    try:
+        for chunk in response.iter_content(chunk_size):
+            bytes_read += len(chunk)
+            piece = decoder.decode(chunk)
+            if start is None:
+                searched = len(text)
+                text += piece
+                match = ACTIVITY_START_PATTERN.search(text, max(0, searched - ACTIVITY_START_OVERLAP))
+                if match:
+                    start = match.start()
+                    div_end.feed(text[start:])
+            else:
+                text += piece
+                div_end.feed(piece)
+            if div_end.position is not None:
+                end = text.index(">", start + text_offset(text[start:], *div_end.position)) + 1
+                if response.raw is not None:
+                    annotate(bytes=bytes_read, stopped_early=True)
+                return text[start:end]
+        text += decoder.decode(b"", final=True)
+    finally:
+        response.close()
+    if response.raw is not None:
+        annotate(bytes=bytes_read, stopped_early=False)
+    return text
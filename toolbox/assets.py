@@ -0,0 +1,217 @@
+"""
+Offline bundles of extracted course HTML. The images and files the HTML links
+to on Moodle are downloaded once each over the logged-in session, wide images
+are scaled down, and everything is zipped next to a copy of the HTML whose
+links point at the bundled files.
+"""
+import io
+import posixpath
+import re
+from collections import namedtuple
+from functools import partial
+from urllib.parse import unquote, urljoin, urldefrag, urlparse
+
+from toolbox.fetch import DEFAULT_WORKERS, ReadError, fetch_page, iter_fetch
+from toolbox.moodle import is_login_page
+from toolbox.output import ZipWriter
+from toolbox.parsing import SERIALIZING_PARSER, make_soup
+from toolbox.timing import span
+
+# Images wider than this are scaled down in the bundle.
+ASSET_MAX_WIDTH = 1200
+ASSET_DIR = "assets"
+BUNDLE_PAGE = "index.html"
+
+# Attributes that load an asset, and the link paths that are Moodle files rather than pages.
+ASSET_ATTRIBUTES = {"img": "src", "source": "src", "video": "src", "audio": "src", "a": "href"}
+# Tags whose srcset lists more images, each followed by a width or density.
+SRCSET_TAGS = ("img", "source")
+SRCSET_URL = re.compile(r"[\s,]*(\S*)")
+FILE_PATHS = ("/pluginfile.php/", "/draftfile.php/")
+RESIZABLE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp"}
+
+# `failed` lists (url, error) pairs; the byte counts are what Moodle sent and what went into the zip.
+AssetReport = namedtuple("AssetReport", ["assets", "failed", "resized", "source_bytes", "bundled_bytes", "zip_bytes"])
+Bundle = namedtuple("Bundle", ["data", "report"])
+
+
+def is_moodle_file(tag_name, url, base_url):
+    """Whether `url` is an asset on the Moodle site: anything an img or media tag loads, or a file link."""
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or parsed.netloc != urlparse(base_url).netloc:
+        return False
+    return tag_name != "a" or any(path in parsed.path for path in FILE_PATHS)
+
+
+def absolute_url(url, base_url):
+    """`url` made absolute against `base_url`, without its fragment."""
+    return urldefrag(urljoin(base_url + "/", url))[0]
+
+
+def split_srcset(srcset):
+    """
+    The (url, descriptors) candidates of a srcset attribute, split as browsers
+    do: a URL runs to the next space, so a comma inside one (as in a data:
+    URL) does not split it, and a comma at its end ends the candidate.
+    """
+    candidates, position = [], 0
+    while True:
+        match = SRCSET_URL.match(srcset, position)
+        url, position = match.group(1), match.end()
+        if not url:
+            return candidates
+        if url.endswith(","):
+            candidates.append((url.rstrip(","), ""))
+            continue
+        comma = srcset.find(",", position)
+        end = len(srcset) if comma == -1 else comma
+        candidates.append((url, srcset[position:end].strip()))
+        position = end + 1
+
+
+def relink_srcset(srcset, base_url, local):
+    """`srcset` with each URL in `local`, a dict of absolute URL to bundled path, pointed at the bundled copy."""
+    return ", ".join(
+        " ".join(filter(None, [local.get(absolute_url(url, base_url), url), descriptors]))
+        for url, descriptors in split_srcset(srcset)
+    )
+
+
+def collect_assets(soup, base_url):
+    """
+    Map each asset URL in `soup`, absolute and without its fragment, to the
+    (tag, attribute) pairs that use it, in document order. The URLs in a
+    srcset are listed under the "srcset" attribute.
+    """
+    assets = {}
+    for tag in soup.find_all(list(ASSET_ATTRIBUTES)):
+        attribute = ASSET_ATTRIBUTES[tag.name]
+        uses = [(tag.get(attribute), attribute)]
+        if tag.name in SRCSET_TAGS and tag.get("srcset"):
+            uses += [(url, "srcset") for url, _ in split_srcset(tag["srcset"])]
+        for value, used_in in uses:
+            if not value:
+                continue
+            url = absolute_url(value, base_url)
+            if is_moodle_file(tag.name, url, base_url):
+                assets.setdefault(url, []).append((tag, used_in))
+    return assets
+
+
+def asset_name(url, used):
+    """A file name for `url` under ASSET_DIR, from the last part of its path, made unique against `used`."""
+    name = posixpath.basename(unquote(urlparse(url).path)) or "file"
+    stem, suffix = posixpath.splitext(name)
+    candidate, number = name, 1
+    while candidate.lower() in used:
+        number += 1
+        candidate = f"{stem}-{number}{suffix}"
+    used.add(candidate.lower())
+    return candidate
+
+
+def read_bytes(response):
+    """
+    A `read` function for fetch_page that keeps the body as bytes, for files
+    that are not text. A file Moodle answered with its login page, because the
+    session expired or the file is not the user's to see, fails rather than
+    going into the bundle as the login form.
+    """
+    try:
+        if is_login_page(response):
+            raise ReadError("Moodle sent its login page instead")
+        return response.content
+    finally:
+        response.close()
+
+
+def scale_down(files, max_width, workers=None, cache=None):
+    """
+    Replace the data of every image in `files`, a dict of name to bytes, that
+    is wider than `max_width` with one resized to that width, kept in `cache`
+    (a RenditionCache, by default the shared one). Returns the names of the
+    images that were resized.
+    """
+    from PIL import UnidentifiedImageError
+
+    from toolbox.images import ImageTooLarge, inspect_image, iter_resize, rendition_job, shared_rendition_cache
+
+    cache = cache or shared_rendition_cache()
+    jobs = []
+    for name, data in files.items():
+        if posixpath.splitext(name)[1].lower() not in RESIZABLE_SUFFIXES:
+            continue
+        try:
+            info = inspect_image(io.BytesIO(data))
+        except (ImageTooLarge, UnidentifiedImageError):
+            continue
+        if info.width > max_width:
+            jobs.append((name, data, (max_width,), None))
+    resized = []
+    for job, result in zip(jobs, iter_resize(jobs, workers=workers, cache=cache, function=rendition_job)):
+        if not result.error:
+            files[job[0]] = result.renditions[0].data
+            resized.append(job[0])
+    return resized
+
+
+def localize_assets(html, session, base_url, cache=None, namespace="", max_width=ASSET_MAX_WIDTH,
+                    workers=DEFAULT_WORKERS, image_cache=None):
+    """
+    Download every Moodle image and file `html` links to, once each and
+    `workers` at a time, through `cache` (an HttpCache) under `namespace`, and
+    return a Bundle: a zip of BUNDLE_PAGE, with its links rewritten to the
+    local copies, plus the files under ASSET_DIR, and an AssetReport. Assets
+    that fail to download keep their Moodle links. `image_cache` is passed
+    to scale_down.
+    """
+    with span("localize assets") as localize_span:
+        soup = make_soup(html, parser=SERIALIZING_PARSER)
+        assets = collect_assets(soup, base_url)
+        urls = list(assets)
+        fetch = partial(fetch_page, cache=cache, namespace=namespace, read=read_bytes)
+        files, failed = {}, []
+        for _, result in iter_fetch(session, urls, workers=workers, fetch=fetch):
+            if result.error:
+                failed.append((result.url, result.error))
+            else:
+                files[result.url] = result.text
+        # Name the files in document order, whichever order they finished downloading in.
+        used, names, bundled = set(), {}, {}
+        for url in urls:
+            if url in files:
+                names[url] = asset_name(url, used)
+                bundled[names[url]] = files[url]
+        source_bytes = sum(len(data) for data in bundled.values())
+        resized = scale_down(bundled, max_width, cache=image_cache)
+
+        local = {url: f"{ASSET_DIR}/{name}" for url, name in names.items()}
+        # Keyed by id: Tags compare equal by content, and two identical tags both need relinking.
+        srcset_tags = {}
+        for url, path in local.items():
+            for tag, attribute in assets[url]:
+                if attribute == "srcset":
+                    srcset_tags[id(tag)] = tag
+                else:
+                    tag[attribute] = path
+        for tag in srcset_tags.values():
+            tag["srcset"] = relink_srcset(tag["srcset"], base_url, local)
+        with ZipWriter() as archive:
+            archive.write(BUNDLE_PAGE, str(soup).encode("utf-8"))
+            for name, data in bundled.items():
+                archive.write(f"{ASSET_DIR}/{name}", data)
+            data = archive.getvalue()
+        report = AssetReport(len(urls), failed, resized, source_bytes, sum(len(d) for d in bundled.values()), len(data))
+        localize_span.set(assets=len(urls), failed=len(failed), resized=len(resized), zip_bytes=len(data))
+    return Bundle(data, report)
+
+
+def report_summary(report):
+    """One line on what went into the bundle."""
+    summary = (
+        f"Bundled {report.assets - len(report.failed)} of {report.assets} images and files: "
+        f"{report.source_bytes / 1e6:.1f} MB from Moodle, {report.bundled_bytes / 1e6:.1f} MB bundled"
+    )
+    if report.resized:
+        summary += f" after scaling down {len(report.resized)} wide image(s)"
+    return summary + f", {report.zip_bytes / 1e6:.1f} MB zip."
@@ -0,0 +1,102 @@
+"""
+Format and merge a directory of Course Build Plans without Streamlit.
+
+    python -m toolbox.batch plans/ --moodle-template moodle.html --out built/
+
+Every plan goes through the same steps as the Format HTML Headings and HTML
+Merge to Moodle pages, on one parse tree per plan (see toolbox.pipeline),
+spread across a process pool. For each plan the output
+directory gets <stem>_formatted.html and <stem>_moodle.html, and summary.csv
+records per-file timings, week counts, unmatched placeholders and errors.
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from toolbox.formatting import DEFAULT_HEADING_TEMPLATE, straighten_quotes
+from toolbox.merge import cached_compile_template, render_template
+from toolbox.pipeline import extract_weeks, format_plan
+
+SUMMARY_FIELDS = ["plan", "weeks", "unmatched", "format_seconds", "merge_seconds", "total_seconds", "error"]
+
+
+def build_course(plan_path, heading_template, moodle_template, out_dir):
+    """Format and merge one plan, write both outputs and return its summary row."""
+    plan_path = Path(plan_path)
+    row = dict.fromkeys(SUMMARY_FIELDS, "")
+    row["plan"] = plan_path.name
+    start = time.perf_counter()
+    try:
+        soup = format_plan(plan_path.read_bytes(), heading_template)
+        formatted_at = time.perf_counter()
+        weeks_data = extract_weeks(soup)
+        final_html, report = render_template(cached_compile_template(moodle_template), weeks_data)
+        merged_at = time.perf_counter()
+        formatted_html = straighten_quotes(str(soup))
+        (Path(out_dir) / f"{plan_path.stem}_formatted.html").write_text(formatted_html, "utf-8")
+        (Path(out_dir) / f"{plan_path.stem}_moodle.html").write_text(final_html, "utf-8")
+    except Exception as exc:
+        row["error"] = f"{type(exc).__name__}: {exc}"
+    else:
+        row["weeks"] = len(weeks_data)
+        row["unmatched"] = len(report.unmatched)
+        row["format_seconds"] = round(formatted_at - start, 4)
+        row["merge_seconds"] = round(merged_at - formatted_at, 4)
+    row["total_seconds"] = round(time.perf_counter() - start, 4)
+    return row
+
+
+def build_courses(plan_paths, heading_template, moodle_template, out_dir, workers=None):
+    """Build every plan on a process pool and return the summary rows in input order."""
+    plan_paths = list(plan_paths)
+    Path(out_dir).mkdir(parents=True, exist_ok=True)
+    workers = min(workers or os.cpu_count() or 1, max(1, len(plan_paths)))
+    args = [(path, heading_template, moodle_template, out_dir) for path in plan_paths]
+    if workers <= 1:
+        return [build_course(*arg) for arg in args]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(build_course, *zip(*args)))
+
+
+def write_summary(rows, path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("plans", type=Path, help="directory of Course Build Plan .html files")
+    parser.add_argument("--moodle-template", type=Path, required=True, help="Moodle HTML template with [content...] placeholders")
+    parser.add_argument("--headings", type=Path, help="heading format template (default: the standard template)")
+    parser.add_argument("--out", type=Path, required=True, help="output directory")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    plan_paths = sorted(path for path in args.plans.iterdir() if path.suffix.lower() in (".html", ".htm"))
+    if not plan_paths:
+        parser.error(f"no .html files in {args.plans}")
+    heading_template = args.headings.read_text("utf-8") if args.headings else DEFAULT_HEADING_TEMPLATE
+    moodle_template = args.moodle_template.read_text("utf-8")
+
+    start = time.perf_counter()
+    rows = build_courses(plan_paths, heading_template, moodle_template, args.out, workers=args.workers)
+    elapsed = time.perf_counter() - start
+    write_summary(rows, args.out / "summary.csv")
+
+    width = max(len(row["plan"]) for row in rows)
+    for row in rows:
+        status = row["error"] or f"{row['weeks']} weeks, {row['unmatched']} unmatched placeholders"
+        print(f"{row['plan']:<{width}}  {row['total_seconds']:>7.3f}s  {status}")
+    failed = sum(1 for row in rows if row["error"])
+    print(f"{len(rows) - failed} built, {failed} failed in {elapsed:.2f}s; summary in {args.out / 'summary.csv'}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
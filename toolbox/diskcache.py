@@ -0,0 +1,94 @@
+"""A size-bounded, least-recently-used cache of byte blobs on disk."""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+CACHE_DIR = Path(os.environ.get("TOOLBOX_CACHE_DIR") or Path.home() / ".cache" / "course-design-toolbox")
+
+
+def cache_key(*parts):
+    """Hash `parts` (str or bytes) into a hex key."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """
+    Stores each entry as `<key>.bin` plus a `<key>.json` metadata file under
+    `directory`. Reads refresh an entry's mtime, and once the blobs exceed
+    `max_bytes` the entries with the oldest mtime are deleted first.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.size = sum(path.stat().st_size for path in self.directory.glob("*.bin"))
+
+    def _paths(self, key):
+        return self.directory / f"{key}.bin", self.directory / f"{key}.json"
+
+    def get(self, key):
+        """Return (data, meta) for `key`, or None when it is not cached."""
+        blob, meta = self._paths(key)
+        try:
+            data = blob.read_bytes()
+            info = json.loads(meta.read_text("utf-8"))
+            os.utime(blob)
+        except (OSError, ValueError):
+            return None
+        return data, info
+
+    def get_meta(self, key):
+        """Return only the metadata for `key`, or None."""
+        try:
+            return json.loads(self._paths(key)[1].read_text("utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key, data, meta):
+        blob, meta_path = self._paths(key)
+        with self._lock:
+            old_size = blob.stat().st_size if blob.exists() else 0
+            for path, content in [(meta_path, json.dumps(meta).encode("utf-8")), (blob, data)]:
+                fd, temp_path = tempfile.mkstemp(dir=self.directory)
+                with os.fdopen(fd, "wb") as f:
+                    f.write(content)
+                os.replace(temp_path, path)
+            self.size += len(data) - old_size
+            if self.size > self.max_bytes:
+                self._evict()
+
+    def update_meta(self, key, meta):
+        """Replace the metadata of an existing entry and mark it recently used."""
+        blob, meta_path = self._paths(key)
+        with self._lock:
+            if blob.exists():
+                meta_path.write_text(json.dumps(meta), "utf-8")
+                os.utime(blob)
+
+    def _evict(self):
+        entries = sorted(
+            ((entry.stat().st_mtime, entry.stat().st_size, Path(entry.path)) for entry in os.scandir(self.directory)
+             if entry.name.endswith(".bin")),
+        )
+        for _, size, blob in entries:
+            if self.size <= self.max_bytes:
+                break
+            blob.unlink(missing_ok=True)
+            blob.with_suffix(".json").unlink(missing_ok=True)
+            self.size -= size
+
+    def clear(self):
+        with self._lock:
+            for path in self.directory.iterdir():
+                if path.suffix in (".bin", ".json"):
+                    path.unlink(missing_ok=True)
+            self.size = 0
@@ -0,0 +1,111 @@
+"""
+Bounded-concurrency page fetching over a pooled HTTP session. requests is
+imported when the first session is made rather than with the module.
+"""
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from toolbox.timing import propagate, span
+
+DEFAULT_WORKERS = 8
+DEFAULT_TIMEOUT = 20
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+RETRY_STATUSES = {500, 502, 503, 504}
+
+FetchResult = namedtuple("FetchResult", ["url", "status_code", "text", "error", "elapsed"])
+
+
+class ReadError(Exception):
+    """Raised by a fetch_page `read` function to fail the fetch, without a retry, with its message as the error."""
+
+
+def make_session(pool_size=DEFAULT_WORKERS):
+    """Create a requests session whose connection pool fits `pool_size` workers."""
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def fetch_page(session, url, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+               cache=None, namespace="", read=None):
+    """
+    Fetch `url` and return a FetchResult.
+    5xx responses, timeouts and dropped connections, including a body cut
+    off partway, are retried with exponential backoff; any other non-200
+    status is reported as an error.
+    With an HttpCache as `cache`, the request goes through it under `namespace`.
+    With a `read` function, the body is streamed and the result's text is
+    read(response) instead of response.text; `read` must close the response
+    and may raise ReadError to reject it.
+    Through a cache, downloads are streamed too and what `read` returned is
+    what is cached.
+    """
+    import requests
+
+    start = time.perf_counter()
+    status_code = None
+    error = ""
+    with span("fetch", url=url) as fetch_span:
+        for attempt in range(retries + 1):
+            if attempt:
+                time.sleep(backoff * 2 ** (attempt - 1))
+            fetch_span.set(attempts=attempt + 1)
+            try:
+                if cache is not None:
+                    response = cache.get(session, url, namespace=namespace, timeout=timeout, read=read)
+                else:
+                    response = session.get(url, timeout=timeout, stream=read is not None)
+                status_code = response.status_code
+                fetch_span.set(status=status_code)
+                if status_code != 200:
+                    response.close()
+                    error = f"HTTP {status_code}"
+                    if status_code in RETRY_STATUSES:
+                        continue
+                    break
+                if read is not None:
+                    text = read(response)
+                else:
+                    text = response.text
+                    fetch_span.set(bytes=len(response.content))
+            except (requests.Timeout, requests.ConnectionError, requests.exceptions.ChunkedEncodingError) as exc:
+                status_code, error = None, str(exc) or type(exc).__name__
+                continue
+            except ReadError as exc:
+                error = str(exc)
+                break
+            return FetchResult(url, status_code, text, "", time.perf_counter() - start)
+        fetch_span.set(error=error)
+    return FetchResult(url, status_code, "", error, time.perf_counter() - start)
+
+
+def iter_fetch(session, urls, workers=DEFAULT_WORKERS, fetch=fetch_page):
+    """
+    Fetch `urls` on a pool of `workers` threads.
+    Yields (index, result) pairs as each fetch finishes, so callers can report
+    progress from their own thread and reassemble results in input order.
+    Spans recorded by the fetches go to the caller's recording.
+    """
+    urls = list(urls)
+    if not urls:
+        return
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(urls)))) as executor:
+        futures = {executor.submit(propagate(fetch), session, url): index for index, url in enumerate(urls)}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+def fetch_all(session, urls, workers=DEFAULT_WORKERS, fetch=fetch_page):
+    """Fetch `urls` concurrently and return the results in input order."""
+    urls = list(urls)
+    results = [None] * len(urls)
+    for index, result in iter_fetch(session, urls, workers=workers, fetch=fetch):
+        results[index] = result
+    return results
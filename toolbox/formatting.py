@@ -0,0 +1,93 @@
+"""Heading normalization for Course Build Plan HTML."""
+import re
+
+from toolbox.memo import memoize
+from toolbox.parsing import SERIALIZING_PARSER, make_soup
+from toolbox.timing import span
+
+# The standard Course Build Plan headings, at the level Moodle expects.
+DEFAULT_HEADING_TEMPLATE = """
+ <h3>Overview</h3>
+<h4>This Week's Learning Goals</h4>
+<h4>Key Topics for the Week</h4>
+<h4>Resources</h4>
+<h4>Significance</h4>
+<h4>What's Next?</h4>
+<h3>Introduction</h3>
+<h3>Initial Post Instructions (Due Wednesday)</h3>
+<h3>Follow-up Post Instructions (Due Saturday)</h3>
+<h3>Tips for Success</h3>
+<h3>Writing Requirements</h3>
+<h3>Weekly Learning Goal(s)</h3>
+<h3>Introduction</h3>
+<h3>Activity Instructions</h3>
+<h3>Tips for Success</h3>
+<h3>Writing and Submission Requirements</h3>
+<h3>Weekly Learning Goal(s)</h3>
+"""
+
+
+HEADING_TAGS = ('h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+# Tags whose text is checked against the template and the week header pattern.
+FORMAT_TAGS = frozenset(('p',) + HEADING_TAGS)
+WEEK_HEADER_PATTERN = re.compile(r'^\s*week\s+\d+\s*[:\-]', re.IGNORECASE)
+
+
+def normalize_text(text):
+    """
+    Normalizes text by replacing curly quotes with straight ones,
+    converting to lower case, and trimming whitespace.
+    """
+    text = text.replace('‘', "'").replace('’', "'")
+    return text.strip().lower()
+
+def is_week_header(text):
+    """
+    Checks if the text starts with a week header pattern,
+    e.g., "Week 1:" or "Week 1 -".
+    """
+    return WEEK_HEADER_PATTERN.match(text) is not None
+
+def compile_heading_template(template_html):
+    """Map the normalized text of each heading in `template_html` to its tag name."""
+    template_soup = make_soup(template_html)
+    return {normalize_text(tag.get_text()): tag.name for tag in template_soup.find_all(HEADING_TAGS)}
+
+def heading_for(headings, text):
+    """Return the tag a paragraph or heading with `text` should become, or None to leave it."""
+    norm_text = normalize_text(text)
+    if is_week_header(norm_text):
+        return 'h1'
+    return headings.get(norm_text)
+
+def format_soup(soup, headings):
+    """Retag the paragraphs and headings of `soup` in place using a compiled heading template."""
+    from bs4 import NavigableString
+
+    with span("format headings"):
+        for node in soup.descendants:
+            if node.name in FORMAT_TAGS:
+                # tag.get_text(strip=True), without a walk for the common single-string tag.
+                string = node.string
+                text = string.strip() if type(string) is NavigableString else node.get_text(strip=True)
+                name = heading_for(headings, text)
+                if name:
+                    node.name = name
+    return soup
+
+def straighten_quotes(html):
+    """Replace curly apostrophes with straight ones throughout serialized HTML."""
+    return html.replace('‘', "'").replace('’', "'")
+
+def format_html(design_html, template_html):
+    headings = cached_compile_heading_template(template_html)
+    soup = format_soup(make_soup(design_html, parser=SERIALIZING_PARSER), headings)
+    with span("serialize"):
+        return straighten_quotes(str(soup))
+
+
+# The compiled heading template, reused for every plan formatted against it.
+cached_compile_heading_template = memoize("parse")(compile_heading_template)
+
+# format_html for the page, remembered across reruns with the same inputs.
+cached_format_html = memoize("format")(format_html)
@@ -0,0 +1,121 @@
+"""
+A persistent HTTP cache for Moodle page fetches.
+Pages that send an ETag or Last-Modified header are revalidated with a
+conditional GET on every use. Moodle usually sends neither, so those pages are
+served from disk for HTTP_CACHE_TTL seconds and then downloaded again, with the
+content hash telling us whether anything actually changed.
+"""
+import threading
+import time
+from collections import Counter
+
+from toolbox.diskcache import CACHE_DIR, DiskCache, cache_key
+from toolbox.fetch import DEFAULT_TIMEOUT
+from toolbox.timing import annotate
+
+HTTP_CACHE_TTL = 10 * 60
+HTTP_CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def cached_response(data, meta):
+    """Rebuild a requests.Response for a cached page."""
+    import requests
+
+    response = requests.Response()
+    response.status_code = 200
+    response._content = data
+    response._content_consumed = True
+    response.url = meta["url"]
+    response.encoding = meta["encoding"]
+    response.headers["Content-Type"] = meta["content_type"]
+    return response
+
+
+class HttpCache:
+    """
+    Wraps session.get with an on-disk, size-bounded LRU cache. `stats` counts
+    fresh hits served without a request, `revalidated` 304s, `unchanged`
+    downloads whose content hash matched the cached copy, and `misses`.
+    """
+
+    def __init__(self, directory=None, max_bytes=HTTP_CACHE_MAX_BYTES, ttl=HTTP_CACHE_TTL):
+        self.store = DiskCache(directory or CACHE_DIR / "http", max_bytes)
+        self.ttl = ttl
+        self.stats = Counter()
+        self._lock = threading.Lock()
+
+    def _count(self, outcome):
+        annotate(cache=outcome)
+        with self._lock:
+            self.stats[outcome] += 1
+
+    def get(self, session, url, namespace="", timeout=DEFAULT_TIMEOUT, read=None):
+        """
+        GET `url` through the cache. `namespace` keeps one user's pages apart
+        from another's. Only direct 200 responses are stored, so redirects such
+        as an expired session bouncing to the login page are never cached.
+        With a fetch_page `read` function, downloads are streamed through it
+        and what it returns is cached in place of the page, under its own key,
+        so a partial read stays partial; the response returned holds that.
+        """
+        key = cache_key(namespace, url)
+        if read is not None:
+            key = cache_key(namespace, url, getattr(read, "__name__", "read"))
+        cached = self.store.get(key)
+        headers = {}
+        if cached:
+            data, meta = cached
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+            if not headers and time.time() - meta["fetched_at"] < self.ttl:
+                self._count("fresh")
+                return cached_response(data, meta)
+
+        response = session.get(url, headers=headers, timeout=timeout, stream=read is not None)
+        if response.status_code == 304 and cached:
+            response.close()
+            self._count("revalidated")
+            meta["fetched_at"] = time.time()
+            self.store.update_meta(key, meta)
+            return cached_response(data, meta)
+        if response.status_code != 200 or response.history:
+            return response
+
+        meta = {
+            "url": response.url,
+            "encoding": response.encoding,
+            "content_type": response.headers.get("Content-Type", ""),
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+        }
+        content = response.content if read is None else read(response)
+        if isinstance(content, str):
+            content, meta["encoding"] = content.encode("utf-8"), "utf-8"
+        digest = cache_key(content)
+        self._count("unchanged" if cached and cached[1]["digest"] == digest else "misses")
+        meta.update(digest=digest, fetched_at=time.time())
+        self.store.put(key, content, meta)
+        return response if read is None else cached_response(content, meta)
+
+    def summary(self, since=None):
+        """One-line hit/miss summary, optionally only counting activity after a `since` snapshot of stats."""
+        stats = self.stats - since if since else self.stats
+        return (
+            f"Page cache: {stats['fresh']} fresh, {stats['revalidated']} revalidated, "
+            f"{stats['unchanged']} unchanged, {stats['misses']} downloaded "
+            f"({self.store.size / 1e6:.1f} MB on disk)"
+        )
+
+
+def shared_cache():
+    """Return the process-wide HttpCache, creating it on first use."""
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = HttpCache()
+        return _shared_cache
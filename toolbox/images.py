@@ -0,0 +1,322 @@
+"""Image resizing for the Image Resizer page."""
+import io
+import os
+import threading
+import time
+from collections import Counter, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import PIL
+from PIL import Image
+
+from toolbox.diskcache import CACHE_DIR, DiskCache, cache_key
+from toolbox.timing import record, recording, span
+
+# Images over this many pixels are refused from their header, before any
+# pixel data is decoded. Pillow's own decompression-bomb check, which raises at
+# twice its MAX_IMAGE_PIXELS, is tied to the same limit.
+MAX_IMAGE_PIXELS = int(os.environ.get("TOOLBOX_MAX_IMAGE_PIXELS") or 64_000_000)
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+
+# Let Pillow shrink by an integer factor with Image.reduce before the final
+# LANCZOS pass once the source is more than this many times the target.
+REDUCING_GAP = 3.0
+
+ImageInfo = namedtuple("ImageInfo", ["width", "height", "format"])
+ResizeResult = namedtuple("ResizeResult", ["name", "data", "seconds", "error"])
+# All the widths made from one upload; `renditions` is a list of Renditions.
+Rendition = namedtuple("Rendition", ["name", "width", "data"])
+# `stages` holds (span, seconds, attrs) for the decode, resize and encode steps,
+# timed in the worker and added to the caller's recording by iter_resize.
+RenditionResult = namedtuple(
+    "RenditionResult", ["name", "source_bytes", "renditions", "seconds", "error", "stages"], defaults=[()]
+)
+
+RENDITION_CACHE_MAX_BYTES = 500 * 1024 * 1024
+
+# Worker processes in the pool every resize in the server shares, whichever
+# job, page or asset bundle it is for.
+RESIZE_WORKERS = int(os.environ.get("TOOLBOX_RESIZE_WORKERS") or os.cpu_count() or 1)
+
+_shared_rendition_cache = None
+_shared_rendition_cache_lock = threading.Lock()
+_resize_pool = None
+_resize_pool_lock = threading.Lock()
+
+
+class ImageTooLarge(ValueError):
+    """An image over MAX_IMAGE_PIXELS, refused before decoding."""
+
+
+def open_image(source):
+    """
+    Image.open `source` (a path or binary file object), reading only its
+    header, and refuse it if it is over MAX_IMAGE_PIXELS.
+    """
+    try:
+        img = Image.open(source)
+    except Image.DecompressionBombError as exc:
+        raise ImageTooLarge(str(exc)) from exc
+    if img.width * img.height > MAX_IMAGE_PIXELS:
+        img.close()
+        raise ImageTooLarge(
+            f"{img.width}x{img.height} is {img.width * img.height / 1e6:.0f} megapixels, "
+            f"over the {MAX_IMAGE_PIXELS / 1e6:.0f} megapixel limit"
+        )
+    return img
+
+
+def inspect_image(source):
+    """
+    Return the ImageInfo of `source` from its header alone, raising ImageTooLarge
+    or PIL.UnidentifiedImageError for uploads that cannot be resized. File
+    objects are rewound afterwards so they can be read again.
+    """
+    with span("image header"), open_image(source) as img:
+        info = ImageInfo(img.width, img.height, img.format)
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return info
+
+
+def target_size(size, base_width):
+    """Return the (width, height) that scales `size` to `base_width` wide."""
+    w_percent = (base_width / float(size[0]))
+    h_size = int((float(size[1]) * float(w_percent)))
+    return base_width, h_size
+
+
+def format_for(name):
+    """Return the Pillow format name implied by the file extension of `name`."""
+    return Image.registered_extensions()[Path(name).suffix.lower()]
+
+
+def resize_image(input_file, output_file, base_width, format=None):
+    """
+    Resize the image in `input_file` to `base_width` pixels wide and save it to
+    `output_file`; either may be a path or a binary file object. JPEGs are
+    decoded in draft mode at the smallest DCT scale that still covers the
+    target, so large photos are never fully decoded.
+    """
+    with open_image(input_file) as img:
+        size = target_size(img.size, base_width)
+        if img.format == "JPEG" and base_width < img.width:
+            img.draft(img.mode, size)
+        resized = img.resize(size, Image.Resampling.LANCZOS, reducing_gap=REDUCING_GAP)
+    resized.save(output_file, format=format)
+
+
+def resize_pyramid(input_file, widths):
+    """
+    Decode the image in `input_file` once and return [(width, image)] for each
+    of `widths`, largest first. Each size is resized from the one before it
+    rather than from the original, and JPEGs are drafted to the largest width.
+    """
+    widths = sorted(set(widths), reverse=True)
+    with open_image(input_file) as img:
+        original_size = img.size
+        if img.format == "JPEG" and widths[0] < img.width:
+            img.draft(img.mode, target_size(original_size, widths[0]))
+        with span("image decode", format=img.format):
+            img.load()
+        current = img
+        renditions = []
+        for width in widths:
+            with span("image resize", width=width):
+                current = current.resize(target_size(original_size, width), Image.Resampling.LANCZOS, reducing_gap=REDUCING_GAP)
+            renditions.append((width, current))
+    return renditions
+
+
+def rendition_name(name, width, format=None):
+    """`photo.jpg` at 800 wide becomes `photo-800.jpg`, or `photo-800.webp` in WebP."""
+    path = Path(name)
+    suffix = ".webp" if format == "WEBP" else path.suffix
+    return f"{path.stem}-{width}{suffix}"
+
+
+def rendition_job(job):
+    """
+    Make every width of a (name, data, widths, webp_quality) job from one
+    decode and return a RenditionResult. With a webp_quality the renditions
+    are WebP at that quality; otherwise they keep the format of `name`.
+    """
+    name, data, widths, webp_quality = job
+    start = time.perf_counter()
+    format = "WEBP" if webp_quality else format_for(name)
+    options = {"quality": webp_quality} if webp_quality else {}
+    renditions = []
+    with recording() as recorder:
+        try:
+            for width, image in resize_pyramid(io.BytesIO(data), widths):
+                output = io.BytesIO()
+                with span("image encode", width=width, format=format):
+                    image.save(output, format=format, **options)
+                renditions.append(Rendition(rendition_name(name, width, format), width, output.getvalue()))
+            error = ""
+        except Exception as exc:
+            renditions, error = [], str(exc)
+    stages = tuple((stage.name, stage.seconds, stage.attrs) for stage in recorder.spans)
+    return RenditionResult(name, len(data), renditions, time.perf_counter() - start, error, stages)
+
+
+def resize_job(job):
+    """
+    Resize the image bytes of a (name, data, base_width) job and return a
+    ResizeResult holding the encoded output, saved in the format of `name`.
+    """
+    name, data, base_width = job
+    start = time.perf_counter()
+    output = io.BytesIO()
+    try:
+        resize_image(io.BytesIO(data), output, base_width, format=format_for(name))
+    except Exception as exc:
+        return ResizeResult(name, b"", time.perf_counter() - start, str(exc))
+    return ResizeResult(name, output.getvalue(), time.perf_counter() - start, "")
+
+
+class RenditionCache:
+    """
+    Renditions kept on disk in a size-bounded LRU, addressed by the content
+    hash of the source image plus everything that decides the output bytes:
+    the chain of widths it was resized through, format, quality, resampling
+    settings and Pillow version. Duplicate uploads under any file name are
+    answered without decoding. `stats` counts renditions served from the
+    cache (`hits`) and made fresh (`resized`).
+    """
+
+    def __init__(self, directory=None, max_bytes=RENDITION_CACHE_MAX_BYTES):
+        self.store = DiskCache(directory or CACHE_DIR / "renditions", max_bytes)
+        self.stats = Counter()
+        self._lock = threading.Lock()
+
+    def _count(self, outcome, count):
+        with self._lock:
+            self.stats[outcome] += count
+
+    def _keys(self, job):
+        """[(width, output format, key)] for a rendition_job job, largest width first."""
+        name, data, widths, webp_quality = job
+        format = "WEBP" if webp_quality else format_for(name)
+        digest = cache_key(data)
+        chain = sorted(set(widths), reverse=True)
+        return [
+            (width, format, cache_key(digest, format, webp_quality, "LANCZOS", REDUCING_GAP, PIL.__version__, *chain[:i + 1]))
+            for i, width in enumerate(chain)
+        ]
+
+    def get(self, job):
+        """The RenditionResult for a rendition_job job if every width is cached, else None."""
+        name, data = job[:2]
+        try:
+            keys = self._keys(job)
+        except KeyError:
+            return None
+        renditions = []
+        for width, format, key in keys:
+            cached = self.store.get(key)
+            if cached is None:
+                return None
+            renditions.append(Rendition(rendition_name(name, width, format), width, cached[0]))
+        self._count("hits", len(renditions))
+        return RenditionResult(name, len(data), renditions, 0.0, "")
+
+    def put(self, job, result):
+        for (width, _, key), rendition in zip(self._keys(job), result.renditions):
+            self.store.put(key, rendition.data, {"width": width})
+        self._count("resized", len(result.renditions))
+
+    def summary(self, since=None):
+        """One-line hit/resize summary, optionally only counting activity after a `since` snapshot of stats."""
+        stats = self.stats - since if since else self.stats
+        return (
+            f"Image cache: {stats['hits']} served from cache, {stats['resized']} resized "
+            f"({self.store.size / 1e6:.1f} MB on disk)"
+        )
+
+
+def shared_rendition_cache():
+    """Return the process-wide RenditionCache, creating it on first use."""
+    global _shared_rendition_cache
+    with _shared_rendition_cache_lock:
+        if _shared_rendition_cache is None:
+            _shared_rendition_cache = RenditionCache()
+        return _shared_rendition_cache
+
+
+def shared_resize_pool():
+    """Return the process pool of RESIZE_WORKERS shared by every iter_resize, creating it on first use."""
+    global _resize_pool
+    with _resize_pool_lock:
+        if _resize_pool is None:
+            _resize_pool = ProcessPoolExecutor(max_workers=RESIZE_WORKERS)
+        return _resize_pool
+
+
+def _drop_resize_pool(executor):
+    """Forget a pool whose worker died, so the next resize starts a new one."""
+    global _resize_pool
+    with _resize_pool_lock:
+        if _resize_pool is executor:
+            _resize_pool = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_resize(jobs, workers=None, cache=None, function=resize_job):
+    """
+    Run `function` over resize jobs, by default (name, data, base_width) for
+    resize_job, on the shared pool of worker processes and yield the results in
+    job order as soon as each is ready. `jobs` is consumed lazily, with at most
+    `workers` of them, by default RESIZE_WORKERS, in the pool at a time; with
+    one worker they run in this thread. With a cache, such as a RenditionCache
+    for rendition_job, jobs it can answer never reach the pool and new results
+    are stored in it. Stages the workers timed are added to the caller's
+    recording.
+    """
+    workers = workers or RESIZE_WORKERS
+    executor = shared_resize_pool() if workers > 1 else None
+    pending = deque()
+
+    def finish():
+        job, result = pending.popleft()
+        if job is not None:
+            result = result.result() if executor else result
+            for name, seconds, attrs in getattr(result, "stages", ()):
+                record(name, seconds, image=result.name, **attrs)
+            if cache is not None and not result.error:
+                with span("image cache store", image=result.name):
+                    cache.put(job, result)
+        return result
+
+    try:
+        for job in jobs:
+            cached = None
+            if cache is not None:
+                with span("image cache lookup", image=job[0]) as lookup_span:
+                    cached = cache.get(job)
+                    lookup_span.set(hit=cached is not None)
+            if cached is not None:
+                pending.append((None, cached))
+            elif executor:
+                pending.append((job, executor.submit(function, job)))
+            else:
+                pending.append((job, function(job)))
+            if len(pending) >= workers:
+                yield finish()
+        while pending:
+            yield finish()
+    except BrokenProcessPool:
+        _drop_resize_pool(executor)
+        raise
+    finally:
+        # The pool outlives this call; only the jobs it had not started yet are taken back.
+        for job, future in pending:
+            if job is not None and executor:
+                future.cancel()
+
+
+def resize_batch(jobs, workers=None, function=resize_job):
+    """Resize every job and return the results in job order."""
+    return list(iter_resize(jobs, workers=workers, function=function))
@@ -0,0 +1,275 @@
+"""
+A job queue shared by everyone using the server. The heavy runs of the tools,
+extractions and batch resizes, are submitted here and run on a fixed number of
+worker threads rather than in each user's script thread, with at most
+JOB_USER_LIMIT running at a time for any one user. A job carries on when its
+page reruns or the browser disconnects, and its result is kept until it is
+downloaded, or for JOB_KEEP_SECONDS if it never is, within
+JOB_RESULT_MAX_BYTES for all results together.
+"""
+import itertools
+import os
+import threading
+import time
+from collections import Counter, deque
+
+from toolbox.timing import record, recording
+
+JOB_WORKERS = int(os.environ.get("TOOLBOX_JOB_WORKERS") or 3)
+JOB_USER_LIMIT = int(os.environ.get("TOOLBOX_JOB_USER_LIMIT") or 1)
+# Results never downloaded are dropped after this long; downloaded ones after
+# a few minutes, time enough to download the run's other files.
+JOB_KEEP_SECONDS = 2 * 3600
+JOB_DOWNLOADED_KEEP_SECONDS = 10 * 60
+# Over this many bytes of results in memory, the oldest finished jobs are
+# dropped, downloaded ones first.
+JOB_RESULT_MAX_BYTES = int(os.environ.get("TOOLBOX_JOB_RESULT_MAX_BYTES") or 1024 * 1024 * 1024)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_shared_queue = None
+_shared_queue_lock = threading.Lock()
+
+
+def result_bytes(value):
+    """Roughly how much memory a job result holds: the bytes and text in it, through dicts, lists and tuples."""
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(result_bytes(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(result_bytes(item) for item in value)
+    return 0
+
+
+class Job:
+    """
+    One submitted run of `function(job, *args, **kwargs)`. The function
+    reports its progress with `report` and messages for the user with `note`;
+    what it returns is the job's `result`.
+    """
+
+    def __init__(self, id, kind, user, client, label, function, args, kwargs):
+        self.id = id
+        self.kind = kind
+        self.user = user
+        self.client = client
+        self.label = label
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message = ""
+        self.notes = []
+        self.result = None
+        self.result_bytes = 0
+        self.error = None
+        self.recorder = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.downloaded = None
+
+    @property
+    def done(self):
+        return self.status in (DONE, FAILED)
+
+    @property
+    def wait_seconds(self):
+        """How long the job waited for a worker, so far if it is still waiting."""
+        return (self.started or time.time()) - self.submitted
+
+    @property
+    def run_seconds(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    def report(self, progress=None, message=None):
+        """Update the progress, a fraction from 0 to 1, and the line shown with it."""
+        if progress is not None:
+            self.progress = min(max(progress, 0.0), 1.0)
+        if message is not None:
+            self.message = message
+
+    def note(self, level, text):
+        """Keep a message for the user, shown with the result; `level` is "error", "warning", "info" or "success"."""
+        self.notes.append((level, text))
+
+    def mark_downloaded(self):
+        """Note that the result has been downloaded, so it is dropped soon after."""
+        self.downloaded = self.downloaded or time.time()
+
+
+class JobQueue:
+    """
+    Runs submitted jobs on `workers` threads in submission order, skipping over
+    the jobs of a user who already has `per_user` running until one finishes.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, per_user=JOB_USER_LIMIT, keep_seconds=JOB_KEEP_SECONDS,
+                 downloaded_keep_seconds=JOB_DOWNLOADED_KEEP_SECONDS, max_result_bytes=JOB_RESULT_MAX_BYTES):
+        self.workers = workers
+        self.per_user = per_user
+        self.keep_seconds = keep_seconds
+        self.downloaded_keep_seconds = downloaded_keep_seconds
+        self.max_result_bytes = max_result_bytes
+        self.jobs = {}
+        self.waiting = deque()
+        self.running = Counter()
+        self.closed = False
+        self._ids = itertools.count(1)
+        self._condition = threading.Condition()
+        self._threads = [
+            threading.Thread(target=self._work, name=f"toolbox-job-{number}", daemon=True) for number in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, kind, user, label, function, *args, client=None, **kwargs):
+        """
+        Queue `function(job, *args, **kwargs)` as a `kind` job counted against
+        `user`'s quota and listed for `client`, by default the user, and
+        return the Job.
+        """
+        with self._condition:
+            if self.closed:
+                raise RuntimeError("The job queue is closed.")
+            self._expire()
+            job = Job(f"{kind}-{next(self._ids)}", kind, user, client or user, label, function, args, kwargs)
+            job.message = "Waiting for a free worker..."
+            self.jobs[job.id] = job
+            self.waiting.append(job)
+            self._condition.notify()
+        return job
+
+    def get(self, job_id):
+        with self._condition:
+            return self.jobs.get(job_id)
+
+    def jobs_for(self, client, kind=None, user=None):
+        """
+        The jobs listed for `client`, and with `user` also that user's jobs
+        from other clients, optionally only those of one kind, newest first.
+        """
+        with self._condition:
+            self._expire()
+            jobs = [
+                job for job in self.jobs.values()
+                if (job.client == client or (user is not None and job.user == user)) and kind in (None, job.kind)
+            ]
+        return jobs[::-1]
+
+    def ahead(self, job):
+        """How many queued jobs were submitted before `job` and are still waiting."""
+        with self._condition:
+            try:
+                return self.waiting.index(job)
+            except ValueError:
+                return 0
+
+    def release(self, job_id):
+        """Drop a finished job and its result."""
+        with self._condition:
+            job = self.jobs.get(job_id)
+            if job is not None and job.done:
+                del self.jobs[job_id]
+
+    def stats(self):
+        with self._condition:
+            statuses = Counter(job.status for job in self.jobs.values())
+            kept = sum(job.result_bytes for job in self.jobs.values())
+        return dict({status: statuses[status] for status in (QUEUED, RUNNING, DONE, FAILED)}, result_bytes=kept)
+
+    def close(self, wait=True):
+        """Stop the workers once the queue is empty; with `wait`, until they have finished."""
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def _expire(self):
+        now = time.time()
+        for job in [job for job in self.jobs.values() if job.done]:
+            if job.downloaded is not None:
+                expired = now - job.downloaded > self.downloaded_keep_seconds
+            else:
+                expired = now - job.finished > self.keep_seconds
+            if expired:
+                del self.jobs[job.id]
+        finished = sorted(
+            (job for job in self.jobs.values() if job.done),
+            key=lambda job: (job.downloaded is None, job.finished),
+        )
+        kept = sum(job.result_bytes for job in self.jobs.values())
+        for job in finished:
+            if kept <= self.max_result_bytes:
+                break
+            kept -= job.result_bytes
+            del self.jobs[job.id]
+
+    def _next(self):
+        """Take the oldest waiting job whose user is under quota, or None."""
+        for job in self.waiting:
+            if self.running[job.user] < self.per_user:
+                self.waiting.remove(job)
+                self.running[job.user] += 1
+                return job
+        return None
+
+    def _work(self):
+        while True:
+            with self._condition:
+                job = self._next()
+                while job is None:
+                    if self.closed and not self.waiting:
+                        return
+                    self._condition.wait()
+                    job = self._next()
+                job.status = RUNNING
+                job.started = time.time()
+                job.message = "Starting..."
+            try:
+                self._run(job)
+            finally:
+                with self._condition:
+                    self.running[job.user] -= 1
+                    self._expire()
+                    self._condition.notify_all()
+
+    def _run(self, job):
+        status, recorder = FAILED, None
+        try:
+            with recording() as recorder:
+                record("queue wait", job.wait_seconds, job=job.id)
+                try:
+                    job.result = job.function(job, *job.args, **job.kwargs)
+                    status = DONE
+                except Exception as exc:
+                    job.error = f"{type(exc).__name__}: {exc}"
+        except BaseException as exc:
+            # A SystemExit or KeyboardInterrupt raised inside a job ends that job, not
+            # the worker thread; otherwise the pool would quietly shrink by one.
+            job.error = f"The run was interrupted ({type(exc).__name__})."
+        finally:
+            # The arguments may hold uploads or passwords; they are not needed any more.
+            job.args, job.kwargs = (), {}
+            job.recorder = recorder
+            job.result_bytes = result_bytes(job.result)
+            job.progress = 1.0
+            job.finished = time.time()
+            job.status = status
+
+def shared_job_queue():
+    """Return the process-wide JobQueue, creating it on first use."""
+    global _shared_queue
+    with _shared_queue_lock:
+        if _shared_queue is None:
+            _shared_queue = JobQueue()
+        return _shared_queue
@@ -0,0 +1,114 @@
+"""
+In-memory memoization for the pages' expensive steps. Streamlit reruns the
+whole page script on every widget change, so results are kept keyed by a
+SHA-256 of their inputs and a rerun with the same uploads skips the work.
+Each Memo is a least-recently-used cache bounded by the approximate size of
+the results it holds, and lives for the whole server process.
+"""
+import sys
+import threading
+from collections import Counter, OrderedDict
+from functools import wraps
+
+from toolbox.diskcache import cache_key
+from toolbox.timing import span
+
+MEMO_MAX_BYTES = 32 * 1024 * 1024
+
+MEMOS = {}
+
+
+def approx_size(value):
+    """Roughly how many bytes `value` keeps alive: string and byte lengths plus container overhead."""
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(approx_size(k) + approx_size(v) for k, v in value.items()) + 64
+    if isinstance(value, (list, tuple)):
+        return sum(approx_size(item) for item in value) + 8 * len(value) + 56
+    return sys.getsizeof(value)
+
+
+class Memo:
+    """
+    A named, size-bounded LRU of computed results. `stats` counts hits,
+    misses and evictions. Cached results are shared between callers, so they
+    must be treated as read-only.
+    """
+
+    def __init__(self, name, max_bytes=MEMO_MAX_BYTES):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.stats = Counter()
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        MEMOS[name] = self
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return default
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = approx_size(value)
+        with self._lock:
+            if key in self._entries:
+                self.size -= self._entries.pop(key)[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= evicted
+                self.stats["evictions"] += 1
+
+    def call(self, function, *args):
+        """Return function(*args), computing it only if these exact arguments have not been seen."""
+        with span(f"{self.name} memo", function=function.__name__) as memo_span:
+            key = cache_key(function.__module__, function.__qualname__, *args)
+            missing = object()
+            value = self.get(key, missing)
+            memo_span.set(hit=value is not missing)
+            if value is missing:
+                value = function(*args)
+                self.put(key, value)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def summary(self):
+        return (
+            f"{self.name}: {self.stats['hits']} hits, {self.stats['misses']} misses, "
+            f"{len(self._entries)} kept ({self.size / 1e6:.1f} MB)"
+        )
+
+
+def memoize(name, max_bytes=MEMO_MAX_BYTES):
+    """
+    Decorator that memoizes a function of str/bytes/number arguments in the
+    Memo called `name`; several functions may share one Memo.
+    """
+    memo = MEMOS.get(name) or Memo(name, max_bytes)
+
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args):
+            return memo.call(function, *args)
+        wrapper.memo = memo
+        return wrapper
+    return decorator
+
+
+def summary(*names):
+    """One line of stats per Memo, for all of them or just `names`."""
+    return "\n\n".join(MEMOS[name].summary() for name in names or MEMOS)
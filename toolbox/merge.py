@@ -0,0 +1,152 @@
+"""Merging a formatted Course Build Plan into the Moodle HTML template."""
+import re
+from collections import namedtuple
+
+from toolbox.formatting import normalize_text
+from toolbox.memo import memoize
+from toolbox.parsing import SERIALIZING_PARSER, make_soup
+from toolbox.timing import span
+
+# Template placeholder names, e.g. [contentOverview3], and the weeks_data key each one takes.
+PLACEHOLDER_FIELDS = {
+    "Overview": "overview",
+    "WLG": "learning_goals",
+    "Topics": "key_topics",
+    "Resources": "resources",
+    "Significance": "significance",
+    "WhatsNext": "whats_next",
+}
+PLACEHOLDER_PATTERN = re.compile(r"\[content([A-Za-z]+)(\d+)\]")
+
+# Course Build Plan headings (normalized) and the weeks_data key each one fills.
+SECTION_FIELDS = {
+    "overview": "overview",
+    "this week's learning goals": "learning_goals",
+    "key topics for the week": "key_topics",
+    "resources": "resources",
+    "significance": "significance",
+    "what's next?": "whats_next",
+}
+# A section runs until the next heading in its stop set, chosen by heading level...
+STOP_TAGS = {'h3': ('h1', 'h3', 'h4'), 'h4': ('h1', 'h4')}
+# ...except What's Next?, which runs to the end of the week.
+SECTION_STOP_TAGS = {"what's next?": ('h1',)}
+
+# `chunks` holds the literal template text around the placeholders, so
+# len(chunks) == len(placeholders) + 1. Each placeholder is (name, week, raw text).
+CompiledTemplate = namedtuple("CompiledTemplate", ["chunks", "placeholders"])
+MergeReport = namedtuple("MergeReport", ["unmatched", "unused"])
+CourseBuild = namedtuple("CourseBuild", ["weeks_data", "html", "report"])
+
+
+def partition_weeks(soup, headings=None):
+    """
+    Index the document as a list of (week title, sections) pairs, one per
+    <h1>, from one pass over its headings in document order, wherever they
+    are nested. `sections` maps the normalized text of each <h3>/<h4> heading
+    in that week, or only of those in `headings` if given, to the HTML of the
+    siblings that follow it up to the heading that ends it (see STOP_TAGS);
+    when a heading repeats within a week only the first is kept.
+    """
+    weeks = []
+    sections = None
+    for tag in soup.find_all(['h1', *STOP_TAGS]):
+        if tag.name == 'h1':
+            sections = {}
+            weeks.append((tag.get_text(strip=True), sections))
+            continue
+        heading = normalize_text(tag.get_text(strip=True))
+        if sections is None or heading in sections or (headings is not None and heading not in headings):
+            continue
+        stop_tags = SECTION_STOP_TAGS.get(heading, STOP_TAGS[tag.name])
+        chunks = []
+        for sibling in tag.next_siblings:
+            if sibling.name in stop_tags:
+                break
+            chunks.append(str(sibling))
+        sections[heading] = "".join(chunks).strip()
+    return weeks
+
+def weeks_data_from_soup(soup):
+    """Build weeks_data, one dict of section HTML per week, from an already formatted soup."""
+    weeks_data = []
+    with span("extract weeks") as extract_span:
+        for week_title, sections in partition_weeks(soup, SECTION_FIELDS):
+            content = {'week': week_title}
+            for heading, field in SECTION_FIELDS.items():
+                content[field] = sections.get(heading, '')
+            weeks_data.append(content)
+        extract_span.set(weeks=len(weeks_data))
+    return weeks_data
+
+def extract_content_by_tags(html_content):
+    return weeks_data_from_soup(make_soup(html_content, parser=SERIALIZING_PARSER))
+
+
+def compile_template(template_html):
+    """
+    Tokenize every [content<Name><week>] placeholder in `template_html` once,
+    so the template can be rendered in a single pass for any weeks_data.
+    """
+    chunks = []
+    placeholders = []
+    position = 0
+    for match in PLACEHOLDER_PATTERN.finditer(template_html):
+        chunks.append(template_html[position:match.start()])
+        placeholders.append((match.group(1), int(match.group(2)), match.group(0)))
+        position = match.end()
+    chunks.append(template_html[position:])
+    return CompiledTemplate(chunks, placeholders)
+
+
+def render_template(compiled, weeks_data):
+    """
+    Fill a compiled template from `weeks_data` in one pass and return
+    (html, MergeReport). Inserted content is never rescanned for placeholders.
+    Placeholders with no matching week or field are left as they are and listed
+    in `unmatched`; week fields the template never asks for are listed in `unused`.
+    """
+    parts = [compiled.chunks[0]]
+    unmatched = []
+    used = set()
+    with span("merge template", placeholders=len(compiled.placeholders)):
+        for (name, week, raw), chunk in zip(compiled.placeholders, compiled.chunks[1:]):
+            field = PLACEHOLDER_FIELDS.get(name)
+            if field and 1 <= week <= len(weeks_data):
+                parts.append(weeks_data[week - 1][field])
+                used.add((week, field))
+            else:
+                parts.append(raw)
+                unmatched.append(raw)
+            parts.append(chunk)
+
+    names = {field: name for name, field in PLACEHOLDER_FIELDS.items()}
+    unused = [
+        f"[content{names[field]}{week}]"
+        for week in range(1, len(weeks_data) + 1)
+        for field in PLACEHOLDER_FIELDS.values()
+        if (week, field) not in used
+    ]
+    return "".join(parts), MergeReport(unmatched, unused)
+
+
+# The parsed plan and compiled template, remembered across reruns with the same inputs.
+cached_extract_content_by_tags = memoize("parse")(extract_content_by_tags)
+cached_compile_template = memoize("parse")(compile_template)
+
+
+@memoize("merge")
+def merge_html(plan_html, template_html):
+    """
+    Merge a formatted plan into a Moodle template and return a CourseBuild,
+    reusing the parsed plan and compiled template from earlier calls when the
+    same documents come back.
+    """
+    weeks_data = cached_extract_content_by_tags(plan_html)
+    html, report = render_template(cached_compile_template(template_html), weeks_data)
+    return CourseBuild(weeks_data, html, report)
+
+
+def insert_content_into_template_string_manipulation(template_html, weeks_data):
+    html, _ = render_template(compile_template(template_html), weeks_data)
+    return html
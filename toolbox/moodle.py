@@ -0,0 +1,103 @@
+"""
+Authenticated Moodle sessions shared by the extractor pages.
+Logged-in sessions are cached per user for the life of the server process,
+so repeat extractions skip the login round trips until the session goes idle
+for SESSION_IDLE_SECONDS or Moodle sends us back to the login page.
+"""
+import hashlib
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+from toolbox.fetch import DEFAULT_TIMEOUT, make_session
+from toolbox.parsing import make_soup
+from toolbox.timing import span
+
+MOODLE_URL = os.environ.get("MOODLE_URL", "https://online.tiffin.edu").rstrip("/")
+LOGIN_URL = f"{MOODLE_URL}/login/index.php"
+
+SESSION_IDLE_SECONDS = 30 * 60
+# Large enough for the Activity Extractor's highest worker setting.
+SESSION_POOL_SIZE = 16
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def login_to_moodle(session, username, password):
+    """Authenticate with Moodle and persist the session. Returns True on success."""
+    with span("login", user=username) as login_span:
+        login_page = session.get(LOGIN_URL, timeout=DEFAULT_TIMEOUT)
+        soup = make_soup(login_page.content)
+        logintoken_tag = soup.find("input", {"name": "logintoken"})
+        logintoken = logintoken_tag["value"] if logintoken_tag else None
+
+        login_payload = {"username": username, "password": password}
+        if logintoken:
+            login_payload["logintoken"] = logintoken
+
+        response = session.post(LOGIN_URL, data=login_payload, timeout=DEFAULT_TIMEOUT)
+        logged_in = not ("login" in response.url or "Invalid login" in response.text)
+        login_span.set(ok=logged_in)
+        return logged_in
+
+
+def _session_key(username, password):
+    return username, hashlib.sha256(password.encode("utf-8")).hexdigest()
+
+
+def get_session(username, password):
+    """
+    Return a logged-in session for `username`, reusing the cached one unless it
+    has been idle too long. Returns None if Moodle rejects the credentials.
+    """
+    key = _session_key(username, password)
+    now = time.monotonic()
+    with _sessions_lock:
+        cached = _sessions.get(key)
+        if cached and now - cached[1] < SESSION_IDLE_SECONDS:
+            _sessions[key] = (cached[0], now)
+            return cached[0]
+        _sessions.pop(key, None)
+
+    session = make_session(pool_size=SESSION_POOL_SIZE)
+    if not login_to_moodle(session, username, password):
+        return None
+    with _sessions_lock:
+        _sessions[key] = (session, time.monotonic())
+    return session
+
+
+def drop_session(username, password):
+    """Forget the cached session for `username` so the next request logs in again."""
+    with _sessions_lock:
+        _sessions.pop(_session_key(username, password), None)
+
+
+def is_login_page(response):
+    """True when Moodle redirected a request to the login page, i.e. the session expired."""
+    return "/login/" in urlparse(response.url).path
+
+
+def fetch(username, password, url, cache=None):
+    """
+    GET `url` on the user's cached session, logging in again once if Moodle
+    has expired it. Returns the response, or None if login fails. With an
+    HttpCache as `cache`, the page is read through it under the user's name.
+    """
+    for _ in range(2):
+        session = get_session(username, password)
+        if session is None:
+            return None
+        with span("fetch", url=url) as fetch_span:
+            if cache is not None:
+                response = cache.get(session, url, namespace=username)
+            else:
+                response = session.get(url, timeout=DEFAULT_TIMEOUT)
+            fetch_span.set(status=response.status_code, bytes=len(response.content))
+            if not is_login_page(response):
+                return response
+            fetch_span.set(error="session expired")
+        drop_session(username, password)
+    return response
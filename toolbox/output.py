@@ -0,0 +1,80 @@
+"""Incremental assembly of large generated documents."""
+import tempfile
+import zipfile
+from pathlib import Path
+
+# Output larger than this is moved from memory to a temporary file on disk.
+SPOOL_MAX_MEMORY = 4 * 1024 * 1024
+
+# Formats that are already compressed gain nothing from deflate.
+STORED_SUFFIXES = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".zip"}
+
+
+class HtmlWriter:
+    """
+    Collects HTML chunks in a spooled temporary file instead of growing one
+    string, so each chunk is copied once and large documents spill to disk.
+    """
+
+    def __init__(self, max_memory=SPOOL_MAX_MEMORY):
+        self._file = tempfile.SpooledTemporaryFile(max_size=max_memory, mode="w+b")
+        self.size = 0
+
+    def write(self, text):
+        data = text.encode("utf-8")
+        self._file.write(data)
+        self.size += len(data)
+
+    def getvalue(self):
+        """Return everything written so far as UTF-8 bytes."""
+        self._file.seek(0)
+        data = self._file.read()
+        self._file.seek(0, 2)
+        return data
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class ZipWriter:
+    """
+    Streams files into a zip archive held in a spooled temporary file, storing
+    already-compressed formats and deflating everything else.
+    """
+
+    def __init__(self, max_memory=SPOOL_MAX_MEMORY):
+        self._file = tempfile.SpooledTemporaryFile(max_size=max_memory, mode="w+b")
+        self._zip = zipfile.ZipFile(self._file, "w")
+        self.count = 0
+        self.uncompressed_size = 0
+
+    def write(self, name, data):
+        if Path(name).suffix.lower() in STORED_SUFFIXES:
+            compress_type = zipfile.ZIP_STORED
+        else:
+            compress_type = zipfile.ZIP_DEFLATED
+        self._zip.writestr(name, data, compress_type=compress_type)
+        self.count += 1
+        self.uncompressed_size += len(data)
+
+    def getvalue(self):
+        """Finish the archive and return it as bytes."""
+        self._zip.close()
+        self._file.seek(0)
+        return self._file.read()
+
+    def close(self):
+        self._zip.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,121 @@
+"""
+Streamlit widgets shared by the pages. This is the only toolbox module that
+uses Streamlit, and it imports it on first use so the rest of the package
+can be imported without it.
+"""
+from uuid import uuid4
+
+# How often a page with queued or running jobs checks on them.
+JOB_POLL_SECONDS = 2
+
+
+def timing_panel(recorder, key):
+    """An expander with a recording's per-stage summary, every span, and JSON/CSV downloads."""
+    import streamlit as st
+
+    with st.expander(f"Timings ({recorder.elapsed:.2f} s)"):
+        st.dataframe(recorder.summary())
+        st.dataframe(recorder.rows())
+        json_column, csv_column = st.columns(2)
+        json_column.download_button(
+            "Download timings (JSON)", recorder.to_json(), file_name=f"{key}_timings.json",
+            mime="application/json", key=f"{key}_timings_json",
+        )
+        csv_column.download_button(
+            "Download timings (CSV)", recorder.to_csv(), file_name=f"{key}_timings.csv",
+            mime="text/csv", key=f"{key}_timings_csv",
+        )
+
+
+def bundle_panel(bundle, file_name, key, on_click="rerun"):
+    """
+    What went into an offline bundle from toolbox.assets, any assets that
+    failed, and its download button, which calls `on_click` when clicked.
+    """
+    import streamlit as st
+
+    from toolbox.assets import report_summary
+
+    st.caption(report_summary(bundle.report))
+    if bundle.report.failed:
+        with st.expander(f"{len(bundle.report.failed)} image(s) or file(s) could not be downloaded and still link to Moodle"):
+            st.dataframe([{"url": url, "error": error} for url, error in bundle.report.failed])
+    st.download_button(
+        "Download for offline review (zip)", bundle.data, file_name=file_name, mime="application/zip", key=f"{key}_bundle",
+        on_click=on_click,
+    )
+
+
+def delta_panel(tracker, key):
+    """The delta report of a ChangeTracker: a summary line and the new, changed and removed items, with a JSON download."""
+    import streamlit as st
+
+    st.caption(tracker.summary())
+    rows = [row for row in tracker.report() if row["status"] != "unchanged"]
+    if rows:
+        with st.expander(f"What changed ({len(rows)})"):
+            st.dataframe(rows)
+            st.download_button(
+                "Download change report (JSON)", tracker.report_json(), file_name=f"{key}_changes.json",
+                mime="application/json", key=f"{key}_changes_json",
+            )
+
+
+def client_id():
+    """
+    An id for this browser session's jobs, kept in session state so it lasts
+    across the pages of the app. It is never put in the URL: anyone with the id
+    could see the session's results, and a shared link would carry it.
+    """
+    import streamlit as st
+
+    if "client" not in st.session_state:
+        st.session_state["client"] = uuid4().hex
+    return st.session_state["client"]
+
+
+def jobs_panel(queue, client, kind, render, key, show_timings=False, poll_seconds=JOB_POLL_SECONDS, user=None):
+    """
+    The `kind` jobs of a toolbox.jobs.JobQueue listed for `client`, and with
+    `user`, a Moodle user this session has logged in as, that user's jobs from
+    other sessions too, newest first. Jobs still waiting or running show their
+    progress, checked every `poll_seconds`; finished ones show their notes and
+    `render(job, key)`, their timings if wanted, and a button to dismiss them.
+    """
+    import streamlit as st
+
+    from toolbox.jobs import QUEUED
+
+    active = any(not job.done for job in queue.jobs_for(client, kind, user=user))
+
+    def show():
+        jobs = queue.jobs_for(client, kind, user=user)
+        for job in jobs:
+            job_key = f"{key}_{job.id}"
+            with st.container(border=True):
+                st.markdown(f"**{job.label}**")
+                if job.status == QUEUED:
+                    ahead = queue.ahead(job)
+                    st.progress(0.0, text=f"Waiting for a free worker ({ahead} run(s) ahead in the queue)...")
+                    continue
+                if not job.done:
+                    st.progress(job.progress, text=job.message)
+                    continue
+                st.caption(f"Waited {job.wait_seconds:.1f} s for a worker and ran for {job.run_seconds:.1f} s.")
+                for level, text in job.notes:
+                    getattr(st, level)(text)
+                if job.error:
+                    st.error(f"The run failed: {job.error}")
+                else:
+                    render(job, job_key)
+                if show_timings and job.recorder is not None:
+                    timing_panel(job.recorder, key=job_key)
+                st.button("Dismiss", key=f"{job_key}_dismiss", on_click=queue.release, args=(job.id,))
+        # Once the last job has finished, rerun the whole page to stop polling.
+        if active and all(job.done for job in jobs):
+            st.rerun()
+
+    if active:
+        st.fragment(show, run_every=poll_seconds)()
+    else:
+        show()
@@ -0,0 +1,39 @@
+"""
+Shared HTML parsing. Every tool builds its BeautifulSoup through make_soup so
+they all use the fastest parser installed: lxml when available, otherwise
+Python's built-in html.parser. Set TOOLBOX_HTML_PARSER to force one. Tools
+that write the parsed HTML back out pass SERIALIZING_PARSER instead.
+BeautifulSoup itself is imported on the first parse, so pages and scripts
+that import the toolbox only pay for it when they use it.
+"""
+import importlib.util
+import os
+
+from toolbox.timing import span
+
+FAST_PARSERS = ["lxml"]
+FALLBACK_PARSER = "html.parser"
+# lxml wraps a fragment in <html><body> and rewrites the conditional comments
+# Word leaves in a plan, so output that is the input document, formatted,
+# merged or relinked, is always parsed with html.parser.
+SERIALIZING_PARSER = "html.parser"
+
+
+def pick_parser():
+    """Return the first installed parser from FAST_PARSERS, or FALLBACK_PARSER."""
+    for parser in FAST_PARSERS:
+        if importlib.util.find_spec(parser) is not None:
+            return parser
+    return FALLBACK_PARSER
+
+
+PARSER = os.environ.get("TOOLBOX_HTML_PARSER") or pick_parser()
+
+
+def make_soup(markup, parse_only=None, parser=None):
+    """Parse `markup` (str or bytes) with `parser`, by default the configured one."""
+    from bs4 import BeautifulSoup
+
+    parser = parser or PARSER
+    with span("parse", bytes=len(markup), parser=parser):
+        return BeautifulSoup(markup, parser, parse_only=parse_only)
@@ -0,0 +1,44 @@
+"""
+Format HTML Headings and HTML Merge to Moodle as one step. The plan is parsed
+once; heading normalization and the week/section extraction both work on that
+tree, so there is no serialize, download, upload and reparse in between.
+"""
+import json
+
+from toolbox.formatting import cached_compile_heading_template, format_soup, straighten_quotes
+from toolbox.memo import memoize
+from toolbox.merge import CourseBuild, cached_compile_template, render_template, weeks_data_from_soup
+from toolbox.parsing import SERIALIZING_PARSER, make_soup
+
+
+def format_plan(design_html, heading_template_html):
+    """Parse a Course Build Plan and normalize its headings; returns the formatted soup."""
+    soup = make_soup(design_html, parser=SERIALIZING_PARSER)
+    return format_soup(soup, cached_compile_heading_template(heading_template_html))
+
+
+def extract_weeks(soup):
+    """
+    weeks_data from a soup formatted by format_plan, with curly quotes
+    straightened exactly as they are in format_html's output.
+    """
+    return [
+        {field: straighten_quotes(value) for field, value in week.items()}
+        for week in weeks_data_from_soup(soup)
+    ]
+
+
+def format_and_merge(design_html, heading_template_html, moodle_template_html):
+    """Format a plan and merge it into a Moodle template; returns a CourseBuild."""
+    weeks_data = extract_weeks(format_plan(design_html, heading_template_html))
+    html, report = render_template(cached_compile_template(moodle_template_html), weeks_data)
+    return CourseBuild(weeks_data, html, report)
+
+
+def weeks_data_json(weeks_data):
+    """The extracted weeks as indented JSON, for review or reuse outside the toolbox."""
+    return json.dumps(weeks_data, indent=2, ensure_ascii=False)
+
+
+# format_and_merge for the page, remembered across reruns with the same inputs.
+cached_format_and_merge = memoize("merge")(format_and_merge)
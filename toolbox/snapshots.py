@@ -0,0 +1,141 @@
+"""
+Snapshots of what the Moodle extractors found, for "changes since last run".
+A snapshot maps each section or activity to a hash of its extracted HTML,
+normalized so that whitespace and per-session tokens do not count as changes,
+and to a hash of the page it came from. When a page is byte-for-byte the page
+seen last time, as it is when the HTTP cache serves it, the item is known to be
+unchanged without parsing it again.
+"""
+import json
+import re
+import threading
+import time
+from collections import namedtuple
+
+from toolbox.diskcache import CACHE_DIR, DiskCache, cache_key
+
+SNAPSHOT_MAX_BYTES = 20 * 1024 * 1024
+
+ADDED = "added"
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+REMOVED = "removed"
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+BETWEEN_TAGS_PATTERN = re.compile(r">\s+<")
+SESSKEY_PATTERN = re.compile(r"sesskey=[^&\"'\s]*")
+
+Delta = namedtuple("Delta", ["added", "changed", "removed", "unchanged"])
+
+_shared_store = None
+_shared_store_lock = threading.Lock()
+
+
+def normalize_html(html):
+    """Collapse whitespace and drop Moodle sesskey values, which change with every login."""
+    html = SESSKEY_PATTERN.sub("sesskey=", html)
+    html = BETWEEN_TAGS_PATTERN.sub("><", html)
+    return WHITESPACE_PATTERN.sub(" ", html).strip()
+
+
+def content_digest(html):
+    return cache_key(normalize_html(html))
+
+
+def page_digest(page):
+    return cache_key(page)
+
+
+class SnapshotStore:
+    """The latest snapshot of each (tool, user, course), kept on disk."""
+
+    def __init__(self, directory=None, max_bytes=SNAPSHOT_MAX_BYTES):
+        self.store = DiskCache(directory or CACHE_DIR / "snapshots", max_bytes)
+
+    def load(self, tool, namespace, course_id):
+        """Return the items of the last saved snapshot, or {} if there is none."""
+        cached = self.store.get(cache_key(tool, namespace, course_id))
+        return json.loads(cached[0]) if cached else {}
+
+    def taken(self, tool, namespace, course_id):
+        """When the last snapshot was saved, as a Unix time, or None."""
+        meta = self.store.get_meta(cache_key(tool, namespace, course_id))
+        return meta["taken"] if meta else None
+
+    def save(self, tool, namespace, course_id, items):
+        meta = {"tool": tool, "course_id": str(course_id), "taken": time.time()}
+        self.store.put(cache_key(tool, namespace, course_id), json.dumps(items).encode("utf-8"), meta)
+
+
+def shared_snapshot_store():
+    """Return the process-wide SnapshotStore, creating it on first use."""
+    global _shared_store
+    with _shared_store_lock:
+        if _shared_store is None:
+            _shared_store = SnapshotStore()
+        return _shared_store
+
+
+class ChangeTracker:
+    """
+    Compares the items of one extraction run with the `previous` snapshot.
+    Call `item` for each section or activity in order; `items` is the new
+    snapshot to save and `report` the delta, one row per item.
+    With `changes_only`, unchanged items are not returned for output.
+    """
+
+    def __init__(self, previous, changes_only=False):
+        self.previous = previous
+        self.changes_only = changes_only
+        self.items = {}
+        self.status = {}
+
+    def item(self, key, title, extract, page_hash=None):
+        """
+        Return the HTML to output for an item, calling `extract()` only when
+        needed, or None when it is unchanged and only changes are wanted.
+        `page_hash` is the page_digest of the page the item was extracted from.
+        """
+        old = self.previous.get(key)
+        if self.changes_only and old and page_hash and old.get("page") == page_hash:
+            self.items[key] = dict(old, title=title)
+            self.status[key] = UNCHANGED
+            return None
+        html = extract()
+        content = content_digest(html)
+        self.items[key] = {"title": title, "page": page_hash, "content": content}
+        if old is None:
+            self.status[key] = ADDED
+        else:
+            self.status[key] = UNCHANGED if old["content"] == content else CHANGED
+        if self.changes_only and self.status[key] == UNCHANGED:
+            return None
+        return html
+
+    def keep(self, key):
+        """Carry an item that could not be fetched this time into the new snapshot as it was."""
+        if key in self.previous:
+            self.items[key] = self.previous[key]
+
+    def delta(self):
+        by_status = {ADDED: [], CHANGED: [], UNCHANGED: []}
+        for key, status in self.status.items():
+            by_status[status].append(key)
+        removed = [key for key in self.previous if key not in self.items]
+        return Delta(by_status[ADDED], by_status[CHANGED], removed, by_status[UNCHANGED])
+
+    def report(self):
+        """One {"item", "title", "status"} row per item, then the removed ones."""
+        rows = [{"item": key, "title": self.items[key]["title"], "status": status} for key, status in self.status.items()]
+        rows += [{"item": key, "title": self.previous[key]["title"], "status": REMOVED} for key in self.delta().removed]
+        return rows
+
+    def report_json(self):
+        return json.dumps(self.report(), indent=2)
+
+    def summary(self):
+        delta = self.delta()
+        return (
+            f"{len(delta.changed)} changed, {len(delta.added)} new, {len(delta.removed)} removed, "
+            f"{len(delta.unchanged)} unchanged since the last run"
+        )
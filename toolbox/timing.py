@@ -0,0 +1,170 @@
+"""
+Lightweight spans for finding out where a tool's time goes. Code wraps each
+stage in `with span("fetch", url=url) as s:` and may add attributes as it
+learns them (`s.set(status=200, bytes=1234)`). Spans are only kept inside a
+`with recording() as recorder:` block; everywhere else `span` does nothing.
+
+The active recorder and the enclosing span live in context variables, so
+nesting is tracked per thread. Thread pools should run their tasks under
+`propagate(...)` to carry the recording into the worker threads; stages timed
+in other processes are added afterwards with `record`.
+"""
+import contextvars
+import csv
+import io
+import itertools
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+_recorder = contextvars.ContextVar("recorder", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+SUMMARY_FIELDS = ["span", "count", "total_ms", "mean_ms", "max_ms"]
+
+
+class Span:
+    __slots__ = ("id", "parent", "name", "attrs", "start", "seconds", "thread")
+
+    def __init__(self, id, parent, name, attrs, start, seconds=0.0):
+        self.id = id
+        self.parent = parent
+        self.name = name
+        self.attrs = attrs
+        self.start = start
+        self.seconds = seconds
+        self.thread = threading.current_thread().name
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+class _NullSpan:
+    """What `span` yields when nothing is recording."""
+
+    def set(self, **attrs):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Recorder:
+    """The spans finished during one recording, in the order they ended."""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.stopped = None
+        self.spans = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def start(self, name, attrs, start=None):
+        parent = _current_span.get()
+        return Span(next(self._ids), parent.id if parent else None, name, attrs, start or time.perf_counter())
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    @property
+    def elapsed(self):
+        """Seconds from the start of the recording to its end, or to now while it is open."""
+        return (self.stopped or time.perf_counter()) - self.origin
+
+    def rows(self):
+        """One dict per span: timings in milliseconds from the start of the recording, then its attributes."""
+        return [
+            dict({
+                "id": span.id,
+                "parent": span.parent,
+                "span": span.name,
+                "start_ms": round((span.start - self.origin) * 1000, 2),
+                "ms": round(span.seconds * 1000, 2),
+                "thread": span.thread,
+            }, **span.attrs)
+            for span in sorted(self.spans, key=lambda span: span.start)
+        ]
+
+    def summary(self):
+        """Count, total, mean and longest time per span name, longest total first."""
+        totals = {}
+        for span in self.spans:
+            count, total, longest = totals.get(span.name, (0, 0.0, 0.0))
+            totals[span.name] = (count + 1, total + span.seconds, max(longest, span.seconds))
+        return [
+            {"span": name, "count": count, "total_ms": round(total * 1000, 2),
+             "mean_ms": round(total / count * 1000, 2), "max_ms": round(longest * 1000, 2)}
+            for name, (count, total, longest) in sorted(totals.items(), key=lambda item: -item[1][1])
+        ]
+
+    def to_json(self):
+        return json.dumps({"elapsed_ms": round(self.elapsed * 1000, 2), "summary": self.summary(), "spans": self.rows()},
+                          indent=2, default=str)
+
+    def to_csv(self):
+        rows = self.rows()
+        fields = list(dict.fromkeys(field for row in rows for field in row))
+        output = io.StringIO()
+        writer = csv.DictWriter(output, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+        return output.getvalue()
+
+
+@contextmanager
+def recording():
+    """Record every span finished inside the block, in this thread and in propagated tasks."""
+    recorder = Recorder()
+    token = _recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        recorder.stopped = time.perf_counter()
+        _recorder.reset(token)
+
+
+@contextmanager
+def span(name, **attrs):
+    """Time the block as a span called `name`; an exception escaping it is noted in the span's `error`."""
+    recorder = _recorder.get()
+    if recorder is None:
+        yield NULL_SPAN
+        return
+    current = recorder.start(name, attrs)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as exc:
+        current.attrs["error"] = type(exc).__name__
+        raise
+    finally:
+        current.seconds = time.perf_counter() - current.start
+        _current_span.reset(token)
+        recorder.add(current)
+
+
+def annotate(**attrs):
+    """Add attributes to the innermost open span, if any, e.g. from a helper that does not own it."""
+    current = _current_span.get()
+    if current is not None and _recorder.get() is not None:
+        current.set(**attrs)
+
+
+def record(name, seconds, **attrs):
+    """Add a span timed elsewhere, such as in a worker process, as ending now."""
+    recorder = _recorder.get()
+    if recorder is not None:
+        current = recorder.start(name, attrs, start=time.perf_counter() - seconds)
+        current.seconds = seconds
+        recorder.add(current)
+
+
+def propagate(function):
+    """Wrap `function` to run in a copy of the caller's context, for submitting to a thread pool."""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(function, *args, **kwargs)
+    return run
@@ -0,0 +1,181 @@
+"""
+Streaming removal of the markup Word adds to its HTML exports. The document is
+tokenized with html.parser and re-emitted as it goes, without building a tree:
+conditional comments, <xml> blocks, VML/Office namespace elements and
+attributes, mso- style declarations, Mso classes and spans left without
+attributes are dropped, while every heading, paragraph and piece of text is
+passed through unchanged.
+"""
+from html import escape
+from html.parser import HTMLParser
+
+from toolbox.memo import memoize
+from toolbox.timing import span
+
+# Elements removed together with everything inside them.
+DROP_ELEMENTS = {"xml"}
+DROP_PREFIXES = ("v:", "w:", "m:")
+# Other namespaced tags such as <o:p> or <st1:place> are unwrapped: the tag
+# goes, its content stays.
+UNWRAP_MARK = ":"
+# Office namespace attributes, such as v:shapes on a VML image's fallback <img>.
+ATTRIBUTE_PREFIXES = ("v:", "o:", "w:", "m:", "xmlns:")
+STYLE_PREFIX = "mso-"
+CLASS_PREFIX = "mso"
+
+
+def clean_style(style):
+    """Drop the mso- declarations from an inline style."""
+    declarations = [
+        declaration.strip() for declaration in style.split(";")
+        if declaration.strip() and not declaration.strip().lower().startswith(STYLE_PREFIX)
+    ]
+    return ";".join(declarations)
+
+
+def clean_class(value):
+    """Drop Word's Mso* class names."""
+    return " ".join(name for name in value.split() if not name.lower().startswith(CLASS_PREFIX))
+
+
+def is_conditional(comment):
+    """True for Word's <!--[if ...]> and <!--[endif]--> comments."""
+    return comment.lstrip().startswith(("[if", "[endif"))
+
+
+class WordCleaner(HTMLParser):
+    """
+    Feed Word HTML in chunks and collect the cleaned HTML from `drain()`.
+    `bytes_in` and `bytes_out` count the UTF-8 size of what went in and out.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.parts = []
+        self.skip_depth = 0
+        self.skip_tag = None
+        self.spans = []
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def feed(self, data):
+        self.bytes_in += len(data.encode("utf-8"))
+        super().feed(data)
+
+    def drain(self):
+        """Return the HTML cleaned since the last call."""
+        text = "".join(self.parts)
+        self.parts = []
+        self.bytes_out += len(text.encode("utf-8"))
+        return text
+
+    def emit(self, text):
+        if not self.skip_depth:
+            self.parts.append(text)
+
+    def handle_starttag(self, tag, attrs):
+        self.start(tag, attrs, closed=False)
+
+    def handle_startendtag(self, tag, attrs):
+        self.start(tag, attrs, closed=True)
+
+    def start(self, tag, attrs, closed):
+        if self.skip_depth:
+            if tag == self.skip_tag and not closed:
+                self.skip_depth += 1
+            return
+        if tag in DROP_ELEMENTS or tag.startswith(DROP_PREFIXES):
+            if not closed:
+                self.skip_tag, self.skip_depth = tag, 1
+            return
+        if UNWRAP_MARK in tag:
+            return
+
+        cleaned = []
+        for name, value in attrs:
+            if name.startswith(ATTRIBUTE_PREFIXES):
+                continue
+            if value is not None and name == "style":
+                value = clean_style(value)
+            elif value is not None and name == "class":
+                value = clean_class(value)
+            else:
+                cleaned.append((name, value))
+                continue
+            if value:
+                cleaned.append((name, value))
+
+        if tag == "span":
+            if not closed:
+                self.spans.append(bool(cleaned))
+            if not cleaned:
+                return
+        if cleaned == attrs:
+            self.emit(self.get_starttag_text())
+            return
+        text = "".join(f" {name}" if value is None else f' {name}="{escape(value)}"' for name, value in cleaned)
+        self.emit(f"<{tag}{text}{' /' if closed else ''}>")
+
+    def handle_endtag(self, tag):
+        if self.skip_depth:
+            if tag == self.skip_tag:
+                self.skip_depth -= 1
+            return
+        if tag in DROP_ELEMENTS or tag.startswith(DROP_PREFIXES) or UNWRAP_MARK in tag:
+            return
+        if tag == "span" and self.spans and not self.spans.pop():
+            return
+        self.emit(f"</{tag}>")
+
+    def handle_data(self, data):
+        self.emit(data)
+
+    def handle_entityref(self, name):
+        self.emit(f"&{name};")
+
+    def handle_charref(self, name):
+        self.emit(f"&#{name};")
+
+    def handle_comment(self, data):
+        if not is_conditional(data):
+            self.emit(f"<!--{data}-->")
+
+    def handle_decl(self, decl):
+        self.emit(f"<!{decl}>")
+
+    def handle_pi(self, data):
+        self.emit(f"<?{data}>")
+
+    def unknown_decl(self, data):
+        # Downlevel-revealed conditionals, <![if !vml]> ... <![endif]>, keep their content.
+        if not data.lstrip().startswith(("if", "endif")):
+            self.emit(f"<![{data}]>")
+
+
+def iter_strip_word_markup(chunks, cleaner=None):
+    """Clean an iterable of HTML text chunks, yielding cleaned HTML as it becomes available."""
+    cleaner = cleaner or WordCleaner()
+    for chunk in chunks:
+        cleaner.feed(chunk)
+        text = cleaner.drain()
+        if text:
+            yield text
+    cleaner.close()
+    text = cleaner.drain()
+    if text:
+        yield text
+
+
+def strip_word_markup(html):
+    """Return `html` with Word's export markup removed."""
+    with span("strip word markup", bytes=len(html)):
+        return "".join(iter_strip_word_markup([html]))
+
+
+def bytes_saved(before, after):
+    """UTF-8 bytes removed between two versions of a document."""
+    return len(before.encode("utf-8")) - len(after.encode("utf-8"))
+
+
+# strip_word_markup for the pages, remembered across reruns with the same upload.
+cached_strip_word_markup = memoize("parse")(strip_word_markup)